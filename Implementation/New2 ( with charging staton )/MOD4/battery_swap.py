@@ -0,0 +1,282 @@
+"""
+Easy-Bike Battery Swap Station Model (TraCI controller plugin)
+SUMO treats the ebike_swap_* stations of Test1.add.xml as slow chargers. This
+model replaces that with swapping as it works for easy bikes: each station
+keeps an inventory of charged packs, a bike that stops at the station gets a
+full pack instantly (its battery is reset to maximumBatteryCapacity and, if
+it is stopped there, the stop is ended), and the depleted pack goes into the station's recharge
+pipeline (a fixed number of charger slots, recharge time from the station
+power). A bike that finds the shelf empty queues until a pack is ready, or
+balks if its stop ends first. Swap stops are taken out of the exporter's
+charging sessions (claims_charging), so the instant refill is not reported
+as charging power.
+
+All state lives in per-station and per-vehicle numpy arrays that are updated
+once per collection step, so hundreds of stations and thousands of bikes
+cost a few array operations; TraCI is only called for bikes that swap.
+
+    exporter = Test1SUMOExporter(controllers=[BatterySwapModel('Test1.add.xml')])
+
+Usage:
+    python battery_swap.py [add_file] [--packs 10] [--slots 4]   # print the station setup
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from network_loader import load_charging_stations
+
+try:
+    import traci
+except ImportError:
+    traci = None
+
+SWAP_PATTERN = 'swap'  # stations whose id contains this are swap stations
+SWAP_VTYPES = ('easyBike',)
+PACKS_PER_STATION = 10  # charged packs on the shelf at the start
+CHARGER_SLOTS = 4  # packs recharged in parallel
+PACK_CAPACITY_WH = 2000.0  # energy to recharge one depleted pack
+
+
+class BatterySwapModel:
+    """
+    Swap stations with pack inventory, recharge pipeline and stockout queues
+
+    Parameters:
+    -----------
+    add_file : str
+        Additional file with the <chargingStation> elements
+    packs : int or array-like
+        Charged packs per station at the start
+    slots : int
+        Packs each station can recharge at the same time
+    pack_capacity_Wh : float
+        Recharge energy per pack; recharge time = capacity / (power x efficiency)
+    vtypes : tuple of str
+        Vehicle types that swap (others keep normal charging)
+    pattern : str
+        Substring identifying swap stations in the station ids
+    """
+
+    def __init__(self, add_file='Test1.add.xml', packs=PACKS_PER_STATION, slots=CHARGER_SLOTS,
+                 pack_capacity_Wh=PACK_CAPACITY_WH, vtypes=SWAP_VTYPES, pattern=SWAP_PATTERN):
+        self.stations = [station for station in load_charging_stations(add_file) if pattern in station['id']]
+        self.station_ids = [station['id'] for station in self.stations]
+        self.station_index = {station_id: i for i, station_id in enumerate(self.station_ids)}
+        self.vtypes = set(vtypes)
+        n = len(self.stations)
+
+        power = np.array([station['power'] * station['efficiency'] for station in self.stations])
+        self.recharge_time = pack_capacity_Wh / np.maximum(power, 1.0) * 3600
+        self.full = np.broadcast_to(np.asarray(packs, dtype=np.int64), (n,)).copy()
+        self.depleted = np.zeros(n, dtype=np.int64)  # waiting for a charger slot
+        self.slot_ready = np.full((n, slots), np.inf)  # finish time per slot, inf = idle
+
+        # Per-station counters
+        self.arrivals = np.zeros(n, dtype=np.int64)
+        self.swaps = np.zeros(n, dtype=np.int64)
+        self.stockout_arrivals = np.zeros(n, dtype=np.int64)
+        self.balked = np.zeros(n, dtype=np.int64)
+        self.wait_total = np.zeros(n)
+        self.queue_seconds = np.zeros(n)
+        self.max_queue = np.zeros(n, dtype=np.int64)
+        self.stockout_seconds = np.zeros(n)
+        self.queue = np.zeros(n, dtype=np.int64)
+        self.last_time = None
+
+        # Per-vehicle state, grown as bikes appear at stations
+        self.vehicle_ids = []
+        self.vehicle_index = {}
+        self.v_station = np.zeros(0, dtype=np.int64)  # -1 = not at a swap station
+        self.v_arrival = np.zeros(0)
+        self.v_swapped = np.zeros(0, dtype=bool)
+        self.events = []
+
+    def _rows(self, vehicle_ids):
+        """Row of each vehicle in the per-vehicle arrays, adding new vehicles"""
+        for veh_id in vehicle_ids:
+            if veh_id not in self.vehicle_index:
+                self.vehicle_index[veh_id] = len(self.vehicle_ids)
+                self.vehicle_ids.append(veh_id)
+        grow = len(self.vehicle_ids) - len(self.v_station)
+        if grow > 0:
+            grow = max(grow, len(self.v_station))  # amortized doubling
+            self.v_station = np.concatenate([self.v_station, np.full(grow, -1, dtype=np.int64)])
+            self.v_arrival = np.concatenate([self.v_arrival, np.zeros(grow)])
+            self.v_swapped = np.concatenate([self.v_swapped, np.zeros(grow, dtype=bool)])
+        return np.array([self.vehicle_index[veh_id] for veh_id in vehicle_ids], dtype=np.int64)
+
+    def advance(self, time):
+        """Integrate queue time and run the recharge pipeline up to time"""
+        if self.last_time is not None and time > self.last_time:
+            dt = time - self.last_time
+            self.queue_seconds += self.queue * dt
+            self.stockout_seconds += (self.full == 0) * dt
+        self.last_time = time
+
+        done = self.slot_ready <= time
+        self.full += done.sum(axis=1)
+        self.slot_ready[done] = np.inf
+
+        # Start depleted packs on idle slots, first come first served
+        idle = np.isinf(self.slot_ready)
+        start = idle & (np.cumsum(idle, axis=1) <= self.depleted[:, None])
+        self.slot_ready[start] = np.broadcast_to(time + self.recharge_time[:, None], start.shape)[start]
+        self.depleted -= start.sum(axis=1)
+
+    def update(self, time, vehicle_ids, stations):
+        """
+        Process the bikes currently stopped at swap stations
+
+        Parameters:
+        -----------
+        time : float
+        vehicle_ids : list of str
+            Bikes at a swap station this step
+        stations : ndarray of int
+            Station row of each bike
+
+        Returns:
+        --------
+        (served, waits) : (ndarray of int, ndarray of float)
+            Positions in vehicle_ids of the bikes that swap now, and how
+            long each of them waited
+        """
+        self.advance(time)
+        n = len(self.stations)
+        rows = self._rows(vehicle_ids)
+        stations = np.asarray(stations, dtype=np.int64)
+
+        current = np.full(len(self.v_station), -1, dtype=np.int64)
+        current[rows] = stations
+
+        # Bikes that left a station; unserved ones balked
+        left = (self.v_station >= 0) & (self.v_station != current)
+        self.balked += np.bincount(self.v_station[left & ~self.v_swapped], minlength=n)
+        self.v_station[left] = -1
+        self.v_swapped[left] = False
+
+        # New arrivals join the queue
+        new = self.v_station[rows] != stations
+        new_rows = rows[new]
+        self.v_station[new_rows] = stations[new]
+        self.v_arrival[new_rows] = time
+        self.arrivals += np.bincount(stations[new], minlength=n)
+
+        # Serve waiting bikes in arrival order while charged packs last
+        waiting = np.flatnonzero(~self.v_swapped[rows])
+        order = waiting[np.lexsort((self.v_arrival[rows[waiting]], stations[waiting]))]
+        ordered_stations = stations[order]
+        group_start = np.searchsorted(ordered_stations, ordered_stations)
+        rank = np.arange(len(order)) - group_start
+        served = order[rank < self.full[ordered_stations]]
+
+        # Arrivals of this step left without a pack, also when earlier bikes took the last ones
+        unserved_new = new.copy()
+        unserved_new[served] = False
+        self.stockout_arrivals += np.bincount(stations[unserved_new], minlength=n)
+
+        served_stations = stations[served]
+        swapped = np.bincount(served_stations, minlength=n)
+        self.full -= swapped
+        self.depleted += swapped
+        self.swaps += swapped
+        self.v_swapped[rows[served]] = True
+        waits = time - self.v_arrival[rows[served]]
+        self.wait_total += np.bincount(served_stations, weights=waits, minlength=n)
+
+        self.queue = np.bincount(stations, minlength=n) - np.bincount(stations[self.v_swapped[rows]], minlength=n)
+        np.maximum(self.max_queue, self.queue, out=self.max_queue)
+
+        # Recharge the packs dropped off this step on any idle slot
+        self.advance(time)
+        return served, waits
+
+    def claims_charging(self, station_id, vehicle_type):
+        """True for swap stops, which the exporter leaves out of its charging sessions"""
+        return station_id in self.station_index and vehicle_type in self.vtypes
+
+    def on_collect(self, simulation_time, vehicle_states):
+        """Controller hook: swap the packs of bikes stopped at swap stations"""
+        at_station = [state for state in vehicle_states
+                      if state['charging_station'] in self.station_index and state['vehicle_type'] in self.vtypes]
+        vehicle_ids = [state['vehicle_id'] for state in at_station]
+        stations = [self.station_index[state['charging_station']] for state in at_station]
+        served, waits = self.update(simulation_time, vehicle_ids, stations)
+
+        for i, wait in zip(served, waits):
+            state = at_station[i]
+            self.events.append({
+                'timestep_sec': simulation_time,
+                'vehicle_id': state['vehicle_id'],
+                'station': state['charging_station'],
+                'soc_before_percent': state['soc_percent'],
+                'energy_swapped_Wh': state['max_battery_Wh'] - state['battery_Wh'],
+                'wait_sec': wait
+            })
+            try:
+                traci.vehicle.setParameter(state['vehicle_id'], 'device.battery.actualBatteryCapacity',
+                                           str(state['max_battery_Wh']))
+                if traci.vehicle.isStopped(state['vehicle_id']):
+                    traci.vehicle.resume(state['vehicle_id'])
+            except traci.exceptions.TraCIException as e:
+                print(f"Warning: Could not complete swap for {state['vehicle_id']}: {e}")
+
+    def station_summary(self):
+        """Inventory, swaps, stockouts and queueing per station"""
+        swaps = np.maximum(self.swaps, 1)
+        return pd.DataFrame({
+            'station': self.station_ids,
+            'packs_full': self.full,
+            'packs_recharging': np.isfinite(self.slot_ready).sum(axis=1),
+            'packs_depleted': self.depleted,
+            'recharge_time_sec': self.recharge_time.round(1),
+            'arrivals': self.arrivals,
+            'swaps': self.swaps,
+            'stockout_arrivals': self.stockout_arrivals,
+            'balked': self.balked,
+            'mean_wait_sec': np.where(self.swaps > 0, self.wait_total / swaps, 0.0),
+            'max_queue': self.max_queue,
+            'queue_vehicle_seconds': self.queue_seconds,
+            'stockout_seconds': self.stockout_seconds
+        })
+
+    def export(self, output_folder, timestamp):
+        """Write swap events and the station summary next to the other exporter outputs"""
+        if not self.stations:
+            return
+        summary_file = os.path.join(output_folder, f'swap_stations_{timestamp}.csv')
+        self.station_summary().to_csv(summary_file, index=False)
+        print(f"✓ Swap station summary exported: {summary_file}")
+        if self.events:
+            events_file = os.path.join(output_folder, f'battery_swaps_{timestamp}.csv')
+            pd.DataFrame(self.events).to_csv(events_file, index=False)
+            print(f"✓ Battery swaps exported: {events_file}")
+        print(f"  Swaps: {int(self.swaps.sum())}, balked: {int(self.balked.sum())}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--packs': PACKS_PER_STATION, '--slots': CHARGER_SLOTS}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = int(args[position + 1])
+            del args[position:position + 2]
+    add_file = args[0] if args else 'Test1.add.xml'
+
+    model = BatterySwapModel(add_file, packs=options['--packs'], slots=options['--slots'])
+    if not model.stations:
+        print(f"No swap stations (id containing '{SWAP_PATTERN}') in {add_file}")
+        sys.exit(1)
+
+    print("\n" + "="*60)
+    print("BATTERY SWAP STATIONS")
+    print("="*60)
+    print(f"{'Station':<20} {'Packs':>6} {'Slots':>6} {'Recharge (min)':>15} {'Packs/h':>8}")
+    print("-" * 60)
+    for station_id, recharge in zip(model.station_ids, model.recharge_time):
+        packs_per_hour = options['--slots'] * 3600 / recharge
+        print(f"{station_id:<20} {options['--packs']:>6} {options['--slots']:>6} "
+              f"{recharge / 60:>15.1f} {packs_per_hour:>8.1f}")
@@ -0,0 +1,382 @@
+"""
+Benchmark Suite for the Simulation and Export Hot Paths
+Measures the exporter, the vehicle_monitor readers and analyze_network at
+scaled sizes and stores the results as JSON (one file per commit and run)
+so changes can be compared across commits.
+
+    exporter   Test1SUMOExporter on Test1 with 100 / 1k / 10k generated
+               vehicles: steps/sec, collection us per vehicle sample,
+               export_to_csv / export_to_excel seconds (needs SUMO + TraCI,
+               or --trace to replay a recorded session scaled to each size)
+    readers    vehicle_monitor.read_* on synthetic fcd / battery / tripinfo /
+               charging station files
+    network    analyze_network on synthetic grid networks (cold: XML parse,
+               warm: binary snapshot)
+
+Every case runs in its own process, so its peak RSS is reported too (Linux
+and macOS; None on Windows).
+
+Usage:
+    python benchmark.py [--quick] [--only exporter,readers,network] [--trace session.trace.gz] [-o results.json]
+    python benchmark.py compare old.json new.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_DIR = 'benchmarks'
+FLEET_SIZES = (100, 1000, 10000)
+READER_SIZES = (100, 1000, 10000)  # vehicles; fcd/battery files have READER_STEPS timesteps
+READER_STEPS = 60
+GRID_SIZES = (10, 50, 100)  # junctions per side
+EXPORTER_END = 300.0  # simulated seconds per exporter case
+QUICK = {'fleet': (100, 1000), 'readers': (100, 1000), 'grid': (10, 50)}
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _in_child(function, *args):
+    """Run function(*args) in a fresh process and return its result dict"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        try:
+            return executor.submit(function, *args).result()
+        except Exception as e:
+            return {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+
+
+# ---------------------------------------------------------------------------
+# Exporter
+# ---------------------------------------------------------------------------
+
+def _replay_exporter_case(n_vehicles, workdir, trace_file):
+    """One exporter run replaying a recorded TraCI session scaled to about n vehicles"""
+    from traci_replay import install_replay
+    replay = install_replay(trace_file)
+    replay.scale = max(int(np.ceil(n_vehicles / max(replay.recorded_fleet(), 1))), 1)
+    from run_simulation import Test1SUMOExporter
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        exporter = Test1SUMOExporter(sumocfg=os.path.join(here, 'Test1.sumocfg'),
+                                     output_folder=os.path.join(workdir, 'outputs'))
+        return _time_exporter(exporter, steps_of=lambda: replay.step, extra={'replay_scale': replay.scale})
+
+
+def _time_exporter(exporter, steps_of, extra=None):
+    """Run, collect and export with timings (stdout already redirected)"""
+    # Time the per-step data collection separately from SUMO itself
+    collect = exporter._collect_data
+    timing = {'seconds': 0.0}
+
+    def timed_collect(simulation_time):
+        start = time.perf_counter()
+        collect(simulation_time)
+        timing['seconds'] += time.perf_counter() - start
+    exporter._collect_data = timed_collect
+
+    start = time.perf_counter()
+    ok = exporter.run_simulation(step_length=1.0)
+    run_seconds = time.perf_counter() - start
+    if not ok:
+        return {'status': 'error', 'error': 'simulation failed'}
+
+    start = time.perf_counter()
+    exporter.export_to_csv()
+    csv_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+        exporter.export_to_excel()
+        excel_seconds = time.perf_counter() - start
+    except ImportError:
+        excel_seconds = None
+
+    samples = max(len(exporter.realtime_data), 1)
+    return {
+        'status': 'ok',
+        **(extra or {}),
+        'vehicle_samples': len(exporter.realtime_data),
+        'steps_per_sec': steps_of() / run_seconds,
+        'collect_us_per_vehicle': timing['seconds'] / samples * 1e6,
+        'run_seconds': run_seconds,
+        'export_csv_seconds': csv_seconds,
+        'export_excel_seconds': excel_seconds,
+        'peak_rss_MB': peak_rss_mb()
+    }
+
+
+def _exporter_case(n_vehicles, workdir, end):
+    """One exporter run on Test1 with n generated vehicles (runs in a child process)"""
+    try:
+        import traci  # noqa: F401
+    except ImportError:
+        return {'status': 'skipped', 'error': 'TraCI not installed'}
+    if shutil.which('sumo') is None:
+        return {'status': 'skipped', 'error': 'sumo binary not found'}
+
+    from demand_generator import read_template, generate_demand, scale_streams
+    from sweep import SweepBase, _option_value
+    from run_simulation import Test1SUMOExporter
+
+    # Render Test1 with a generated route file and no file outputs
+    base = SweepBase(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Test1.sumocfg'))
+    header, streams = read_template(base.route_file)
+    hours = 1
+    flat = np.ones(24)
+    streams = scale_streams(streams, n_vehicles * 3600 / end, hours, profile=flat)
+    route_file = os.path.join(workdir, 'variant.rou.xml')
+    generate_demand(route_file, streams, header, hours=hours, profile=flat, seed=1)
+
+    files = base.render({'config:end': str(end)})
+    config = files['variant.sumocfg'].replace(b'NET_FILE', os.path.abspath(base.net_file).encode())
+    config = re.sub(rb'<output>.*?</output>', b'', config, flags=re.S)
+    with open(os.path.join(workdir, 'variant.sumocfg'), 'wb') as f:
+        f.write(config)
+    with open(os.path.join(workdir, 'variant.add.xml'), 'wb') as f:
+        f.write(files['variant.add.xml'])
+
+    steps = end / float(_option_value(base.config, 'step-length') or 1.0)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        exporter = Test1SUMOExporter(sumocfg=os.path.join(workdir, 'variant.sumocfg'),
+                                     output_folder=os.path.join(workdir, 'outputs'))
+        return _time_exporter(exporter, steps_of=lambda: steps)
+
+
+def bench_exporter(sizes=FLEET_SIZES, end=EXPORTER_END, trace_file=None):
+    results = []
+    for n in sizes:
+        workdir = tempfile.mkdtemp(prefix='bench_exporter_')
+        try:
+            if trace_file:
+                metrics = _in_child(_replay_exporter_case, n, workdir, os.path.abspath(trace_file))
+            else:
+                metrics = _in_child(_exporter_case, n, workdir, end)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        params = {'vehicles': n, 'trace': os.path.basename(trace_file)} if trace_file else {'vehicles': n, 'end': end}
+        results.append({'name': 'exporter', 'params': params, **metrics})
+    return results
+
+
+# ---------------------------------------------------------------------------
+# vehicle_monitor readers
+# ---------------------------------------------------------------------------
+
+def write_synthetic_outputs(directory, n_vehicles, n_steps=READER_STEPS, seed=0):
+    """Synthetic fcd, battery, tripinfo and charging station files in the vehicle_monitor layout"""
+    rng = np.random.default_rng(seed)
+    ids = [f'veh{i}' for i in range(n_vehicles)]
+    paths = {name: os.path.join(directory, f'{name}.xml')
+             for name in ('fcd', 'battery', 'tripinfo', 'chargingstations')}
+
+    with open(paths['fcd'], 'w') as fcd, open(paths['battery'], 'w') as battery:
+        fcd.write('<fcd-export>\n')
+        battery.write('<battery-export>\n')
+        for step in range(n_steps):
+            x, y = rng.random(n_vehicles) * 1000, rng.random(n_vehicles) * 1000
+            speed, angle = rng.random(n_vehicles) * 15, rng.random(n_vehicles) * 360
+            capacity = 5000 - step * rng.random(n_vehicles)
+            fcd.write(f'  <timestep time="{step:.2f}">\n')
+            fcd.write(''.join(f'    <vehicle id="{v}" x="{a:.2f}" y="{b:.2f}" angle="{c:.2f}" type="easyBike" '
+                              f'speed="{s:.2f}" pos="0.00" lane="E0_0" slope="0.00"/>\n'
+                              for v, a, b, c, s in zip(ids, x.tolist(), y.tolist(), angle.tolist(), speed.tolist())))
+            fcd.write('  </timestep>\n')
+            battery.write(f'  <timestep time="{step:.2f}">\n')
+            battery.write(''.join(f'    <vehicle id="{v}" energyConsumed="{e:.2f}" actualBatteryCapacity="{c:.2f}" '
+                                  f'maximumBatteryCapacity="5000.00"/>\n'
+                                  for v, e, c in zip(ids, speed.tolist(), capacity.tolist())))
+            battery.write('  </timestep>\n')
+        fcd.write('</fcd-export>\n')
+        battery.write('</battery-export>\n')
+
+    with open(paths['tripinfo'], 'w') as f:
+        f.write('<tripinfos>\n')
+        duration = rng.random(n_vehicles) * 600 + 60
+        f.write(''.join(f'    <tripinfo id="{v}" depart="0.00" arrival="{d:.2f}" duration="{d:.2f}" '
+                        f'routeLength="{d * 8:.2f}" maxSpeed="15.00" vType="easyBike"/>\n'
+                        for v, d in zip(ids, duration.tolist())))
+        f.write('</tripinfos>\n')
+
+    with open(paths['chargingstations'], 'w') as f:
+        f.write('<chargingstations-export>\n')
+        n_stations = max(n_vehicles // 50, 1)
+        for step in range(n_steps):
+            f.write(f'  <timestep time="{step:.2f}">\n')
+            f.write(''.join(f'    <chargingStation id="cs{i}" totalEnergyCharged="{step * 10.0:.1f}" '
+                            f'chargingVehicles="1"/>\n' for i in range(n_stations)))
+            f.write('  </timestep>\n')
+        f.write('</chargingstations-export>\n')
+    return paths
+
+
+def _reader_case(reader, path):
+    import vehicle_monitor
+    function = getattr(vehicle_monitor, reader)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        start = time.perf_counter()
+        function(path)
+        seconds = time.perf_counter() - start
+    return {'status': 'ok', 'seconds': seconds, 'file_MB': os.path.getsize(path) / 1e6,
+            'peak_rss_MB': peak_rss_mb()}
+
+
+def bench_readers(sizes=READER_SIZES):
+    readers = {'fcd': 'read_fcd_data', 'battery': 'read_battery_data', 'tripinfo': 'read_tripinfo_data',
+               'chargingstations': 'read_charging_stations_data'}
+    results = []
+    for n in sizes:
+        directory = tempfile.mkdtemp(prefix='bench_readers_')
+        try:
+            paths = write_synthetic_outputs(directory, n)
+            for name, reader in readers.items():
+                metrics = _in_child(_reader_case, reader, paths[name])
+                results.append({'name': reader, 'params': {'vehicles': n, 'steps': READER_STEPS}, **metrics})
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# analyze_network
+# ---------------------------------------------------------------------------
+
+def _network_case(net_file):
+    from network_analyzer import analyze_network
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        start = time.perf_counter()
+        connections = analyze_network(net_file)
+        seconds = time.perf_counter() - start
+    if connections is None:
+        return {'status': 'error', 'error': 'analyze_network failed'}
+    return {'status': 'ok', 'seconds': seconds, 'edges': len(connections), 'peak_rss_MB': peak_rss_mb()}
+
+
+def bench_network(sizes=GRID_SIZES):
+    from net_generator import grid_topology, write_simple_net
+    results = []
+    for side in sizes:
+        directory = tempfile.mkdtemp(prefix='bench_network_')
+        try:
+            net_file = os.path.join(directory, 'grid.net.xml')
+            write_simple_net(net_file, grid_topology(side))
+            for phase in ('cold', 'warm'):  # warm: the binary snapshot from the cold run exists
+                metrics = _in_child(_network_case, net_file)
+                results.append({'name': 'analyze_network', 'params': {'grid': side, 'phase': phase}, **metrics})
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Results
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmarks(only=('exporter', 'readers', 'network'), quick=False, trace_file=None):
+    """Run the selected benchmark groups and return the result document"""
+    cases = []
+    if 'exporter' in only:
+        cases += bench_exporter(QUICK['fleet'] if quick else FLEET_SIZES, trace_file=trace_file)
+    if 'readers' in only:
+        cases += bench_readers(QUICK['readers'] if quick else READER_SIZES)
+    if 'network' in only:
+        cases += bench_network(QUICK['grid'] if quick else GRID_SIZES)
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'quick': quick,
+        'cases': cases
+    }
+
+
+def _case_key(case):
+    return case['name'] + ' ' + ' '.join(f'{k}={v}' for k, v in sorted(case['params'].items()))
+
+
+def compare(old, new):
+    """Print every shared numeric metric of two result files with the new/old ratio"""
+    old_cases = {_case_key(case): case for case in old['cases']}
+    print(f"\n{'Case':<42} {'Metric':<24} {old['commit']:>12} {new['commit']:>12} {'Ratio':>7}")
+    print("-" * 101)
+    for case in new['cases']:
+        previous = old_cases.get(_case_key(case))
+        if previous is None:
+            continue
+        for metric, value in case.items():
+            before = previous.get(metric)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+                print(f"{_case_key(case)[:42]:<42} {metric:<24} {before:>12.4g} {value:>12.4g} {value / before:>7.2f}")
+
+
+def print_results(document):
+    print("\n" + "="*80)
+    print(f"BENCHMARKS @ {document['commit']} ({document['timestamp']})")
+    print("="*80)
+    for case in document['cases']:
+        metrics = ', '.join(f'{k}={v:.4g}' if isinstance(v, float) else f'{k}={v}'
+                            for k, v in case.items() if k not in ('name', 'params', 'status'))
+        marker = '✓' if case['status'] == 'ok' else '⚠️' if case['status'] == 'skipped' else '✗'
+        print(f"{marker} {_case_key(case):<45} {metrics}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == 'compare':
+        if len(args) != 3:
+            print("Usage: python benchmark.py compare old.json new.json")
+            sys.exit(1)
+        with open(args[1]) as f, open(args[2]) as g:
+            compare(json.load(f), json.load(g))
+        sys.exit(0)
+
+    options = {'--only': 'exporter,readers,network', '--trace': None, '-o': None}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+    quick = '--quick' in args
+
+    document = run_benchmarks(options['--only'].split(','), quick=quick, trace_file=options['--trace'])
+    print_results(document)
+
+    output_file = options['-o'] or os.path.join(
+        RESULTS_DIR, f"bench_{document['commit']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(output_file):
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\n✓ Results saved: {output_file}")
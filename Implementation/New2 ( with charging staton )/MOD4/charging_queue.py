@@ -0,0 +1,235 @@
+"""
+Charging Queue and Wait-Time Tracker
+Maintains, during a TraCI run, how many vehicles are queueing for and
+charging at every charging station. A vehicle counts as queueing when it is
+halted on a station's lane between queue_distance metres before the stopping
+place and its end without being charged yet, and its next stop is that
+station (vehicles halted at a signal or in congestion that are not headed
+for the charger do not count). The wait ends when it starts charging or
+gives up by driving away ('abandoned' in the wait table).
+
+When the caller cannot tell the next stop (next_stop=None, e.g. a TraCI
+session without getStops), the position alone decides; Arrivals, Abandoned
+and the wait columns may then include vehicles that were only passing.
+
+Queue lengths and busy time are kept as per-station running counters that
+are integrated over time, so nothing is re-scanned from history.
+
+Usage:
+    from charging_queue import ChargingQueueTracker, stations_from_config
+    tracker = ChargingQueueTracker(stations_from_config('Test1.sumocfg'))
+"""
+
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from network_loader import load_charging_stations
+
+DEFAULT_QUEUE_DISTANCE = 50.0  # metres before the stopping place
+HALT_SPEED = 0.1  # m/s, SUMO's halting threshold
+WAIT_BINS = [0, 10, 30, 60, 120, 300, 600, np.inf]
+
+
+def stations_from_config(sumocfg):
+    """Charging stations of every additional file referenced by a .sumocfg"""
+    base_dir = os.path.dirname(os.path.abspath(sumocfg))
+    stations = []
+    for elem in ET.parse(sumocfg).getroot().iter('additional-files'):
+        for add_file in elem.get('value', '').replace(',', ' ').split():
+            path = os.path.join(base_dir, add_file)
+            if os.path.exists(path):
+                stations.extend(load_charging_stations(path))
+    return stations
+
+
+class ChargingQueueTracker:
+    """
+    Per-station queue, wait-time and utilization tracker
+
+    Parameters:
+    -----------
+    stations : list of dict
+        Output of load_charging_stations / stations_from_config
+    queue_distance : float
+        How far upstream of a stopping place halted vehicles count as queueing
+    """
+
+    def __init__(self, stations, queue_distance=DEFAULT_QUEUE_DISTANCE):
+        self.station_ids = [station['id'] for station in stations]
+        self.station_index = {station_id: i for i, station_id in enumerate(self.station_ids)}
+        self.queue_distance = queue_distance
+
+        # Lane -> [(station index, queue zone start, stop end)]
+        self.lane_zones = {}
+        for i, station in enumerate(stations):
+            start = min(station['start_pos'], station['end_pos'])
+            end = max(station['start_pos'], station['end_pos'])
+            self.lane_zones.setdefault(station['lane'], []).append((i, start - queue_distance, end))
+
+        n = len(stations)
+        # Current occupancy
+        self.queue_count = np.zeros(n, dtype=np.int64)
+        self.charging_count = np.zeros(n, dtype=np.int64)
+        # Time integrals and extremes
+        self.queue_area = np.zeros(n)
+        self.charging_area = np.zeros(n)
+        self.busy_time = np.zeros(n)
+        self.max_queue = np.zeros(n, dtype=np.int64)
+        self.arrivals = np.zeros(n, dtype=np.int64)
+        self.abandoned = np.zeros(n, dtype=np.int64)
+
+        self.start_time = None
+        self.last_time = None
+        # Vehicle -> (state, station index, since); state is queueing, charging
+        # or charged (done, but still standing in the stop)
+        self.vehicle_state = {}
+        self.waits = []
+
+    def is_station_lane(self, lane_id):
+        return lane_id in self.lane_zones
+
+    def advance(self, time):
+        """Integrate the current counts up to `time` (call once per collection, before observe)"""
+        if self.start_time is None:
+            self.start_time = time
+        elif time > self.last_time:
+            dt = time - self.last_time
+            self.queue_area += self.queue_count * dt
+            self.charging_area += self.charging_count * dt
+            self.busy_time += (self.charging_count > 0) * dt
+        self.last_time = time
+
+    def needs_next_stop(self, lane_id, lane_pos, speed):
+        """True if observe() should be given the vehicle's next stop (halted in a queue zone)"""
+        return speed <= HALT_SPEED and self._zone_station(lane_id, lane_pos) is not None
+
+    def _zone_station(self, lane_id, lane_pos):
+        for station, zone_start, zone_end in self.lane_zones.get(lane_id, ()):
+            if zone_start <= lane_pos <= zone_end:
+                return station
+        return None
+
+    def observe(self, time, veh_id, lane_id, lane_pos, speed, charging_station, next_stop=None):
+        """
+        Update one vehicle's queue state
+
+        Parameters:
+        -----------
+        lane_pos : float
+            Position on lane_id; only read when the lane holds a station
+        charging_station : str or None
+            Station the vehicle is charging at, or None/"NULL"
+        next_stop : str, optional
+            ID of the vehicle's next stopping place ('' for none); a halted
+            vehicle only queues for the station it is headed for. None =
+            unknown, the position alone decides
+        """
+        previous = self.vehicle_state.get(veh_id)
+
+        if charging_station and charging_station != "NULL" and charging_station in self.station_index:
+            station = self.station_index[charging_station]
+            state = ('charging', station)
+        elif speed <= HALT_SPEED and lane_id in self.lane_zones:
+            station = self._zone_station(lane_id, lane_pos)
+            if station is not None and next_stop is not None and next_stop != self.station_ids[station]:
+                station = None  # halted near the charger but not headed for it
+            state = ('queueing', station) if station is not None else None
+        else:
+            state = None
+
+        # Still standing in the stop after charging is not a new queue visit
+        if (state is not None and state[0] == 'queueing' and previous is not None
+                and previous[0] in ('charging', 'charged') and previous[1] == state[1]):
+            state = ('charged', state[1])
+
+        if previous is not None and state == previous[:2]:
+            return
+        charged = (state is not None and state[0] == 'charging'
+                   and previous is not None and previous[1] == state[1])
+        self._leave(veh_id, previous, time, charged=charged)
+        if state is None:
+            return
+
+        kind, station = state
+        if kind == 'queueing':
+            self.queue_count[station] += 1
+            self.max_queue[station] = max(self.max_queue[station], self.queue_count[station])
+            self.arrivals[station] += 1
+            self.vehicle_state[veh_id] = (kind, station, time)
+        elif kind == 'charged':
+            self.vehicle_state[veh_id] = (kind, station, time)
+        else:
+            # Charging without queueing first is a zero wait
+            if previous is None or previous[0] != 'queueing' or previous[1] != station:
+                self.arrivals[station] += 1
+                self.waits.append((self.station_ids[station], veh_id, time, 0.0, 'charged'))
+            self.charging_count[station] += 1
+            self.vehicle_state[veh_id] = (kind, station, time)
+
+    def _leave(self, veh_id, previous, time, charged):
+        if previous is None:
+            return
+        kind, station, since = previous
+        if kind == 'queueing':
+            self.queue_count[station] -= 1
+            outcome = 'charged' if charged else 'abandoned'
+            if not charged:
+                self.abandoned[station] += 1
+            self.waits.append((self.station_ids[station], veh_id, since, time - since, outcome))
+        elif kind == 'charging':
+            self.charging_count[station] -= 1
+        del self.vehicle_state[veh_id]
+
+    def vehicle_left(self, veh_id, time):
+        """Drop a vehicle that left the simulation"""
+        self._leave(veh_id, self.vehicle_state.get(veh_id), time, charged=False)
+
+    def finish(self, time):
+        """Close every open queue/charging state at the end of the run"""
+        self.advance(time)
+        for veh_id in list(self.vehicle_state):
+            kind, station, since = self.vehicle_state[veh_id]
+            if kind == 'queueing':
+                self.queue_count[station] -= 1
+                self.waits.append((self.station_ids[station], veh_id, since, time - since, 'still_waiting'))
+            elif kind == 'charging':
+                self.charging_count[station] -= 1
+            del self.vehicle_state[veh_id]
+
+    def wait_times(self):
+        """One row per queue visit: station, vehicle, queue_start, wait_sec, outcome"""
+        return pd.DataFrame(self.waits, columns=['charging_station', 'vehicle_id', 'queue_start', 'wait_sec', 'outcome'])
+
+    def station_summary(self):
+        """Per-station arrivals, wait-time percentiles, queue length and utilization"""
+        elapsed = (self.last_time - self.start_time) if self.start_time is not None else 0
+        waits = self.wait_times()
+        rows = []
+        for i, station_id in enumerate(self.station_ids):
+            station_waits = waits.loc[waits['charging_station'] == station_id, 'wait_sec'].to_numpy()
+            has_waits = len(station_waits) > 0
+            rows.append({
+                'Charging_Station': station_id,
+                'Arrivals': int(self.arrivals[i]),
+                'Abandoned': int(self.abandoned[i]),
+                'Mean_Wait_sec': float(station_waits.mean()) if has_waits else 0.0,
+                'P50_Wait_sec': float(np.percentile(station_waits, 50)) if has_waits else 0.0,
+                'P90_Wait_sec': float(np.percentile(station_waits, 90)) if has_waits else 0.0,
+                'Max_Wait_sec': float(station_waits.max()) if has_waits else 0.0,
+                'Mean_Queue_Length': self.queue_area[i] / elapsed if elapsed > 0 else 0.0,
+                'Max_Queue_Length': int(self.max_queue[i]),
+                'Mean_Vehicles_Charging': self.charging_area[i] / elapsed if elapsed > 0 else 0.0,
+                'Utilization_Percent': self.busy_time[i] / elapsed * 100 if elapsed > 0 else 0.0
+            })
+        return pd.DataFrame(rows)
+
+    def wait_distribution(self, bins=WAIT_BINS):
+        """Wait-time histogram per station (counts per bin)"""
+        waits = self.wait_times()
+        labels = [f"{int(lo)}-{int(hi)}s" if np.isfinite(hi) else f">{int(lo)}s"
+                  for lo, hi in zip(bins[:-1], bins[1:])]
+        binned = pd.cut(waits['wait_sec'], bins=bins, labels=labels, right=False, include_lowest=True)
+        table = pd.crosstab(waits['charging_station'], binned).reindex(index=self.station_ids, columns=labels)
+        table = table.fillna(0).astype(int).rename_axis(index='Charging_Station', columns=None)
+        return table.reset_index()
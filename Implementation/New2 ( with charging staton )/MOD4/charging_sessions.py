@@ -0,0 +1,215 @@
+"""
+Charging Session Reconstruction
+Collapses the per-sample "vehicle X is at station Y" observations collected
+during a TraCI run into one record per charging session (run-length
+encoding), updated online as samples arrive. The per-step series can still
+be kept when it is needed for plotting.
+
+Usage:
+    python charging_sessions.py simulation_outputs/charging_events_<timestamp>.csv [--max-gap 2]
+
+Without --max-gap, a gap of more than twice the file's sampling interval
+starts a new session (old charging_events files hold only charging rows,
+so separate visits are otherwise merged).
+"""
+
+import os
+import sys
+import pandas as pd
+
+SESSION_COLUMNS = [
+    'vehicle_id', 'vehicle_type', 'charging_station', 'start_time', 'end_time',
+    'duration_sec', 'start_soc_percent', 'end_soc_percent', 'energy_delivered_Wh',
+    'avg_power_W', 'samples'
+]
+
+
+class ChargingSessionizer:
+    """
+    Online run-length encoder for charging samples
+
+    Parameters:
+    -----------
+    keep_series : bool
+        Also keep every per-step sample (the old charging_events rows)
+    max_gap : float
+        A vehicle not seen charging for longer than this (seconds) starts a
+        new session even at the same station
+    """
+
+    def __init__(self, keep_series=False, max_gap=None):
+        self.keep_series = keep_series
+        self.max_gap = max_gap
+        self.open_sessions = {}
+        self.closed_sessions = []
+        self.series = []
+        self.sample_count = 0
+
+    def update(self, time, veh_id, vtype, station, battery_Wh, max_battery_Wh):
+        """
+        Feed one sample of one vehicle
+
+        Parameters:
+        -----------
+        station : str or None
+            Charging station ID, or None/NaN/"NULL" when the vehicle is not charging
+        """
+        soc = (battery_Wh / max_battery_Wh * 100) if max_battery_Wh > 0 else 0
+        session = self.open_sessions.get(veh_id)
+        # read_csv turns the exporter's "NULL" into NaN, which is truthy
+        charging = not pd.isna(station) and bool(station) and station != "NULL"
+
+        if session is not None:
+            gap_exceeded = self.max_gap is not None and time - session['end_time'] > self.max_gap
+            if not charging or session['charging_station'] != station or gap_exceeded:
+                self._close(veh_id)
+                session = None
+
+        if not charging:
+            return
+
+        self.sample_count += 1
+        if self.keep_series:
+            self.series.append({
+                'timestep': time,
+                'vehicle_id': veh_id,
+                'vehicle_type': vtype,
+                'charging_station': station,
+                'battery_soc_percent': soc
+            })
+
+        if session is None:
+            self.open_sessions[veh_id] = {
+                'vehicle_id': veh_id,
+                'vehicle_type': vtype,
+                'charging_station': station,
+                'start_time': time,
+                'end_time': time,
+                'start_soc_percent': soc,
+                'end_soc_percent': soc,
+                'start_Wh': battery_Wh,
+                'end_Wh': battery_Wh,
+                'samples': 1
+            }
+        else:
+            session['end_time'] = time
+            session['end_soc_percent'] = soc
+            session['end_Wh'] = battery_Wh
+            session['samples'] += 1
+
+    def vehicle_left(self, veh_id):
+        """Close the open session of a vehicle that left the simulation"""
+        if veh_id in self.open_sessions:
+            self._close(veh_id)
+
+    def finish(self):
+        """Close every open session (call once at the end of the run)"""
+        for veh_id in list(self.open_sessions):
+            self._close(veh_id)
+
+    def _close(self, veh_id):
+        session = self.open_sessions.pop(veh_id)
+        duration = session['end_time'] - session['start_time']
+        energy = session.pop('end_Wh') - session.pop('start_Wh')
+        session['duration_sec'] = duration
+        session['energy_delivered_Wh'] = energy
+        session['avg_power_W'] = energy / (duration / 3600) if duration > 0 else 0
+        self.closed_sessions.append(session)
+
+    def sessions(self):
+        """All sessions (closed ones plus any still open) as a DataFrame"""
+        pending = ChargingSessionizer()
+        pending.open_sessions = {veh_id: dict(session) for veh_id, session in self.open_sessions.items()}
+        pending.finish()
+        records = self.closed_sessions + pending.closed_sessions
+        return pd.DataFrame(records, columns=SESSION_COLUMNS)
+
+    def series_dataframe(self):
+        """The per-step samples (empty unless keep_series=True)"""
+        return pd.DataFrame(self.series)
+
+
+def infer_max_gap(df, time_col):
+    """Twice the median interval between one vehicle's consecutive samples (None if unknown)"""
+    steps = df.sort_values(time_col, kind='stable').groupby('vehicle_id')[time_col].diff()
+    steps = steps[steps > 0]
+    return 2 * float(steps.median()) if len(steps) else None
+
+
+def sessions_from_samples(df, max_gap='auto'):
+    """
+    Rebuild sessions from a per-step table
+
+    Accepts an old charging_events_*.csv (timestep, vehicle_id, vehicle_type,
+    charging_station, battery_soc_percent) or battery_data_*.csv
+    (timestep_sec, ..., chargingStationId, actualBatteryCapacity_Wh,
+    maximumBatteryCapacity_Wh). Without capacities, energy and power are
+    reported as NaN. max_gap='auto' uses infer_max_gap; None never splits
+    a vehicle's consecutive samples at the same station.
+    """
+    time_col = 'timestep' if 'timestep' in df.columns else 'timestep_sec'
+    if max_gap == 'auto':
+        max_gap = infer_max_gap(df, time_col)
+    station_col = 'charging_station' if 'charging_station' in df.columns else 'chargingStationId'
+    has_energy = {'actualBatteryCapacity_Wh', 'maximumBatteryCapacity_Wh'} <= set(df.columns)
+
+    sessionizer = ChargingSessionizer(max_gap=max_gap)
+    ordered = df.sort_values([time_col], kind='stable')
+    for row in ordered.itertuples(index=False):
+        row = row._asdict()
+        if has_energy:
+            battery_Wh = row['actualBatteryCapacity_Wh']
+            max_Wh = row['maximumBatteryCapacity_Wh']
+        else:
+            battery_Wh, max_Wh = row['battery_soc_percent'], 100.0
+        sessionizer.update(row[time_col], row['vehicle_id'], row.get('vehicle_type', ''),
+                           row[station_col], battery_Wh, max_Wh)
+    sessionizer.finish()
+
+    sessions = sessionizer.sessions()
+    if not has_energy:
+        sessions['energy_delivered_Wh'] = float('nan')
+        sessions['avg_power_W'] = float('nan')
+    return sessions
+
+
+def summarize_stations(sessions):
+    """Per-station totals computed from session records"""
+    if sessions.empty:
+        return pd.DataFrame(columns=['Charging_Station', 'Sessions', 'Vehicles', 'Total_Charging_Time_sec',
+                                     'Avg_Session_sec', 'Energy_Delivered_kWh', 'Avg_Start_SoC'])
+    summary = sessions.groupby('charging_station').agg(
+        Sessions=('vehicle_id', 'count'),
+        Vehicles=('vehicle_id', 'nunique'),
+        Total_Charging_Time_sec=('duration_sec', 'sum'),
+        Avg_Session_sec=('duration_sec', 'mean'),
+        Energy_Delivered_kWh=('energy_delivered_Wh', lambda wh: wh.sum(min_count=1) / 1000),
+        Avg_Start_SoC=('start_soc_percent', 'mean')
+    ).reset_index()
+    return summary.rename(columns={'charging_station': 'Charging_Station'})
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    max_gap = 'auto'
+    if '--max-gap' in args:
+        position = args.index('--max-gap')
+        max_gap = float(args[position + 1])
+        del args[position:position + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(0)
+
+    input_file = args[0]
+    if not os.path.exists(input_file):
+        print(f"File not found: {input_file}")
+        sys.exit(1)
+
+    samples = pd.read_csv(input_file)
+    sessions = sessions_from_samples(samples, max_gap=max_gap)
+    print(f"✓ {len(samples)} samples → {len(sessions)} sessions")
+    print(summarize_stations(sessions).to_string(index=False))
+
+    output_file = os.path.splitext(input_file)[0] + '_sessions.csv'
+    sessions.to_csv(output_file, index=False)
+    print(f"\n✓ Sessions exported: {output_file}")
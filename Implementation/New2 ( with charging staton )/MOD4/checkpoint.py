@@ -0,0 +1,270 @@
+"""
+Simulation Checkpoints and Warm Starts
+Periodic checkpoints for run_simulation.py: the SUMO state is written with
+traci.simulation.saveState and the exporter's in-memory state (collected
+records, charging sessions, queue tracker, controllers) is pickled next to
+it. A crashed run resumes from its latest checkpoint instead of t=0, and
+many variants can warm-start from one shared warmed-up state.
+
+Every run writes into its own folder, checkpoint_dir/<run id>, together
+with a run.json naming its sumocfg and the hash of that file. Resuming picks
+the most recent run of the same sumocfg (unchanged since), and a snapshot
+of another run or configuration is refused. A run's folder is removed when
+the run completes, unless keep_checkpoints is set (do so for a warm-up run
+whose states other runs start from).
+
+The record lists only grow, so each exporter snapshot stores just the
+records collected since the previous checkpoint and links to it. The other
+objects (trip_data, stats, charging sessions, queue tracker, controllers)
+are pickled in full every time; they grow with the number of vehicles and
+sessions (and, with keep_charging_series, with every charging sample), so
+late checkpoints of long runs cost more than early ones.
+
+A warm start restores only the records, trip_data and stats of the shared
+state; the variant keeps the charging session tracker, queue tracker and
+controllers built from its own configuration.
+
+    exporter.run_simulation(checkpoint_every=60)           # write checkpoints
+    exporter.run_simulation(resume=True)                   # continue a crashed run
+    exporter.run_simulation(warm_start='checkpoints/<run id>/state_600.xml')
+
+Usage:
+    python checkpoint.py [checkpoint_dir]      # list checkpoints
+"""
+
+import os
+import sys
+import glob
+import json
+import pickle
+import shutil
+import hashlib
+from datetime import datetime
+
+try:
+    import traci
+except ImportError:
+    traci = None
+
+CHECKPOINT_DIR = 'checkpoints'
+RUN_FILE = 'run.json'
+KEEP_STATES = 2  # SUMO state files kept per run (snapshots are always kept, they form a chain)
+RECORD_LISTS = ('battery_data', 'realtime_data')
+EXPORTER_OBJECTS = ('trip_data', 'stats', 'charging_sessions', 'charging_queues', 'controllers')
+WARM_START_OBJECTS = ('trip_data', 'stats')
+
+
+def _paths(checkpoint_dir, time):
+    name = f'{time:.0f}' if float(time).is_integer() else f'{time:g}'
+    return (os.path.join(checkpoint_dir, f'state_{name}.xml'),
+            os.path.join(checkpoint_dir, f'exporter_{name}.pkl'))
+
+
+def config_hash(sumocfg):
+    """SHA-1 of a sumocfg file's contents"""
+    with open(sumocfg, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def list_checkpoints(run_dir):
+    """
+    Complete checkpoints (state and snapshot both present) of one run, oldest first
+
+    Returns:
+    --------
+    list of (time, state_file, snapshot_file)
+    """
+    checkpoints = []
+    for snapshot_file in glob.glob(os.path.join(run_dir, 'exporter_*.pkl')):
+        time = float(os.path.basename(snapshot_file)[len('exporter_'):-len('.pkl')])
+        state_file, _ = _paths(run_dir, time)
+        if os.path.exists(state_file):
+            checkpoints.append((time, state_file, snapshot_file))
+    return sorted(checkpoints)
+
+
+def list_runs(checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Runs with checkpoints, most recently checkpointed first
+
+    Returns:
+    --------
+    list of (run_dir, run info dict, checkpoints)
+    """
+    runs = []
+    for run_file in glob.glob(os.path.join(checkpoint_dir, '*', RUN_FILE)):
+        run_dir = os.path.dirname(run_file)
+        checkpoints = list_checkpoints(run_dir)
+        if checkpoints:
+            with open(run_file) as f:
+                runs.append((run_dir, json.load(f), checkpoints))
+    return sorted(runs, key=lambda run: os.path.getmtime(run[2][-1][2]), reverse=True)
+
+
+def latest_checkpoint(checkpoint_dir=CHECKPOINT_DIR, sumocfg=None):
+    """
+    Most recent complete checkpoint of the latest run (of sumocfg, unchanged since), or None
+
+    Returns:
+    --------
+    (time, state_file, snapshot_file) or None
+    """
+    digest = config_hash(sumocfg) if sumocfg else None
+    for _, info, checkpoints in list_runs(checkpoint_dir):
+        if digest is None or info.get('config_hash') == digest:
+            return checkpoints[-1]
+    return None
+
+
+class Checkpointer:
+    """
+    Writes checkpoints of a running exporter into checkpoint_dir/<run id>
+
+    Parameters:
+    -----------
+    exporter : Test1SUMOExporter
+    checkpoint_dir : str
+    every : float
+        Simulated seconds between checkpoints
+    run_id : str, optional
+        Default: start time and process id
+    """
+
+    def __init__(self, exporter, checkpoint_dir=CHECKPOINT_DIR, every=60.0, run_id=None):
+        self.exporter = exporter
+        self.every = every
+        self.next_time = every
+        self.previous = None  # snapshot file of the last checkpoint in this chain
+        self.previous_run = None
+        self.saved_lengths = {name: 0 for name in RECORD_LISTS}
+        self.info = {
+            'run_id': run_id or f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}",
+            'sumocfg': os.path.abspath(exporter.sumocfg),
+            'config_hash': config_hash(exporter.sumocfg)
+        }
+        self._open_run(os.path.join(checkpoint_dir, self.info['run_id']))
+
+    def _open_run(self, run_dir):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, RUN_FILE), 'w') as f:
+            json.dump(self.info, f, indent=2)
+
+    def continue_from(self, time, snapshot_file, same_run=False):
+        """
+        Chain new checkpoints onto a restored snapshot
+
+        With same_run (resume), checkpoints keep going into the snapshot's run folder.
+        """
+        with open(snapshot_file, 'rb') as f:
+            snapshot = pickle.load(f)
+        if same_run:
+            if not list_checkpoints(self.run_dir):
+                shutil.rmtree(self.run_dir, ignore_errors=True)
+            self.info['run_id'] = snapshot['run_id']
+            self._open_run(os.path.dirname(snapshot_file))
+        self.previous = snapshot_file
+        self.previous_run = snapshot['run_id']
+        self.saved_lengths = {name: len(getattr(self.exporter, name)) for name in RECORD_LISTS}
+        self.next_time = (time // self.every + 1) * self.every
+
+    def maybe_save(self, time, next_collection_time):
+        """Write a checkpoint if one is due at this simulation time"""
+        if time >= self.next_time:
+            self.save(time, next_collection_time)
+            self.next_time = (time // self.every + 1) * self.every
+
+    def save(self, time, next_collection_time):
+        """Write the SUMO state and the exporter snapshot for this time"""
+        state_file, snapshot_file = _paths(self.run_dir, time)
+        traci.simulation.saveState(state_file)
+
+        snapshot = {
+            'time': time,
+            'next_collection_time': next_collection_time,
+            'run_id': self.info['run_id'],
+            'config_hash': self.info['config_hash'],
+            'previous': os.path.relpath(self.previous, self.run_dir) if self.previous else None,
+            'previous_run': self.previous_run,
+            'records': {name: getattr(self.exporter, name)[self.saved_lengths[name]:] for name in RECORD_LISTS},
+            'objects': {name: getattr(self.exporter, name) for name in EXPORTER_OBJECTS}
+        }
+        tmp_file = snapshot_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, snapshot_file)
+
+        self.previous = snapshot_file
+        self.previous_run = self.info['run_id']
+        self.saved_lengths = {name: len(getattr(self.exporter, name)) for name in RECORD_LISTS}
+        for _, old_state, _ in list_checkpoints(self.run_dir)[:-KEEP_STATES]:
+            os.remove(old_state)
+        print(f"✓ Checkpoint at {time:g}s: {state_file}")
+
+    def remove(self):
+        """Delete this run's checkpoint folder (after the run completed)"""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+
+def restore_exporter(exporter, snapshot_file, objects=EXPORTER_OBJECTS, sumocfg=None):
+    """
+    Load an exporter snapshot (following its chain of earlier snapshots)
+
+    Parameters:
+    -----------
+    objects : tuple of str
+        Exporter attributes restored besides the record lists
+        (WARM_START_OBJECTS keeps the exporter's own trackers and controllers)
+    sumocfg : str, optional
+        Refuse the snapshot unless it was written by a run of this
+        configuration (unchanged since)
+
+    Returns:
+    --------
+    (time, next_collection_time) : (float, float)
+    """
+    chain = []
+    path, expected_run = snapshot_file, None
+    while path:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+        # A link must still be the snapshot its successor was chained to
+        if expected_run is not None and snapshot.get('run_id') != expected_run:
+            raise ValueError(f"Checkpoint chain broken at {path}: written by run {snapshot.get('run_id')}, "
+                             f"expected {expected_run}")
+        chain.append(snapshot)
+        expected_run = snapshot.get('previous_run')
+        path = os.path.join(os.path.dirname(path), snapshot['previous']) if snapshot['previous'] else None
+
+    latest = chain[0]
+    if sumocfg and latest.get('config_hash') != config_hash(sumocfg):
+        raise ValueError(f"Checkpoint {snapshot_file} was not written by a run of {sumocfg} "
+                         f"(or the file changed since)")
+    for name in RECORD_LISTS:
+        setattr(exporter, name, [record for snapshot in reversed(chain) for record in snapshot['records'][name]])
+    for name in objects:
+        setattr(exporter, name, latest['objects'][name])
+    return latest['time'], latest['next_collection_time']
+
+
+def snapshot_for_state(state_file):
+    """Exporter snapshot written together with a SUMO state file, or None"""
+    directory, name = os.path.split(state_file)
+    snapshot_file = os.path.join(directory, 'exporter_' + name[len('state_'):-len('.xml')] + '.pkl')
+    return snapshot_file if os.path.exists(snapshot_file) else None
+
+
+if __name__ == "__main__":
+    checkpoint_dir = sys.argv[1] if len(sys.argv) > 1 else CHECKPOINT_DIR
+    runs = list_runs(checkpoint_dir)
+    if not runs:
+        print(f"No checkpoints in {checkpoint_dir}")
+        sys.exit(1)
+
+    for run_dir, info, checkpoints in runs:
+        print(f"\nRun {info.get('run_id')}: {info.get('sumocfg')}")
+        print(f"{'Time (s)':>10} {'State (MB)':>12} {'Snapshot (MB)':>14}  State file")
+        print("-" * 70)
+        for time, state_file, snapshot_file in checkpoints:
+            print(f"{time:>10g} {os.path.getsize(state_file) / 1e6:>12.2f} "
+                  f"{os.path.getsize(snapshot_file) / 1e6:>14.2f}  {state_file}")
@@ -0,0 +1,240 @@
+"""
+Surveyed Distance Matrix Validator
+Compares the surveyed stop-to-stop distances in the
+d-13-05-25/possible stoppage with routes/*Distance_Matrix*.xlsx and
+*Confusion_Matrix*.xlsx workbooks against the network's all-pairs shortest
+distances in one vectorized pass and reports the worst discrepancies.
+
+Stops are mapped to network junctions with a two-column CSV (stop,junction),
+by default stop_junction_map.csv next to the matrices. If the map does not
+exist yet, a template listing every surveyed stop is written there so the
+junction column can be filled in.
+
+Usage:
+    python diagram_validator.py [net_file] [stop_map.csv] [matrix_dir]
+"""
+
+import os
+import sys
+import glob
+import tempfile
+import numpy as np
+import pandas as pd
+from network_loader import DEFAULT_CACHE_DIR
+from network_analyzer import load_network_graph
+
+DEFAULT_MATRIX_DIR = os.path.join('..', '..', '..', 'd-13-05-25', 'possible stoppage with routes')
+DEFAULT_STOP_MAP = 'stop_junction_map.csv'
+MATRIX_PATTERNS = ('*Distance_Matrix*.xlsx', '*Confusion_Matrix*.xlsx', '*ConfusionMatrix*.xlsx')
+
+
+def _read_matrix_workbook(path):
+    """Read one square stop matrix (first row/column are stop names, values in km)"""
+    raw = pd.read_excel(path, header=None)
+    col_labels = [str(label).strip() for label in raw.iloc[0, 1:]]
+    row_labels = [str(label).strip() for label in raw.iloc[1:, 0]]
+    values = raw.iloc[1:, 1:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+    # Align rows to the column order in case a sheet lists them differently
+    if row_labels != col_labels:
+        frame = pd.DataFrame(values, index=row_labels, columns=col_labels)
+        frame = frame.reindex(index=col_labels)
+        values = frame.to_numpy(dtype=np.float64)
+    return col_labels, values
+
+
+def load_distance_matrices(matrix_dir=DEFAULT_MATRIX_DIR, use_cache=True):
+    """
+    Load every surveyed stop matrix in matrix_dir
+
+    Parsed workbooks are cached as .npz (keyed by file size and mtime) so
+    only new or edited workbooks go through Excel parsing again.
+
+    Returns:
+    --------
+    dict
+        Workbook name -> (stop labels, distance matrix in km)
+    """
+    paths = sorted({path for pattern in MATRIX_PATTERNS
+                    for path in glob.glob(os.path.join(matrix_dir, pattern))})
+    cache_dir = os.path.join(matrix_dir, DEFAULT_CACHE_DIR)
+    if use_cache and paths:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    matrices = {}
+    for path in paths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        cache_file = os.path.join(cache_dir, f"{name}-{stat.st_size}-{int(stat.st_mtime)}.npz")
+
+        if use_cache and os.path.exists(cache_file):
+            with np.load(cache_file, allow_pickle=False) as data:
+                matrices[name] = (data['labels'].tolist(), data['values'])
+            continue
+
+        try:
+            labels, values = _read_matrix_workbook(path)
+        except Exception as e:
+            print(f"⚠ Skipping {name}: {e}")
+            continue
+        matrices[name] = (labels, values)
+        if use_cache:
+            # Replaced atomically, so an interrupted write never leaves a truncated cache
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp.npz')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, labels=np.array(labels, dtype=str), values=values)
+                os.replace(tmp_path, cache_file)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    return matrices
+
+
+def surveyed_pairs(matrices):
+    """
+    Flatten all matrices into one long table of surveyed stop pairs
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns: source, stop_from, stop_to, surveyed_km
+    """
+    frames = []
+    for name, (labels, values) in matrices.items():
+        labels = np.array(labels, dtype=object)
+        i, j = np.nonzero(np.isfinite(values) & ~np.eye(len(labels), dtype=bool))
+        frames.append(pd.DataFrame({
+            'source': name,
+            'stop_from': labels[i],
+            'stop_to': labels[j],
+            'surveyed_km': values[i, j]
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['source', 'stop_from', 'stop_to', 'surveyed_km'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_stop_map(map_file, stop_names=()):
+    """
+    Read the stop -> junction map, writing a template if it is missing
+
+    Returns:
+    --------
+    dict
+        Stop name -> junction ID (stops with an empty junction are left out)
+    """
+    if not os.path.exists(map_file):
+        template = pd.DataFrame({'stop': sorted(set(stop_names)), 'junction': ''})
+        template.to_csv(map_file, index=False)
+        print(f"✓ Wrote stop map template: {map_file}")
+        print("  Fill in the junction column (e.g. Node1) for stops modelled in the network")
+        return {}
+
+    mapping = pd.read_csv(map_file, dtype=str).dropna()
+    return {row.stop.strip(): row.junction.strip() for row in mapping.itertuples() if row.junction.strip()}
+
+
+def validate_against_network(graph, pairs, stop_map):
+    """
+    Compare surveyed pair distances with the network's shortest distances
+
+    Parameters:
+    -----------
+    graph : NetworkGraph
+    pairs : pandas.DataFrame
+        Output of surveyed_pairs
+    stop_map : dict
+        Stop name -> junction ID
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per mapped surveyed pair with network_m, difference_m and
+        relative_error, sorted by absolute difference (worst first);
+        unreachable pairs have network_m = inf and come last
+    """
+    junction_of = {stop: graph.node_index[junction] for stop, junction in stop_map.items()
+                   if junction in graph.node_index}
+    unknown = sorted(junction for junction in stop_map.values() if junction not in graph.node_index)
+    if unknown:
+        print(f"⚠ Junctions not in network: {', '.join(unknown)}")
+
+    from_idx = pairs['stop_from'].map(junction_of)
+    to_idx = pairs['stop_to'].map(junction_of)
+    mapped = from_idx.notna() & to_idx.notna() & (from_idx != to_idx)
+    result = pairs[mapped].copy()
+
+    dist = graph.distance_matrix()
+    result['junction_from'] = [graph.node_ids[i] for i in from_idx[mapped].astype(int)]
+    result['junction_to'] = [graph.node_ids[i] for i in to_idx[mapped].astype(int)]
+    result['surveyed_m'] = result['surveyed_km'] * 1000
+    result['network_m'] = dist[from_idx[mapped].astype(int).to_numpy(), to_idx[mapped].astype(int).to_numpy()]
+    result['difference_m'] = result['network_m'] - result['surveyed_m']
+    result['relative_error'] = result['difference_m'] / result['surveyed_m']
+
+    # Worst finite discrepancies first, unreachable pairs last
+    abs_diff = np.abs(result['difference_m'].to_numpy())
+    order = np.argsort(-np.where(np.isfinite(abs_diff), abs_diff, -1.0), kind='stable')
+    return result.iloc[order].reset_index(drop=True)
+
+
+def survey_inconsistencies(pairs, tolerance_km=0.05):
+    """Stop pairs whose surveyed distance differs between workbooks"""
+    grouped = pairs.groupby(['stop_from', 'stop_to'])['surveyed_km'].agg(['min', 'max', 'count'])
+    grouped['spread_km'] = grouped['max'] - grouped['min']
+    return grouped[grouped['spread_km'] > tolerance_km].sort_values('spread_km', ascending=False)
+
+
+def print_validation_report(result, inconsistencies, top=15):
+    """Print the worst network/survey discrepancies"""
+    print("\n" + "="*80)
+    print("SURVEYED STOP DISTANCES VS NETWORK SHORTEST PATHS")
+    print("="*80)
+
+    if inconsistencies is not None and len(inconsistencies):
+        print(f"\n⚠️  {len(inconsistencies)} stop pairs disagree between survey workbooks "
+              f"(largest spread {inconsistencies['spread_km'].iloc[0]:.2f} km)")
+
+    if result.empty:
+        print("No surveyed pairs map to network junctions yet.")
+        return
+
+    finite = np.isfinite(result['network_m'])
+    print(f"Compared pairs: {int(finite.sum())}  Unreachable in network: {int((~finite).sum())}")
+    if finite.any():
+        abs_err = result.loc[finite, 'difference_m'].abs()
+        print(f"Mean absolute error: {abs_err.mean():.1f}m  Max: {abs_err.max():.1f}m")
+
+    print(f"\n{'From':<24} {'To':<24} {'Survey (m)':>10} {'Network (m)':>12} {'Diff (m)':>10}")
+    print("-" * 84)
+    for row in result.head(top).itertuples():
+        network = f"{row.network_m:.0f}" if np.isfinite(row.network_m) else "unreach."
+        diff = f"{row.difference_m:+.0f}" if np.isfinite(row.difference_m) else "-"
+        print(f"{row.stop_from[:24]:<24} {row.stop_to[:24]:<24} {row.surveyed_m:>10.0f} {network:>12} {diff:>10}")
+
+
+if __name__ == "__main__":
+    net_file = sys.argv[1] if len(sys.argv) > 1 else "Test1.net.xml"
+    matrix_dir = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_MATRIX_DIR
+    map_file = sys.argv[2] if len(sys.argv) > 2 else os.path.join(matrix_dir, DEFAULT_STOP_MAP)
+
+    matrices = load_distance_matrices(matrix_dir)
+    if not matrices:
+        print(f"No distance matrices found in: {matrix_dir}")
+        sys.exit(1)
+
+    pairs = surveyed_pairs(matrices)
+    print(f"✓ Loaded {len(matrices)} surveyed matrices, {len(pairs)} stop pairs, "
+          f"{pairs['stop_from'].nunique()} stops")
+
+    stop_map = load_stop_map(map_file, pairs['stop_from'])
+    graph = load_network_graph(net_file)
+    result = validate_against_network(graph, pairs, stop_map)
+    print_validation_report(result, survey_inconsistencies(pairs))
+
+    if not result.empty:
+        output_file = 'stop_distance_validation.csv'
+        result.to_csv(output_file, index=False)
+        print(f"\n✓ Full comparison exported: {output_file}")
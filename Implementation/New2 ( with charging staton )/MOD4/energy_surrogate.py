@@ -0,0 +1,303 @@
+"""
+Energy Consumption Surrogate Model
+Fits a per-vType regression of battery power on speed, acceleration and
+slope from logged battery_data_*.csv samples, then estimates the energy of
+every vType on every edge and route of the network in one vectorized pass,
+so scenarios can be screened without running SUMO.
+
+Power model (per vType, least squares):
+    P = b0 + b1*v + b2*v*a+ + b3*v*a- + b4*v^3 + b5*v*sin(slope)
+i.e. auxiliary load, rolling resistance, inertia (driving/braking), aero drag
+and grade, with coefficients learned from the SUMO battery device.
+
+Usage:
+    python energy_surrogate.py fit simulation_outputs/battery_data_*.csv
+    python energy_surrogate.py predict [net_file] [route_file]
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as ET
+from network_analyzer import load_network_graph, segment_sums
+
+MODEL_FILE = 'energy_surrogate.json'
+FEATURES = ['constant', 'speed', 'speed_x_accel_pos', 'speed_x_accel_neg', 'speed_cubed', 'speed_x_grade']
+HOLDOUT_FRACTION = 0.2
+
+
+def _feature_matrix(speed, accel, slope_deg):
+    """Design matrix for the power model (one row per sample)"""
+    speed = np.asarray(speed, dtype=np.float64)
+    accel = np.asarray(accel, dtype=np.float64)
+    grade = np.sin(np.radians(np.asarray(slope_deg, dtype=np.float64)))
+    return np.column_stack([
+        np.ones_like(speed),
+        speed,
+        speed * np.maximum(accel, 0),
+        speed * np.minimum(accel, 0),
+        speed ** 3,
+        speed * grade
+    ])
+
+
+def prepare_samples(df):
+    """
+    Turn cumulative battery logs into per-interval power samples
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        battery_data rows (timestep_sec, vehicle_id, vehicle_type, speed_ms,
+        totalEnergyConsumed_Wh and optionally acceleration_ms2, slope_deg, run)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns: run, vehicle_id, vehicle_type, dt, speed, accel, slope, power_W
+    """
+    if 'run' not in df.columns:
+        df = df.assign(run=0)
+    df = df.sort_values(['run', 'vehicle_id', 'timestep_sec'], kind='stable')
+    grouped = df.groupby(['run', 'vehicle_id'], sort=False)
+
+    dt = grouped['timestep_sec'].diff().to_numpy()
+    energy = grouped['totalEnergyConsumed_Wh'].diff().to_numpy()
+    speed = df['speed_ms'].to_numpy(dtype=np.float64)
+    if 'acceleration_ms2' in df.columns:
+        accel = df['acceleration_ms2'].to_numpy(dtype=np.float64)
+    else:
+        accel = grouped['speed_ms'].diff().to_numpy() / dt
+    slope = df['slope_deg'].to_numpy(dtype=np.float64) if 'slope_deg' in df.columns else np.zeros(len(df))
+
+    valid = np.isfinite(dt) & (dt > 0) & np.isfinite(energy) & np.isfinite(accel)
+    return pd.DataFrame({
+        'run': df['run'].to_numpy()[valid],
+        'vehicle_id': df['vehicle_id'].to_numpy()[valid],
+        'vehicle_type': df['vehicle_type'].to_numpy()[valid],
+        'dt': dt[valid],
+        'speed': speed[valid],
+        'accel': accel[valid],
+        'slope': slope[valid],
+        'power_W': energy[valid] / dt[valid] * 3600
+    })
+
+
+def fit_surrogate(samples):
+    """
+    Fit the power model for every vType
+
+    Returns:
+    --------
+    dict
+        vType -> {'coef': [...], 'samples': n, 'train_rmse_W': float}
+    """
+    model = {}
+    for vtype, group in samples.groupby('vehicle_type'):
+        X = _feature_matrix(group['speed'], group['accel'], group['slope'])
+        y = group['power_W'].to_numpy()
+        coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+        residual = X @ coef - y
+        model[vtype] = {
+            'coef': coef.tolist(),
+            'samples': int(len(y)),
+            'train_rmse_W': float(np.sqrt(np.mean(residual ** 2)))
+        }
+    return model
+
+
+def predict_power(model, vtype, speed, accel, slope_deg=0.0):
+    """Predicted battery power (W) of one vType for arrays of speed/accel/slope"""
+    speed = np.asarray(speed, dtype=np.float64)
+    X = _feature_matrix(speed, np.broadcast_to(accel, speed.shape), np.broadcast_to(slope_deg, speed.shape))
+    return X @ np.asarray(model[vtype]['coef'])
+
+
+def split_holdout(samples, fraction=HOLDOUT_FRACTION, seed=42):
+    """
+    Split samples into training and held-out sets
+
+    With several runs the last run is held out; with a single run a seeded
+    random subset of vehicles is held out, so no trip is split across sets.
+    """
+    runs = samples['run'].unique()
+    if len(runs) > 1:
+        test_mask = samples['run'] == runs[-1]
+    else:
+        vehicles = samples['vehicle_id'].unique()
+        rng = np.random.default_rng(seed)
+        n_test = max(1, int(round(len(vehicles) * fraction)))
+        test_mask = samples['vehicle_id'].isin(rng.choice(vehicles, size=n_test, replace=False))
+    return samples[~test_mask], samples[test_mask]
+
+
+def evaluate_surrogate(model, samples):
+    """
+    Error of the model on held-out samples
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Per vType: step RMSE (W) and per-trip energy error (Wh, %)
+    """
+    rows = []
+    for vtype, group in samples.groupby('vehicle_type'):
+        if vtype not in model:
+            continue
+        predicted = predict_power(model, vtype, group['speed'], group['accel'], group['slope'])
+        step_rmse = np.sqrt(np.mean((predicted - group['power_W'].to_numpy()) ** 2))
+
+        trips = pd.DataFrame({
+            'trip': group['run'].astype(str) + ':' + group['vehicle_id'].astype(str),
+            'actual_Wh': group['power_W'] * group['dt'] / 3600,
+            'predicted_Wh': predicted * group['dt'].to_numpy() / 3600
+        }).groupby('trip').sum()
+        error = trips['predicted_Wh'] - trips['actual_Wh']
+        actual = trips['actual_Wh'].abs()
+        rows.append({
+            'vehicle_type': vtype,
+            'trips': len(trips),
+            'step_rmse_W': step_rmse,
+            'trip_mae_Wh': error.abs().mean(),
+            'trip_mape_percent': (error.abs() / actual)[actual > 0].mean() * 100
+        })
+    return pd.DataFrame(rows)
+
+
+def save_surrogate(model, path=MODEL_FILE):
+    with open(path, 'w') as f:
+        json.dump({'features': FEATURES, 'vtypes': model}, f, indent=2)
+
+
+def load_surrogate(path=MODEL_FILE):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('features') != FEATURES:
+        raise ValueError(f"{path} was fitted with a different feature set")
+    return data['vtypes']
+
+
+def read_route_file(route_file):
+    """Return ({route_id: edges}, {vType_id: attributes}) from a .rou.xml"""
+    root = ET.parse(route_file).getroot()
+    routes = {route.get('id'): route.get('edges', '').split()
+              for route in root.iter('route') if route.get('id')}
+    vtypes = {vtype.get('id'): dict(vtype.attrib) for vtype in root.iter('vType')}
+    return routes, vtypes
+
+
+def edge_energy_matrix(model, graph, vtypes):
+    """
+    Cruise energy of every vType on every edge
+
+    Each vType drives an edge at min(speed limit * speedFactor, maxSpeed).
+
+    Returns:
+    --------
+    (names, energy_Wh, cruise_speed) : (list, ndarray, ndarray)
+        energy_Wh and cruise_speed have shape (n_vtypes, n_edges)
+    """
+    names = [name for name in vtypes if name in model]
+    speed_factor = np.array([float(vtypes[name].get('speedFactor', 1.0)) for name in names])
+    max_speed = np.array([float(vtypes[name].get('maxSpeed', 55.55)) for name in names])
+    cruise = np.minimum(graph.edge_speed[None, :] * speed_factor[:, None], max_speed[:, None])
+    cruise = np.maximum(cruise, 0.1)
+
+    coef = np.array([model[name]['coef'] for name in names])  # (n_vtypes, n_features)
+    features = _feature_matrix(cruise.ravel(), 0.0 * cruise.ravel(), 0.0 * cruise.ravel())
+    power = np.einsum('tnf,tf->tn', features.reshape(len(names), graph.n_edges, -1), coef)
+    energy = power * (graph.edge_length[None, :] / cruise) / 3600
+    return names, energy, cruise
+
+
+def route_energy_table(model, graph, routes, vtypes):
+    """
+    Estimated energy (Wh) of every vType on every route
+
+    Route energy is the sum of edge cruise energies plus one start-up from
+    standstill to the first edge's cruise speed at the vType's accel.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Index: route IDs; columns: vType IDs (NaN for routes with unknown edges)
+    """
+    names, energy, cruise = edge_energy_matrix(model, graph, vtypes)
+    route_ids = list(routes)
+    edges, offsets = graph.route_edge_indices([routes[route_id] for route_id in route_ids])
+
+    valid_edge = edges >= 0
+    gathered = np.where(valid_edge[None, :], energy[:, np.maximum(edges, 0)], 0.0)
+    totals = segment_sums(gathered, valid_edge, offsets)
+
+    accel = np.array([float(vtypes[name].get('accel', 2.6)) for name in names])
+    first = np.where(np.diff(offsets) > 0, edges[np.minimum(offsets[:-1], max(len(edges) - 1, 0))], -1)
+    for t, name in enumerate(names):
+        v = cruise[t, np.maximum(first, 0)]
+        duration = v / accel[t]
+        startup = predict_power(model, name, v / 2, accel[t]) * duration / 3600
+        totals[t] += np.where(first >= 0, startup, 0.0)
+
+    return pd.DataFrame(totals.T, index=route_ids, columns=names)
+
+
+def load_battery_logs(files):
+    """Concatenate battery_data CSVs, tagging each file as its own run"""
+    frames = [pd.read_csv(path).assign(run=i) for i, path in enumerate(files)]
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('fit', 'predict'):
+        print(__doc__)
+        sys.exit(0)
+
+    if sys.argv[1] == 'fit':
+        files = sys.argv[2:]
+        if not files:
+            print("Give one or more battery_data_*.csv files")
+            sys.exit(1)
+
+        samples = prepare_samples(load_battery_logs(files))
+        train, test = split_holdout(samples)
+        print(f"✓ {len(samples)} power samples ({len(train)} train / {len(test)} held out)")
+
+        model = fit_surrogate(train)
+        print("\nHeld-out error:")
+        print(evaluate_surrogate(model, test).to_string(index=False))
+
+        # Final model uses every sample
+        model = fit_surrogate(samples)
+        save_surrogate(model)
+        print(f"\n✓ Model saved: {MODEL_FILE}")
+
+    else:
+        net_file = sys.argv[2] if len(sys.argv) > 2 else "Test1.net.xml"
+        route_file = sys.argv[3] if len(sys.argv) > 3 else "Test1.rou.xml"
+        if not os.path.exists(MODEL_FILE):
+            print(f"Model not found: {MODEL_FILE} (run 'fit' first)")
+            sys.exit(1)
+
+        model = load_surrogate()
+        graph = load_network_graph(net_file)
+        routes, vtypes = read_route_file(route_file)
+
+        start = time.perf_counter()
+        table = route_energy_table(model, graph, routes, vtypes)
+        elapsed = time.perf_counter() - start
+
+        print("\n" + "="*80)
+        print("ESTIMATED ROUTE ENERGY (Wh) BY VEHICLE TYPE")
+        print("="*80)
+        print(table.round(1).to_string())
+        print(f"\n✓ {table.size} route/vType estimates in {elapsed * 1000:.2f} ms")
+
+        output_file = 'route_energy_estimates.csv'
+        table.to_csv(output_file, index_label='route_id')
+        names, edge_energy, _ = edge_energy_matrix(model, graph, vtypes)
+        edge_file = 'edge_energy_estimates.csv'
+        pd.DataFrame(edge_energy.T, index=graph.edge_ids, columns=names).to_csv(edge_file, index_label='edge_id')
+        print(f"✓ Estimates exported: {output_file}, {edge_file}")
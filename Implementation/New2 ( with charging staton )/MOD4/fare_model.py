@@ -0,0 +1,235 @@
+"""
+Fare and Operator Revenue Model
+Connects the surveyed easy-bike fare (d-30-06-25/Cost Per kilo @ Easy Bike.txt:
+about 3.5 Tk/km) to simulated trips: per-trip fare, energy cost (net Wh at
+the battery / charger efficiency x electricity tariff) and margin, computed
+as whole-column array operations over trip tables of any number of runs.
+
+fare_tariff_grid() evaluates fleet margin for every combination of fare and
+tariff in one broadcast, for scenario screening.
+
+trip_summary_<timestamp>.csv inputs take their energy from the
+battery_data_<timestamp>.csv written next to them by the same run.
+
+Usage:
+    python fare_model.py [tripinfo.xml | trip_summary_<timestamp>.csv ...] [--fare 3.5] [--tariff 10]
+"""
+
+import os
+import sys
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+
+FARE_PER_KM = 3.5  # Tk/km, surveyed easy-bike fare
+FARES_BY_VTYPE = {'easyBike': FARE_PER_KM}
+ELECTRICITY_TARIFF = 10.0  # Tk/kWh at the charger
+CHARGER_EFFICIENCY = 0.9
+OCCUPANCY_BY_VTYPE = {}  # paying passengers per trip (default 1)
+
+
+def read_tripinfo(xml_file):
+    """
+    Trips of a SUMO tripinfo output as a DataFrame
+
+    Returns:
+    --------
+    pandas.DataFrame
+        vehicle_id, vehicle_type, distance_m, duration_sec, waiting_time_sec,
+        energy_consumed_Wh, energy_regenerated_Wh (NaN without a battery device)
+    """
+    rows = []
+    for _, elem in ET.iterparse(xml_file, events=('end',)):
+        if elem.tag != 'tripinfo':
+            continue
+        battery = elem.find('battery')
+        rows.append({
+            'vehicle_id': elem.get('id'),
+            'vehicle_type': elem.get('vType'),
+            'distance_m': float(elem.get('routeLength', 0)),
+            'duration_sec': float(elem.get('duration', 0)),
+            'waiting_time_sec': float(elem.get('waitingTime', 0)),
+            'energy_consumed_Wh': float(battery.get('totalEnergyConsumed', 'nan')) if battery is not None else np.nan,
+            'energy_regenerated_Wh': float(battery.get('totalEnergyRegenerated', 0)) if battery is not None else np.nan
+        })
+        elem.clear()
+    return pd.DataFrame(rows)
+
+
+def read_trip_summary(csv_file, battery_csv=None):
+    """
+    Trips from the exporter's trip_summary CSV (energy from battery_data if given)
+    """
+    trips = pd.read_csv(csv_file)
+    result = pd.DataFrame({
+        'vehicle_id': trips['vehicle_id'],
+        'vehicle_type': trips['vehicle_type'],
+        'distance_m': trips['final_distance'],
+        'duration_sec': np.nan,
+        'energy_consumed_Wh': np.nan,
+        'energy_regenerated_Wh': np.nan
+    })
+    if battery_csv is not None:
+        energy = pd.read_csv(battery_csv).groupby('vehicle_id')[
+            ['totalEnergyConsumed_Wh', 'totalEnergyRegenerated_Wh']].max()
+        result['energy_consumed_Wh'] = result['vehicle_id'].map(energy['totalEnergyConsumed_Wh'])
+        result['energy_regenerated_Wh'] = result['vehicle_id'].map(energy['totalEnergyRegenerated_Wh'])
+    return result
+
+
+def battery_csv_for(trip_csv):
+    """The battery_data CSV written by the same run as a trip_summary CSV (None if absent)"""
+    folder, name = os.path.split(trip_csv)
+    if not name.startswith('trip_summary_'):
+        return None
+    battery_csv = os.path.join(folder, 'battery_data_' + name[len('trip_summary_'):])
+    return battery_csv if os.path.exists(battery_csv) else None
+
+
+def load_trip_tables(files):
+    """
+    Read tripinfo XML / trip_summary CSV files into one table with a run column
+
+    A trip_summary CSV is paired with its run's battery_data CSV; entries
+    may also be explicit (trip_summary_csv, battery_csv) pairs.
+    """
+    frames = []
+    for path in files:
+        if isinstance(path, tuple):
+            path, battery_csv = path
+            trips = read_trip_summary(path, battery_csv)
+        elif path.endswith('.xml'):
+            trips = read_tripinfo(path)
+        else:
+            trips = read_trip_summary(path, battery_csv_for(path))
+        if trips['energy_consumed_Wh'].isna().all() and len(trips):
+            print(f"⚠ No battery energy for {path}: energy cost and margin will be NaN")
+        frames.append(trips.assign(run=path))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _per_type(vehicle_types, table, default):
+    """Look up a per-vType parameter for every trip"""
+    return vehicle_types.map(table).fillna(default).to_numpy(dtype=np.float64)
+
+
+def trip_economics(trips, fare_per_km=None, tariff=ELECTRICITY_TARIFF, efficiency=CHARGER_EFFICIENCY,
+                   occupancy=None):
+    """
+    Fare, energy cost and margin of every trip
+
+    Parameters:
+    -----------
+    trips : pandas.DataFrame
+        Output of read_tripinfo / load_trip_tables
+    fare_per_km : float or dict, optional
+        Tk/km for all vTypes, or per vType (default FARES_BY_VTYPE, 3.5 otherwise)
+    tariff : float
+        Electricity price (Tk/kWh) paid at the charger
+    efficiency : float
+        Charger efficiency (grid kWh = battery kWh / efficiency)
+    occupancy : dict, optional
+        Paying passengers per trip by vType (default 1)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        trips with distance_km, fare_Tk, net_energy_kWh, energy_cost_Tk,
+        margin_Tk and margin_per_km_Tk added
+    """
+    if fare_per_km is None:
+        fare_per_km = FARES_BY_VTYPE
+    vtypes = trips['vehicle_type']
+    rate = (_per_type(vtypes, fare_per_km, FARE_PER_KM) if isinstance(fare_per_km, dict)
+            else np.full(len(trips), float(fare_per_km)))
+    passengers = _per_type(vtypes, occupancy or OCCUPANCY_BY_VTYPE, 1.0)
+
+    distance_km = trips['distance_m'].to_numpy(dtype=np.float64) / 1000
+    net_Wh = (trips['energy_consumed_Wh'].to_numpy(dtype=np.float64)
+              - np.nan_to_num(trips['energy_regenerated_Wh'].to_numpy(dtype=np.float64)))
+    fare = rate * distance_km * passengers
+    energy_cost = net_Wh / 1000 / efficiency * tariff
+
+    result = trips.copy()
+    result['distance_km'] = distance_km
+    result['fare_Tk'] = fare
+    result['net_energy_kWh'] = net_Wh / 1000
+    result['energy_cost_Tk'] = energy_cost
+    result['margin_Tk'] = fare - energy_cost
+    result['margin_per_km_Tk'] = np.divide(fare - energy_cost, distance_km,
+                                           out=np.full(len(trips), np.nan), where=distance_km > 0)
+    return result
+
+
+def summarize_economics(economics, by=('run', 'vehicle_type')):
+    """Totals and per-km figures grouped by run and vType (or any columns)"""
+    by = [column for column in by if column in economics.columns]
+    summary = economics.groupby(by).agg(
+        Trips=('vehicle_id', 'count'),
+        Distance_km=('distance_km', 'sum'),
+        Fare_Tk=('fare_Tk', 'sum'),
+        Energy_kWh=('net_energy_kWh', 'sum'),
+        Energy_Cost_Tk=('energy_cost_Tk', 'sum'),
+        Margin_Tk=('margin_Tk', 'sum')
+    ).reset_index()
+    summary['Margin_per_km_Tk'] = summary['Margin_Tk'] / summary['Distance_km'].where(summary['Distance_km'] > 0)
+    summary['Energy_Cost_Share_Percent'] = summary['Energy_Cost_Tk'] / summary['Fare_Tk'].where(summary['Fare_Tk'] > 0) * 100
+    return summary
+
+
+def fare_tariff_grid(trips, fares, tariffs, efficiency=CHARGER_EFFICIENCY, occupancy=None):
+    """
+    Fleet margin of every run for every (fare, tariff) combination
+
+    Fare and energy cost are linear in the fare and tariff, so each run is
+    reduced to its passenger-km and grid kWh once and the whole grid is a
+    single broadcast.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        run, fare_per_km, tariff, margin_Tk (len(runs) x len(fares) x len(tariffs) rows)
+    """
+    fares = np.asarray(fares, dtype=np.float64)
+    tariffs = np.asarray(tariffs, dtype=np.float64)
+    base = trip_economics(trips, fare_per_km=1.0, tariff=1.0, efficiency=efficiency, occupancy=occupancy)
+    runs = base.groupby('run')[['fare_Tk', 'energy_cost_Tk']].sum()  # passenger-km, grid kWh
+
+    margin = (runs['fare_Tk'].to_numpy()[:, None, None] * fares[None, :, None]
+              - runs['energy_cost_Tk'].to_numpy()[:, None, None] * tariffs[None, None, :])
+    n_runs = len(runs)
+    return pd.DataFrame({
+        'run': np.repeat(runs.index.to_numpy(), len(fares) * len(tariffs)),
+        'fare_per_km': np.tile(np.repeat(fares, len(tariffs)), n_runs),
+        'tariff': np.tile(tariffs, n_runs * len(fares)),
+        'margin_Tk': margin.ravel()
+    })
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--fare': None, '--tariff': ELECTRICITY_TARIFF}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = float(args[position + 1])
+            del args[position:position + 2]
+    files = args or ['tripinfo.xml']
+
+    missing = [path for path in files if not os.path.exists(path)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    trips = load_trip_tables(files)
+    economics = trip_economics(trips, fare_per_km=options['--fare'], tariff=options['--tariff'])
+
+    print("\n" + "="*80)
+    print(f"FARE AND ENERGY ECONOMICS (tariff {options['--tariff']:.2f} Tk/kWh)")
+    print("="*80)
+    summary = summarize_economics(economics)
+    print(summary.round(2).to_string(index=False))
+
+    output_file = 'trip_economics.csv'
+    economics.to_csv(output_file, index=False)
+    print(f"\n✓ Per-trip economics exported: {output_file}")
@@ -0,0 +1,319 @@
+"""
+FCD Time/Vehicle Index for Random-Access Queries
+Records the byte offset of every <timestep> in fcd.xml (and optionally which
+timesteps each vehicle appears in) so that one vehicle or one time window can
+be read by seeking straight to the relevant bytes instead of parsing the file.
+
+Usage:
+    python fcd_index.py fcd.xml                      # build/refresh the index
+    python fcd_index.py fcd.xml 100 110              # all vehicles, t=100..110
+    python fcd_index.py fcd.xml 100 110 easybike_01  # one vehicle, t=100..110
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import bisect
+import xml.etree.ElementTree as ET
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx.json'
+
+# SUMO writes one element per line with `time`/`id` as the first attribute,
+# so a byte-level regex is enough to find every timestep and vehicle
+_STEP_RE = re.compile(rb'<timestep time="([^"]*)"\s*(/?)>|</timestep>|</fcd-export>')
+_STEP_VEHICLE_RE = re.compile(
+    rb'<timestep time="([^"]*)"\s*(/?)>|</timestep>|</fcd-export>|<vehicle id="([^"]*)"'
+)
+
+
+def index_path_for(fcd_file):
+    """Return the path of the index file kept next to an FCD file"""
+    return fcd_file + INDEX_SUFFIX
+
+
+def _empty_index(fcd_file, per_vehicle):
+    return {
+        'version': INDEX_VERSION,
+        'source': os.path.basename(fcd_file),
+        'source_size': 0,
+        'source_mtime': 0,
+        'per_vehicle': per_vehicle,
+        'complete': False,
+        'times': [],
+        'offsets': [],
+        'end_offset': 0,
+        'postings': {}
+    }
+
+
+def _scan(fcd_file, index):
+    """Scan the FCD file from index['end_offset'] and extend the index in place"""
+    size = os.path.getsize(fcd_file)
+    if size == 0:
+        return index
+
+    per_vehicle = index['per_vehicle']
+    pattern = _STEP_VEHICLE_RE if per_vehicle else _STEP_RE
+    times = index['times']
+    offsets = index['offsets']
+    postings = index['postings']
+
+    with open(fcd_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Only whole timesteps are indexed; a partially written step at the
+            # end of a live file is re-scanned on the next refresh
+            end_offset = index['end_offset']
+            open_start = None
+            step = len(times) - 1
+            pending = []
+
+            for match in pattern.finditer(mm, end_offset):
+                if match.group(1) is not None:
+                    open_start = match.start()
+                    pending = []
+                    if match.group(2):  # self-closing empty timestep
+                        times.append(float(match.group(1)))
+                        offsets.append(open_start)
+                        step += 1
+                        end_offset = match.end()
+                        open_start = None
+                elif match.group(0) == b'</timestep>':
+                    if open_start is None:
+                        continue
+                    time_match = _STEP_RE.match(mm, open_start)
+                    times.append(float(time_match.group(1)))
+                    offsets.append(open_start)
+                    step += 1
+                    end_offset = match.end()
+                    for veh_id in pending:
+                        runs = postings.setdefault(veh_id, [])
+                        if runs and runs[-1][1] == step - 1:
+                            runs[-1][1] = step
+                        else:
+                            runs.append([step, step])
+                    pending = []
+                    open_start = None
+                elif match.group(0) == b'</fcd-export>':
+                    index['complete'] = True
+                    break
+                elif open_start is not None:
+                    pending.append(match.group(3).decode('utf-8'))
+
+    index['end_offset'] = end_offset
+    stat = os.stat(fcd_file)
+    index['source_size'] = stat.st_size
+    index['source_mtime'] = stat.st_mtime
+    return index
+
+
+def build_fcd_index(fcd_file, per_vehicle=False, save=True):
+    """Build the timestep (and optional per-vehicle) index for an FCD file"""
+    index = _scan(fcd_file, _empty_index(fcd_file, per_vehicle))
+    if save:
+        save_fcd_index(fcd_file, index)
+    return index
+
+
+def save_fcd_index(fcd_file, index):
+    """Persist the index next to the FCD file"""
+    with open(index_path_for(fcd_file), 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+
+
+def load_fcd_index(fcd_file, per_vehicle=False):
+    """
+    Load the persisted index, refreshing it if the FCD file changed
+
+    A file that only grew since the last scan (a simulation still writing) is
+    scanned incrementally from the last indexed timestep; anything else
+    triggers a full rebuild.
+    """
+    path = index_path_for(fcd_file)
+    index = None
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+
+    if (index is None or index.get('version') != INDEX_VERSION
+            or (per_vehicle and not index.get('per_vehicle'))):
+        return build_fcd_index(fcd_file, per_vehicle=per_vehicle)
+
+    stat = os.stat(fcd_file)
+    if stat.st_size == index['source_size'] and stat.st_mtime == index['source_mtime']:
+        return index
+
+    if stat.st_size > index['source_size'] and not index['complete']:
+        _scan(fcd_file, index)
+    else:
+        index = _scan(fcd_file, _empty_index(fcd_file, index['per_vehicle']))
+    save_fcd_index(fcd_file, index)
+    return index
+
+
+def _parse_value(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class FCDIndex:
+    """
+    Random-access view over an indexed fcd.xml
+
+    Parameters:
+    -----------
+    fcd_file : str
+        Path to the FCD output written by SUMO
+    per_vehicle : bool
+        Also record which timesteps each vehicle appears in, so vehicle
+        queries only read the steps that contain those vehicles
+    """
+
+    def __init__(self, fcd_file, per_vehicle=False):
+        self.fcd_file = fcd_file
+        self.index = load_fcd_index(fcd_file, per_vehicle=per_vehicle)
+
+    def refresh(self):
+        """Pick up timesteps appended since the index was loaded"""
+        self.index = load_fcd_index(self.fcd_file, per_vehicle=self.index['per_vehicle'])
+
+    @property
+    def times(self):
+        return self.index['times']
+
+    def __len__(self):
+        return len(self.index['times'])
+
+    def time_range(self):
+        """Return (first, last) indexed simulation time, or None if empty"""
+        times = self.index['times']
+        if not times:
+            return None
+        return times[0], times[-1]
+
+    def vehicles(self):
+        """Return the vehicle IDs known to the per-vehicle postings"""
+        return sorted(self.index['postings'])
+
+    def _step_bounds(self, step):
+        offsets = self.index['offsets']
+        start = offsets[step]
+        end = offsets[step + 1] if step + 1 < len(offsets) else self.index['end_offset']
+        return start, end
+
+    def _step_runs(self, first, last, vehicles):
+        """Return contiguous [first, last] step runs that need to be read"""
+        if vehicles is None or not self.index['per_vehicle']:
+            return [(first, last)]
+
+        steps = set()
+        postings = self.index['postings']
+        for veh_id in vehicles:
+            for run_start, run_end in postings.get(veh_id, []):
+                lo = max(run_start, first)
+                hi = min(run_end, last)
+                if lo <= hi:
+                    steps.update(range(lo, hi + 1))
+
+        runs = []
+        for step in sorted(steps):
+            if runs and runs[-1][1] == step - 1:
+                runs[-1][1] = step
+            else:
+                runs.append([step, step])
+        return runs
+
+    def slice(self, t0, t1, vehicles=None):
+        """
+        Return FCD records with t0 <= time <= t1
+
+        Parameters:
+        -----------
+        t0, t1 : float
+            Inclusive simulation time window (seconds)
+        vehicles : list of str, optional
+            Restrict the result to these vehicle IDs
+
+        Returns:
+        --------
+        list of dict
+            One record per vehicle per timestep with numeric attributes
+            converted to float and the timestep stored under 'time'
+        """
+        times = self.index['times']
+        first = bisect.bisect_left(times, t0)
+        last = bisect.bisect_right(times, t1) - 1
+        if first > last:
+            return []
+
+        wanted = set(vehicles) if vehicles is not None else None
+        records = []
+
+        with open(self.fcd_file, 'rb') as f:
+            for run_first, run_last in self._step_runs(first, last, wanted):
+                start, _ = self._step_bounds(run_first)
+                _, end = self._step_bounds(run_last)
+                f.seek(start)
+                chunk = f.read(end - start)
+
+                root = ET.fromstring(b'<fcd-export>' + chunk + b'</fcd-export>')
+                for timestep in root.iter('timestep'):
+                    step_time = float(timestep.get('time'))
+                    for vehicle in timestep.findall('vehicle'):
+                        if wanted is not None and vehicle.get('id') not in wanted:
+                            continue
+                        record = {'time': step_time}
+                        for key, value in vehicle.attrib.items():
+                            record[key] = value if key in ('id', 'type', 'lane', 'edge') else _parse_value(value)
+                        records.append(record)
+
+        return records
+
+    def vehicle_trace(self, veh_id):
+        """Return every FCD record of one vehicle"""
+        time_range = self.time_range()
+        if time_range is None:
+            return []
+        return self.slice(time_range[0], time_range[1], vehicles=[veh_id])
+
+
+def open_fcd(fcd_file='fcd.xml', per_vehicle=True):
+    """Open an FCD file for random-access queries, building its index if needed"""
+    return FCDIndex(fcd_file, per_vehicle=per_vehicle)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] == "--help":
+        print(__doc__)
+        sys.exit(0)
+
+    fcd_file = sys.argv[1]
+    if not os.path.exists(fcd_file):
+        print(f"FCD file not found: {fcd_file}")
+        sys.exit(1)
+
+    fcd = open_fcd(fcd_file, per_vehicle=True)
+    time_range = fcd.time_range()
+    print(f"✓ Indexed {len(fcd)} timesteps, {len(fcd.vehicles())} vehicles: {index_path_for(fcd_file)}")
+    if time_range:
+        print(f"  Time range: {time_range[0]:.1f}s → {time_range[1]:.1f}s")
+
+    if len(sys.argv) >= 4:
+        t0, t1 = float(sys.argv[2]), float(sys.argv[3])
+        vehicles = sys.argv[4:] or None
+
+        current_time = None
+        for record in fcd.slice(t0, t1, vehicles=vehicles):
+            if record['time'] != current_time:
+                current_time = record['time']
+                print(f"\n⏰ Time: {current_time:.1f}s")
+                print("-" * 60)
+            print(f"🚗 {record['id']:8} [{record.get('type', 'unknown'):8}] Speed: {record.get('speed', 0):5.1f}m/s  "
+                  f"Pos: ({record.get('x', 0):6.1f}, {record.get('y', 0):6.1f})  Angle: {record.get('angle', 0):6.1f}°")
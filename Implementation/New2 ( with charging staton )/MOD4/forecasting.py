@@ -0,0 +1,321 @@
+"""
+Charging Load Forecasting Baselines
+Builds windowed supervised datasets from the per-station load series of
+load_aggregator.py (zero-copy with sliding_window_view) and trains and
+evaluates CPU baselines for every station in parallel:
+
+    seasonal_naive    y[t+h] = y[t+h-k*season], the same bin one (or k, for h > season)
+                      seasons before, read from the series itself; windows
+                      whose target is less than a season into the series
+                      are not scored
+    ar                ARIMA-style autoregression on the last `lags` values
+    gradient_boosting sklearn HistGradientBoostingRegressor (if installed)
+
+Fitted models are cached by a hash of their training data. The AR model is
+fitted from per-run sufficient statistics (X'X, X'y), so adding a run only
+computes the statistics of the new run; stations whose data did not change
+reuse their cached boosting model.
+
+Usage:
+    python forecasting.py charging_load_60s.csv [--lags 12] [--horizon 1]
+    python forecasting.py chargingstations.xml [more.xml ...] [--resolution 60]
+"""
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from load_aggregator import parse_resolution, load_runs, aggregate_load
+
+try:
+    from sklearn.ensemble import HistGradientBoostingRegressor
+except ImportError:
+    HistGradientBoostingRegressor = None
+
+CACHE_DIR = '.forecast_cache'
+DEFAULT_LAGS = 12
+DEFAULT_HORIZON = 1
+TEST_FRACTION = 0.2
+AR_RIDGE = 1e-6
+SECONDS_PER_DAY = 86400
+SECONDS_PER_HOUR = 3600
+
+
+def make_windows(series, lags, horizon=1):
+    """
+    Supervised (X, y) pairs from one series without copying it
+
+    Returns:
+    --------
+    (X, y) : (ndarray view, ndarray view)
+        X[i] = series[i:i + lags], y[i] = series[i + lags + horizon - 1]
+    """
+    series = np.ascontiguousarray(series, dtype=np.float64)
+    if len(series) < lags + horizon:
+        return np.zeros((0, lags)), np.zeros(0)
+    windows = sliding_window_view(series, lags + horizon)
+    return windows[:, :lags], windows[:, -1]
+
+
+def data_hash(*arrays, **params):
+    """SHA-1 over array contents and fitting parameters"""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+def _cached(cache_dir, key, build):
+    """
+    Return (value, hit): the pickled value stored under key, or a freshly
+    built one (stored for next time) with hit=False
+    """
+    if cache_dir is None:
+        return build(), False
+    path = os.path.join(cache_dir, key + '.pkl')
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f), True
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    value = build()
+    # A private temp file per writer: pool workers can build the same key at once
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp.pkl')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return value, False
+
+
+def ar_statistics(series, lags, horizon):
+    """X'X and X'y of one series (with an intercept column) for the AR model"""
+    X, y = make_windows(series, lags, horizon)
+    X1 = np.column_stack([np.ones(len(X)), X])
+    return X1.T @ X1, X1.T @ y
+
+
+def seasonal_naive_forecast(series, lags, horizon, season):
+    """
+    Seasonal naive predictions and targets of one series
+
+    Uses the same windows as make_windows, minus those whose target has no
+    observed value a whole number of seasons earlier.
+
+    Returns:
+    --------
+    (predicted, actual) : (ndarray, ndarray)
+    """
+    series = np.asarray(series, dtype=np.float64)
+    # Go back enough seasons that the value is observed at the forecast origin
+    back = season * ((horizon - 1) // season + 1)
+    targets = np.arange(lags + horizon - 1, len(series))
+    targets = targets[targets >= back]
+    return series[targets - back], series[targets]
+
+
+def forecast_station(station, train_series, test_series, lags=DEFAULT_LAGS, horizon=DEFAULT_HORIZON,
+                     season=1, cache_dir=CACHE_DIR):
+    """
+    Fit and evaluate every baseline for one station
+
+    Parameters:
+    -----------
+    station : str
+    train_series, test_series : list of ndarray
+        Load series (kW), one per run
+    season : int
+        Seasonal period in bins for the seasonal naive model
+
+    Returns:
+    --------
+    list of dict
+        One row per model: station, model, windows, mae_kW, rmse_kW, cached
+    """
+    train = [np.asarray(s, dtype=np.float64) for s in train_series if len(s) >= lags + horizon]
+    test = [np.asarray(s, dtype=np.float64) for s in test_series if len(s) >= lags + horizon]
+    if not train or not test:
+        return []
+
+    pairs = [make_windows(s, lags, horizon) for s in test]
+    X_test = np.concatenate([X for X, _ in pairs])
+    y_test = np.concatenate([y for _, y in pairs])
+    predictions = {}
+    targets = {}
+    cache_hits = {}
+
+    seasonal = [seasonal_naive_forecast(s, lags, horizon, season) for s in test]
+    if sum(len(actual) for _, actual in seasonal):
+        predictions['seasonal_naive'] = np.concatenate([predicted for predicted, _ in seasonal])
+        targets['seasonal_naive'] = np.concatenate([actual for _, actual in seasonal])
+        cache_hits['seasonal_naive'] = False  # nothing to fit
+
+    # AR: sum of cached per-run sufficient statistics
+    hits = 0
+    XtX = np.zeros((lags + 1, lags + 1))
+    Xty = np.zeros(lags + 1)
+    for series in train:
+        key = 'ar-' + data_hash(series, lags=lags, horizon=horizon)
+        (run_XtX, run_Xty), hit = _cached(cache_dir, key, lambda: ar_statistics(series, lags, horizon))
+        hits += hit
+        XtX += run_XtX
+        Xty += run_Xty
+    coef = np.linalg.solve(XtX + AR_RIDGE * np.eye(lags + 1), Xty)
+    predictions['ar'] = coef[0] + X_test @ coef[1:]
+    cache_hits['ar'] = hits == len(train)
+
+    if HistGradientBoostingRegressor is not None:
+        train_pairs = [make_windows(s, lags, horizon) for s in train]
+        X_train = np.concatenate([X for X, _ in train_pairs])
+        y_train = np.concatenate([y for _, y in train_pairs])
+        key = 'gb-' + data_hash(X_train, y_train, lags=lags, horizon=horizon)
+        model, cache_hits['gradient_boosting'] = _cached(
+            cache_dir, key, lambda: HistGradientBoostingRegressor(max_iter=200, random_state=0).fit(X_train, y_train))
+        predictions['gradient_boosting'] = model.predict(X_test)
+
+    rows = []
+    for name, predicted in predictions.items():
+        actual = targets.get(name, y_test)
+        error = predicted - actual
+        rows.append({
+            'station': station,
+            'model': name,
+            'windows': len(actual),
+            'mae_kW': float(np.mean(np.abs(error))),
+            'rmse_kW': float(np.sqrt(np.mean(error ** 2))),
+            'cached': cache_hits[name]
+        })
+    return rows
+
+
+def _forecast_station_job(args):
+    return forecast_station(*args[:3], **args[3])
+
+
+def split_series(load, station):
+    """
+    Train/test series of one station
+
+    With several runs the last run is the test set; with one run the last
+    TEST_FRACTION of the series is.
+    """
+    station_load = load[load['station'] == station].sort_values(['run', 'time'])
+    series = [group['load_kW'].to_numpy() for _, group in station_load.groupby('run')]
+    if len(series) > 1:
+        return series[:-1], series[-1:]
+    cut = int(len(series[0]) * (1 - TEST_FRACTION))
+    return [series[0][:cut]], [series[0][cut:]]
+
+
+def default_season(resolution, test_length, lags):
+    """
+    Seasonal period in bins: one day, or one hour when the test series is
+    not longer than a day, or `lags` bins when it is not longer than an hour
+    """
+    for period in (SECONDS_PER_DAY, SECONDS_PER_HOUR):
+        season = max(int(round(period / resolution)), 1)
+        if season < test_length:
+            return season
+    return lags
+
+
+def run_forecasting(load, lags=DEFAULT_LAGS, horizon=DEFAULT_HORIZON, season=None,
+                    cache_dir=CACHE_DIR, workers=None):
+    """
+    Train and evaluate the baselines for every station with non-zero load
+
+    Parameters:
+    -----------
+    load : pandas.DataFrame
+        Long load table from load_aggregator.aggregate_load
+    season : int, optional
+        Seasonal period in bins (default: default_season at the table's
+        resolution, so that it fits inside the test series)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per station and model
+    """
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    active = load.groupby('station')['load_kW'].max()
+    stations = active[active > 0].index.tolist()
+    splits = [split_series(load, station) for station in stations]
+
+    if season is None:
+        times = np.unique(load['time'].to_numpy())
+        resolution = times[1] - times[0] if len(times) > 1 else 1.0
+        test_length = min((len(s) for _, test in splits for s in test), default=0)
+        season = default_season(resolution, test_length, lags)
+        if season * resolution < SECONDS_PER_DAY:
+            print(f"Note: test series shorter than a day, seasonal_naive uses a season of "
+                  f"{season} bins ({season * resolution:g} s)")
+
+    params = {'lags': lags, 'horizon': horizon, 'season': season, 'cache_dir': cache_dir}
+    jobs = [(station, train, test, params) for station, (train, test) in zip(stations, splits)]
+
+    if workers == 1 or len(jobs) <= 1:
+        results = [_forecast_station_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_forecast_station_job, jobs))
+
+    rows = [row for station_rows in results for row in station_rows]
+    return pd.DataFrame(rows, columns=['station', 'model', 'windows', 'mae_kW', 'rmse_kW', 'cached'])
+
+
+def read_load_table(path):
+    """Read a load table written by load_aggregator (Parquet or CSV)"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--lags': DEFAULT_LAGS, '--horizon': DEFAULT_HORIZON, '--season': None, '--resolution': 60.0}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+
+    if not args:
+        print(__doc__)
+        sys.exit(0)
+
+    if all(path.endswith('.xml') for path in args):
+        load = aggregate_load(load_runs(args), parse_resolution(options['--resolution']))
+    else:
+        load = read_load_table(args[0])
+
+    season = int(options['--season']) if options['--season'] is not None else None
+    results = run_forecasting(load, lags=int(options['--lags']), horizon=int(options['--horizon']), season=season)
+    if results.empty:
+        print("No station has enough load history to forecast")
+        sys.exit(1)
+
+    print("\n" + "="*80)
+    print("CHARGING LOAD FORECAST BASELINES (held-out error)")
+    print("="*80)
+    print(results.round(3).to_string(index=False))
+    if 'seasonal_naive' not in set(results['model']):
+        print("\n⚠ seasonal_naive skipped: the season is longer than every test series (try a smaller --season)")
+    if HistGradientBoostingRegressor is None:
+        print("\n⚠ gradient_boosting skipped: pip install scikit-learn")
+
+    output_file = 'forecast_evaluation.csv'
+    results.to_csv(output_file, index=False)
+    print(f"\n✓ Evaluation exported: {output_file}")
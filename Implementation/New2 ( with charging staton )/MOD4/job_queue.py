@@ -0,0 +1,298 @@
+"""
+SQLite Job Queue for Simulation Runs
+Distributes scenario runs over any number of worker processes on any hosts
+that share a filesystem, with no external service. `submit` enqueues runs
+(sweep.py grid points x seeds) in a SQLite file; each worker claims one job
+at a time inside an IMMEDIATE transaction (so two workers never get the same
+job), renders the variant, runs Test1SUMOExporter on it and writes the
+status and summary metrics back. Failed jobs are retried up to max_attempts;
+jobs whose worker died (no heartbeat for LEASE seconds) are claimed again.
+Heartbeats and results are only written while the worker still owns the
+job, so a stalled worker that lost its lease cannot overwrite the new
+attempt, and every attempt runs in its own job_runs/<id>_<attempt> folder.
+Throughput grows with the number of workers started.
+
+The database uses SQLite's default rollback journal rather than WAL, which
+does not work on network filesystems. Paths are stored relative to the
+database so hosts may mount the share at different places.
+
+Usage:
+    python job_queue.py submit [vType:easyBike:sigma=0.5,0.8 ...] [--seeds 5] [--retries 3]
+    python job_queue.py worker [--processes 4] [--once]
+    python job_queue.py status
+    python job_queue.py results [results.csv]
+    (all commands accept --db jobs.sqlite; submit accepts --config Test1.sumocfg)
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import threading
+import traceback
+from multiprocessing import Process
+import pandas as pd
+from sweep import SweepBase, parse_grid, expand_grid, summarize_run
+
+DB_FILE = 'jobs.sqlite'
+RUNS_DIR = 'job_runs'
+MAX_ATTEMPTS = 3
+LEASE = 300.0  # seconds without a heartbeat before a running job is reclaimed
+HEARTBEAT = 30.0
+POLL_INTERVAL = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    created_at REAL,
+    heartbeat REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+def connect(db_file=DB_FILE):
+    """Open (and create) the queue database"""
+    connection = sqlite3.connect(db_file, timeout=60, isolation_level=None)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def submit(db_file, specs, max_attempts=MAX_ATTEMPTS):
+    """
+    Enqueue jobs
+
+    Parameters:
+    -----------
+    specs : list of dict
+        sumocfg (relative to the database), point ({grid key: value}),
+        data_interval
+
+    Returns:
+    --------
+    list of int
+        Job ids
+    """
+    connection = connect(db_file)
+    now = time.time()
+    ids = []
+    connection.execute('BEGIN IMMEDIATE')
+    for spec in specs:
+        cursor = connection.execute('INSERT INTO jobs (spec, max_attempts, created_at) VALUES (?, ?, ?)',
+                                    (json.dumps(spec, sort_keys=True), max_attempts, now))
+        ids.append(cursor.lastrowid)
+    connection.execute('COMMIT')
+    connection.close()
+    return ids
+
+
+def claim(connection, worker):
+    """
+    Atomically take the oldest queued (or abandoned) job
+
+    Returns:
+    --------
+    (id, attempt, spec) or None
+    """
+    now = time.time()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        # Abandoned jobs that used up their attempts fail instead of running forever
+        connection.execute("UPDATE jobs SET status = 'failed', error = 'worker lost' "
+                           "WHERE status = 'running' AND heartbeat < ? AND attempts >= max_attempts",
+                           (now - LEASE,))
+        row = connection.execute(
+            "SELECT id, attempts + 1, spec FROM jobs WHERE status = 'queued' "
+            "OR (status = 'running' AND heartbeat < ? AND attempts < max_attempts) ORDER BY id LIMIT 1",
+            (now - LEASE,)).fetchone()
+        if row is not None:
+            connection.execute("UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                               "heartbeat = ? WHERE id = ?", (worker, now, row[0]))
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return (row[0], row[1], json.loads(row[2])) if row else None
+
+
+def finish(connection, job_id, worker, result=None, error=None):
+    """
+    Store a job's result, or requeue / fail it after an error
+
+    Returns:
+    --------
+    bool
+        False if the worker no longer owns the job (its lease expired and
+        the job was claimed again); nothing is written then
+    """
+    now = time.time()
+    if error is None:
+        cursor = connection.execute("UPDATE jobs SET status = 'done', finished_at = ?, result = ?, error = NULL "
+                                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                                    (now, json.dumps(result), job_id, worker))
+    else:
+        cursor = connection.execute("UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' "
+                                    "ELSE 'failed' END, finished_at = ?, error = ? "
+                                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                                    (now, error, job_id, worker))
+    return cursor.rowcount == 1
+
+
+def run_job(job_id, attempt, spec, db_dir):
+    """
+    Render one job's variant and run Test1SUMOExporter on it
+
+    Returns:
+    --------
+    dict
+        Summary metrics (sweep.summarize_run) plus the output folder
+    """
+    from run_simulation import Test1SUMOExporter  # needs TraCI, only on workers
+
+    base = SweepBase(os.path.join(db_dir, spec['sumocfg']))
+    files = base.render(spec.get('point', {}))
+    job_dir = os.path.join(db_dir, RUNS_DIR, f'{job_id}_{attempt}')
+    os.makedirs(job_dir, exist_ok=True)
+    for name, content in files.items():
+        if name.endswith('.sumocfg'):
+            content = content.replace(b'NET_FILE', os.path.abspath(base.net_file).encode())
+        with open(os.path.join(job_dir, name), 'wb') as f:
+            f.write(content)
+
+    output_folder = os.path.join(job_dir, 'outputs')
+    exporter = Test1SUMOExporter(sumocfg=os.path.join(job_dir, 'variant.sumocfg'), output_folder=output_folder)
+    if not exporter.run_simulation(step_length=spec.get('data_interval', 1.0)):
+        raise RuntimeError('simulation failed (see worker log)')
+    exporter.export_to_csv()
+    return {**summarize_run(job_dir), 'output_folder': os.path.relpath(output_folder, db_dir)}
+
+
+def _heartbeat(db_file, job_id, worker, stop):
+    connection = connect(db_file)
+    while not stop.wait(HEARTBEAT):
+        cursor = connection.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? "
+                                    "AND status = 'running'", (time.time(), job_id, worker))
+        if cursor.rowcount == 0:
+            break  # lease lost; the job belongs to another worker now
+    connection.close()
+
+
+def worker_loop(db_file=DB_FILE, once=False):
+    """Claim and run jobs until the queue is empty (once) or forever"""
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    db_dir = os.path.dirname(os.path.abspath(db_file))
+    connection = connect(db_file)
+    while True:
+        job = claim(connection, worker)
+        if job is None:
+            if once:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        job_id, attempt, spec = job
+        print(f"[{worker}] job {job_id} (attempt {attempt}): {spec.get('point', {})}")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(db_file, job_id, worker, stop), daemon=True)
+        beat.start()
+        try:
+            try:
+                result, error = run_job(job_id, attempt, spec, db_dir), None
+            except (Exception, SystemExit):
+                result, error = None, traceback.format_exc(limit=3)
+            if not finish(connection, job_id, worker, result=result, error=error):
+                print(f"[{worker}] ⚠ job {job_id} was reclaimed by another worker, result discarded")
+            elif error is None:
+                print(f"[{worker}] ✓ job {job_id} done")
+            else:
+                print(f"[{worker}] ✗ job {job_id} failed")
+        finally:
+            stop.set()
+            beat.join()
+    connection.close()
+
+
+def status_counts(db_file=DB_FILE):
+    """Number of jobs per status"""
+    connection = connect(db_file)
+    counts = dict(connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+    connection.close()
+    return counts
+
+
+def results_table(db_file=DB_FILE):
+    """One row per job: id, status, attempts, worker, grid values and metrics"""
+    connection = connect(db_file)
+    rows = []
+    for job_id, spec, status, attempts, worker, result in connection.execute(
+            'SELECT id, spec, status, attempts, worker, result FROM jobs ORDER BY id'):
+        spec = json.loads(spec)
+        rows.append({'job': job_id, 'status': status, 'attempts': attempts, 'worker': worker,
+                     **spec.get('point', {}), **(json.loads(result) if result else {})})
+    connection.close()
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--db': DB_FILE, '--seeds': None, '--retries': MAX_ATTEMPTS, '--processes': 1,
+               '--config': 'Test1.sumocfg'}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+    once = '--once' in args
+    args = [arg for arg in args if arg != '--once']
+    command = args.pop(0) if args else None
+    db_file = options['--db']
+
+    if command == 'submit':
+        try:
+            points = expand_grid(parse_grid(args)) if args else [{}]
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        if options['--seeds']:
+            points = [{**point, 'config:seed': str(seed)} for point in points
+                      for seed in range(1, int(options['--seeds']) + 1)]
+        sumocfg = os.path.relpath(os.path.abspath(options['--config']), os.path.dirname(os.path.abspath(db_file)))
+        ids = submit(db_file, [{'sumocfg': sumocfg, 'point': point} for point in points],
+                     max_attempts=int(options['--retries']))
+        print(f"✓ Submitted {len(ids)} jobs to {db_file}")
+
+    elif command == 'worker':
+        processes = int(options['--processes'])
+        if processes == 1:
+            worker_loop(db_file, once)
+        else:
+            workers = [Process(target=worker_loop, args=(db_file, once)) for _ in range(processes)]
+            for process in workers:
+                process.start()
+            for process in workers:
+                process.join()
+
+    elif command == 'status':
+        counts = status_counts(db_file)
+        print(f"{db_file}: " + ", ".join(f"{status} {count}" for status, count in sorted(counts.items())))
+
+    elif command == 'results':
+        output_file = args[0] if args else 'job_results.csv'
+        results = results_table(db_file)
+        results.to_csv(output_file, index=False)
+        print(results.round(2).to_string(index=False))
+        print(f"\n✓ Job results exported: {output_file}")
+
+    else:
+        print(__doc__)
+        sys.exit(0 if command is None else 1)
@@ -0,0 +1,220 @@
+"""
+Charging Load Time-Series Aggregator
+Turns SUMO chargingstations output (or the charging sessions collected by
+run_simulation.py) into per-station and total load series (kW) at any
+resolution from 1 s to 15 min or more. Samples are binned with a single
+np.bincount over (run, station, bin), so hundreds of runs aggregate in
+seconds. The result is written as a columnar Parquet file when pyarrow or
+fastparquet is available, otherwise as CSV.
+
+Usage:
+    python load_aggregator.py [resolution] chargingstations.xml [more.xml ...]
+    python load_aggregator.py 15min ../MOD*/chargingstations.xml
+"""
+
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+DEFAULT_RESOLUTION = 60.0  # seconds
+_RESOLUTION_RE = re.compile(r'^\s*([\d.]+)\s*(s|sec|min|m|h)?\s*$')
+_RESOLUTION_UNITS = {None: 1, 's': 1, 'sec': 1, 'min': 60, 'm': 60, 'h': 3600}
+
+
+def parse_resolution(value):
+    """Resolution in seconds from a number or a string such as '1s', '30s', '15min', '1h'"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _RESOLUTION_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Unknown resolution '{value}' (use e.g. 1s, 30s, 15min)")
+    return float(match.group(1)) * _RESOLUTION_UNITS[match.group(2)]
+
+
+def read_charging_output(xml_file):
+    """
+    Stream the per-step energy of a chargingstations output file
+
+    Returns:
+    --------
+    dict
+        station_ids (list), station (int32 index per sample), time (s) and
+        energy_Wh (energy delivered to the vehicle in that step) arrays
+    """
+    station_ids, station_index = [], {}
+    stations, times, energy = [], [], []
+    current = -1
+
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+        if elem.tag == 'chargingStation':
+            if event == 'start':
+                station_id = elem.get('id')
+                if station_id not in station_index:
+                    station_index[station_id] = len(station_ids)
+                    station_ids.append(station_id)
+                current = station_index[station_id]
+            else:
+                elem.clear()
+        elif elem.tag == 'step' and event == 'end':
+            stations.append(current)
+            times.append(float(elem.get('time', 0)))
+            energy.append(float(elem.get('energyCharged', 0)))
+
+    return {
+        'station_ids': station_ids,
+        'station': np.array(stations, dtype=np.int32),
+        'time': np.array(times, dtype=np.float64),
+        'energy_Wh': np.array(energy, dtype=np.float64)
+    }
+
+
+def samples_from_sessions(sessions, sample_interval=1.0):
+    """
+    Spread each charging session's energy evenly over its samples
+
+    Parameters:
+    -----------
+    sessions : pandas.DataFrame
+        Output of ChargingSessionizer.sessions()
+    sample_interval : float
+        Collection interval used during the run (seconds)
+
+    Returns:
+    --------
+    dict
+        Same layout as read_charging_output
+    """
+    station_ids = sorted(sessions['charging_station'].unique())
+    station_index = {station_id: i for i, station_id in enumerate(station_ids)}
+
+    start = sessions['start_time'].to_numpy(dtype=np.float64)
+    counts = np.maximum(np.round(sessions['duration_sec'].to_numpy() / sample_interval).astype(np.int64), 0) + 1
+    energy = np.nan_to_num(sessions['energy_delivered_Wh'].to_numpy(dtype=np.float64)) / counts
+
+    # Position of each expanded sample within its session
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    within = np.arange(counts.sum()) - first
+    return {
+        'station_ids': station_ids,
+        'station': np.repeat(sessions['charging_station'].map(station_index).to_numpy(np.int32), counts),
+        'time': np.repeat(start, counts) + within * sample_interval,
+        'energy_Wh': np.repeat(energy, counts)
+    }
+
+
+def aggregate_load(samples_list, resolution=DEFAULT_RESOLUTION, begin=0.0, end=None):
+    """
+    Bin the energy samples of one or more runs into kW load series
+
+    Parameters:
+    -----------
+    samples_list : list of dict
+        Outputs of read_charging_output / samples_from_sessions, one per run
+    resolution : float or str
+        Bin width (seconds, or e.g. '15min')
+    begin, end : float, optional
+        Time window; end defaults to the last sample of any run
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Long format: run, time (bin start, s), station, load_kW; includes a
+        'total' station per run and zero-load bins so series are regular
+    """
+    resolution = parse_resolution(resolution)
+    station_ids = sorted({station_id for samples in samples_list for station_id in samples['station_ids']})
+    station_index = {station_id: i for i, station_id in enumerate(station_ids)}
+    if end is None:
+        end = max((samples['time'].max() for samples in samples_list if len(samples['time'])), default=begin)
+
+    n_runs, n_stations = len(samples_list), len(station_ids)
+    n_bins = max(int(np.floor((end - begin) / resolution)) + 1, 1)
+
+    flat_parts, weight_parts = [], []
+    for run, samples in enumerate(samples_list):
+        # Map this run's station numbering onto the shared one
+        remap = np.array([station_index[station_id] for station_id in samples['station_ids']], dtype=np.int64)
+        bins = np.floor((samples['time'] - begin) / resolution).astype(np.int64)
+        keep = (bins >= 0) & (bins < n_bins) & (samples['station'] >= 0)
+        stations = remap[samples['station'][keep]] if len(remap) else np.zeros(0, dtype=np.int64)
+        flat_parts.append((run * n_stations + stations) * n_bins + bins[keep])
+        weight_parts.append(samples['energy_Wh'][keep])
+
+    flat = np.concatenate(flat_parts) if flat_parts else np.zeros(0, dtype=np.int64)
+    weights = np.concatenate(weight_parts) if weight_parts else np.zeros(0)
+    energy = np.bincount(flat, weights=weights, minlength=n_runs * n_stations * n_bins)
+    load_kW = energy.reshape(n_runs, n_stations, n_bins) / (resolution / 3600) / 1000
+
+    # Append the per-run total as an extra station
+    load_kW = np.concatenate([load_kW, load_kW.sum(axis=1, keepdims=True)], axis=1)
+    names = station_ids + ['total']
+    return pd.DataFrame({
+        'run': np.repeat(np.arange(n_runs), (n_stations + 1) * n_bins),
+        'time': np.tile(begin + np.arange(n_bins) * resolution, n_runs * (n_stations + 1)),
+        'station': np.tile(np.repeat(np.array(names, dtype=object), n_bins), n_runs),
+        'load_kW': load_kW.ravel()
+    })
+
+
+def load_runs(xml_files, workers=None):
+    """Parse several chargingstations outputs in parallel"""
+    if len(xml_files) == 1:
+        return [read_charging_output(xml_files[0])]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(read_charging_output, xml_files))
+
+
+def write_load_table(df, output_base):
+    """
+    Write the load table as Parquet, falling back to CSV
+
+    Returns:
+    --------
+    str
+        Path of the written file
+    """
+    try:
+        path = output_base + '.parquet'
+        df.to_parquet(path, index=False)
+        return path
+    except ImportError:
+        path = output_base + '.csv'
+        df.to_csv(path, index=False)
+        return path
+
+
+def wide_load(df, run=0):
+    """One run as a time x station table (handy for plotting)"""
+    return df[df['run'] == run].pivot(index='time', columns='station', values='load_kW')
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    resolution = DEFAULT_RESOLUTION
+    if args and not args[0].endswith('.xml'):
+        resolution = parse_resolution(args.pop(0))
+    xml_files = args or ['chargingstations.xml']
+
+    missing = [path for path in xml_files if not os.path.exists(path)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    runs = load_runs(xml_files)
+    load = aggregate_load(runs, resolution)
+    print(f"✓ {len(xml_files)} run(s), {sum(len(r['time']) for r in runs)} charging steps "
+          f"→ {len(load)} load values at {resolution:g}s resolution")
+
+    print(f"\n{'Run':<5} {'Station':<24} {'Peak kW':>10} {'Mean kW':>10} {'Energy kWh':>12}")
+    print("-" * 65)
+    stats = load.groupby(['run', 'station'])['load_kW'].agg(['max', 'mean', 'sum']).reset_index()
+    for row in stats[stats['max'] > 0].itertuples():
+        energy_kWh = row.sum * resolution / 3600
+        print(f"{row.run:<5} {row.station[:24]:<24} {row.max:>10.1f} {row.mean:>10.1f} {energy_kWh:>12.2f}")
+
+    output_file = write_load_table(load, f'charging_load_{resolution:g}s')
+    print(f"\n✓ Load series exported: {output_file}")
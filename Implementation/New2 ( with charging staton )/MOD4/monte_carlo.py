@@ -0,0 +1,225 @@
+"""
+Multi-Seed Monte Carlo with Streaming Confidence Intervals
+sigma and speedFactor make every SUMO run stochastic, so one run per variant
+is not enough to compare MOD variants. This runs a scenario (optionally with
+sweep.py grid values applied) with seeds base_seed, base_seed+1, ... in
+parallel and merges the KPIs of each run into Welford running mean/variance
+accumulators in seed order (a run that finishes early waits for the seeds
+before it), so the merged seeds and the result do not depend on worker
+timing; no per-run data is kept in memory. Merging stops at the first seed
+where the 95% confidence interval of every KPI is within the requested
+relative precision (after min_runs), so only as many runs are spent as the
+precision needs; queued seeds are then cancelled and seeds already running
+finish into the cache. A KPI missing from every run (e.g. no
+chargingstations output) is left out of the stopping rule.
+
+Runs go through the sweep cache (the seed is part of the rendered config),
+so repeating a Monte Carlo study reuses the seeds already simulated.
+
+KPIs: mean trip time, energy per km, charger utilization, mean waiting time.
+
+Usage:
+    python monte_carlo.py [vType:easyBike:sigma=0.5 ...] [--precision 0.05]
+                          [--min-runs 5] [--max-runs 50] [--workers 4] [--seed 1]
+"""
+
+import os
+import sys
+import shutil
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+from sweep import (CACHE_DIR, SUMO_BINARY, SweepBase, parse_grid, run_variant, cached_result)
+
+KPIS = ('mean_duration_sec', 'energy_per_km_Wh', 'charger_utilization', 'mean_waiting_sec')
+REL_PRECISION = 0.05  # CI half-width / |mean|
+MIN_RUNS = 5
+MAX_RUNS = 50
+
+# Two-sided 95% Student t quantiles for 1..30 degrees of freedom
+_T95 = np.array([12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042])
+
+
+def t_quantile(df):
+    """95% two-sided t quantile (normal approximation beyond 30 degrees of freedom)"""
+    df = np.asarray(df)
+    return np.where(df < 1, np.inf, np.where(df <= 30, _T95[np.clip(df, 1, 30) - 1], 1.96))
+
+
+class RunningStats:
+    """
+    Welford mean/variance of several KPIs, one update per run
+
+    Non-finite values (e.g. no trips in a run) are skipped per KPI.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.runs = 0
+        self.n = np.zeros(len(self.names), dtype=np.int64)
+        self.mean = np.zeros(len(self.names))
+        self.m2 = np.zeros(len(self.names))
+
+    def update(self, values):
+        """Add one run's KPI values (dict or array in the order of names)"""
+        if isinstance(values, dict):
+            values = [values.get(name, np.nan) for name in self.names]
+        values = np.asarray(values, dtype=np.float64)
+        self.runs += 1
+        valid = np.isfinite(values)
+        self.n[valid] += 1
+        delta = np.where(valid, values - self.mean, 0.0)
+        self.mean += np.divide(delta, self.n, out=np.zeros_like(delta), where=valid)
+        self.m2 += np.where(valid, delta * (values - self.mean), 0.0)
+
+    def std(self):
+        return np.sqrt(np.divide(self.m2, self.n - 1, out=np.full(len(self.names), np.nan), where=self.n > 1))
+
+    def half_width(self):
+        """95% confidence interval half-width of every KPI mean"""
+        return t_quantile(self.n - 1) * self.std() / np.sqrt(np.maximum(self.n, 1))
+
+    def missing(self):
+        """KPIs without a single finite value so far"""
+        return [name for name, n in zip(self.names, self.n) if n == 0]
+
+    def converged(self, rel_precision, min_runs=MIN_RUNS):
+        """
+        True when every KPI has min_runs values and a tight enough interval
+
+        KPIs that had no value in any of the (at least min_runs) runs are ignored.
+        """
+        present = self.n > 0
+        if self.runs < min_runs or not present.any():
+            return False
+        relative = self.half_width()[present] / np.maximum(np.abs(self.mean[present]), 1e-12)
+        return bool(np.all(self.n[present] >= min_runs) and np.all(relative <= rel_precision))
+
+    def table(self):
+        half = self.half_width()
+        return pd.DataFrame({
+            'kpi': self.names,
+            'runs': self.n,
+            'mean': self.mean,
+            'std': self.std(),
+            'ci95_low': self.mean - half,
+            'ci95_high': self.mean + half,
+            'rel_half_width': half / np.maximum(np.abs(self.mean), 1e-12)
+        })
+
+
+def _seed_job(args):
+    return run_variant(*args)
+
+
+def run_monte_carlo(point=None, sumocfg='Test1.sumocfg', rel_precision=REL_PRECISION, min_runs=MIN_RUNS,
+                    max_runs=MAX_RUNS, workers=None, base_seed=1, kpis=KPIS, cache_dir=CACHE_DIR,
+                    sumo_binary=SUMO_BINARY, keep_outputs=False):
+    """
+    Run seeds of one scenario until the KPI confidence intervals are tight
+
+    Parameters:
+    -----------
+    point : dict, optional
+        Grid values applied to the base scenario ({grid key: value}, see sweep.py)
+    rel_precision : float
+        Stop when every 95% CI half-width is below this fraction of its mean
+    min_runs, max_runs : int
+    workers : int, optional
+        Seeds simulated at the same time (default: CPU count)
+    keep_outputs : bool
+        Keep the SUMO output files of each seed in the cache
+
+    Returns:
+    --------
+    (stats, runs, converged) : (RunningStats, int, bool)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    base = SweepBase(sumocfg)
+    point = dict(point or {})
+    workers = workers or os.cpu_count() or 1
+    stats = RunningStats(kpis)
+
+    def job(seed):
+        files = base.render({**point, 'config:seed': str(seed)})
+        key = base.key(files)
+        return key, (key, files, base.net_file, cache_dir, sumo_binary, keep_outputs)
+
+    # Seeds already in the cache cost nothing; merge them first
+    next_seed, runs = base_seed, 0
+    while runs < max_runs and not stats.converged(rel_precision, min_runs):
+        key, _ = job(next_seed)
+        cached = cached_result(key, cache_dir)
+        if cached is None:
+            break
+        stats.update(cached)
+        next_seed, runs = next_seed + 1, runs + 1
+
+    if runs < max_runs and not stats.converged(rel_precision, min_runs):
+        if shutil.which(sumo_binary) is None:
+            raise FileNotFoundError(f"'{sumo_binary}' not found; install SUMO or set SUMO_HOME/bin on PATH")
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending = {}  # future -> seed
+            finished = {}  # seed -> result, waiting for the seeds before it
+            merge_seed, submit_seed, last_seed = next_seed, next_seed, next_seed + max_runs - runs
+            while runs < max_runs and not stats.converged(rel_precision, min_runs):
+                while len(pending) + len(finished) < workers and submit_seed < last_seed:
+                    pending[executor.submit(_seed_job, job(submit_seed)[1])] = submit_seed
+                    submit_seed += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[pending.pop(future)] = future.result()
+
+                # Merge in seed order, stopping at the first seed that converges
+                while merge_seed in finished and runs < max_runs and not stats.converged(rel_precision, min_runs):
+                    result = finished.pop(merge_seed)
+                    runs += 1
+                    if 'error' in result:
+                        print(f"⚠ Seed {merge_seed} failed: {result['error']}")
+                    else:
+                        stats.update(result)
+                    merge_seed += 1
+                relative = stats.table()['rel_half_width'].to_numpy()
+                widest = np.nanmax(relative) if np.isfinite(relative).any() else np.inf
+                print(f"  {runs} runs, widest CI ±{widest * 100:.1f}%")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    for name in stats.missing():
+        print(f"⚠ {name}: no value in any run, left out of the stopping rule")
+    return stats, runs, stats.converged(rel_precision, min_runs)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--precision': REL_PRECISION, '--min-runs': MIN_RUNS, '--max-runs': MAX_RUNS,
+               '--workers': None, '--seed': 1, '--config': 'Test1.sumocfg'}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+
+    try:
+        point = {key: values[0] for key, values in parse_grid(args).items()}
+        stats, runs, converged = run_monte_carlo(
+            point, options['--config'], rel_precision=float(options['--precision']),
+            min_runs=int(options['--min-runs']), max_runs=int(options['--max-runs']),
+            workers=int(options['--workers']) if options['--workers'] else None, base_seed=int(options['--seed']))
+    except (ValueError, FileNotFoundError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print("\n" + "="*80)
+    print(f"MONTE CARLO: {runs} runs, "
+          f"{'converged' if converged else 'not converged'} at ±{float(options['--precision']) * 100:g}% (95% CI)")
+    print("="*80)
+    table = stats.table()
+    print(table.round(4).to_string(index=False))
+
+    output_file = 'monte_carlo_kpis.csv'
+    table.to_csv(output_file, index=False)
+    print(f"\n✓ KPI statistics exported: {output_file}")
@@ -0,0 +1,470 @@
+"""
+Synthetic City-Scale Network Generator
+Builds networks of 1k-100k junctions from the Test1 topology for scaling
+studies, together with a charging network and demand sized to match, as a
+ready-to-run scenario (net, routes, additional, sumocfg).
+
+Topologies:
+    tile     Test1 copied onto an a x b grid of tiles, neighbouring tiles
+             joined by two-way links (Test1 geometry, lengths and lane types;
+             every charging station, parking area and bus stop per tile)
+    grid     side x side two-way grid
+    radial   rings x spokes two-way radial network around a centre
+
+grid and radial edges take their (lanes, speed) from the Test1 edges, and
+chargers are placed in the same ratio to junctions as in Test1, cycling
+through the Test1 station types (power, efficiency, length) on seeded random
+edges. Demand is OD trips between random edges, written by
+demand_generator.py with the Test1 vTypes.
+
+The network is written as plain .nod.xml/.edg.xml files. When netconvert is
+on PATH these are compiled into a regular .net.xml; otherwise a simplified
+.net.xml (junctions, edges, lanes and connections without internal lanes or
+junction shapes) is written, which network_loader.py / network_analyzer.py
+read but SUMO itself does not accept.
+
+Usage:
+    python net_generator.py tile|grid|radial [--junctions 10000] [--vehicles 50000]
+                            [--hours 1] [--seed 42] [-o generated]
+"""
+
+import os
+import sys
+import time
+import shutil
+import subprocess
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from network_loader import load_network, load_charging_stations
+from demand_generator import read_template, scale_streams, generate_demand, VTYPE_MIX
+
+ET.register_namespace('xsi', 'http://www.w3.org/2001/XMLSchema-instance')
+
+TEST1_NET = 'Test1.net.xml'
+TEST1_ADD = 'Test1.add.xml'
+TEST1_ROUTES = 'Test1.rou.xml'
+TEST1_CONFIG = 'Test1.sumocfg'
+SPACING = 200.0  # metres between grid junctions / radial rings
+TILE_GAP = 300.0  # metres between neighbouring tiles
+MIN_SPOKES = 8
+STOP_MARGIN = 10.0  # metres kept free at both ends of an edge holding a charger
+
+
+class Topology:
+    """
+    Junctions and edges of a generated network
+
+    Attributes:
+    -----------
+    junction_ids : list of str
+    junction_xy : ndarray, shape (n_junctions, 2)
+    edge_ids : list of str
+    edge_from, edge_to : ndarray of int64
+        Junction index of each edge's endpoints
+    edge_lanes : ndarray of int64
+    edge_speed, edge_length : ndarray of float64
+    """
+
+    def __init__(self, junction_ids, junction_xy, edge_ids, edge_from, edge_to, edge_lanes, edge_speed,
+                 edge_length=None):
+        self.junction_ids = junction_ids
+        self.junction_xy = np.asarray(junction_xy, dtype=np.float64)
+        self.edge_ids = edge_ids
+        self.edge_from = np.asarray(edge_from, dtype=np.int64)
+        self.edge_to = np.asarray(edge_to, dtype=np.int64)
+        self.edge_lanes = np.asarray(edge_lanes, dtype=np.int64)
+        self.edge_speed = np.asarray(edge_speed, dtype=np.float64)
+        if edge_length is None:
+            edge_length = np.linalg.norm(self.junction_xy[self.edge_to] - self.junction_xy[self.edge_from], axis=1)
+        self.edge_length = np.maximum(np.asarray(edge_length, dtype=np.float64), 0.1)
+
+    @property
+    def n_junctions(self):
+        return len(self.junction_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_ids)
+
+
+def lane_types(network):
+    """(lanes, speed) of every edge of a NetworkArrays, shape (n_edges, 2)"""
+    lanes = np.diff(network.edge_lane_offsets)
+    return np.column_stack([lanes, network.edge_speed()])
+
+
+def _two_way(junction_ids, a, b, types, rng):
+    """Edges a->b and b->a for every pair, both directions with the same sampled lane type"""
+    a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+    chosen = types[rng.integers(len(types), size=len(a))]
+    edge_from = np.concatenate([a, b])
+    edge_to = np.concatenate([b, a])
+    edge_ids = [f'{junction_ids[f]}to{junction_ids[t]}' for f, t in zip(edge_from.tolist(), edge_to.tolist())]
+    return edge_ids, edge_from, edge_to, np.concatenate([chosen[:, 0]] * 2), np.concatenate([chosen[:, 1]] * 2)
+
+
+def grid_topology(side, spacing=SPACING, types=((1, 13.89),), seed=42):
+    """A side x side grid with two-way edges"""
+    rng = np.random.default_rng(seed)
+    i, j = np.divmod(np.arange(side * side), side)
+    junction_ids = [f'J{a}_{b}' for a, b in zip(i.tolist(), j.tolist())]
+    index = np.arange(side * side).reshape(side, side)
+    a = np.concatenate([index[:-1, :].ravel(), index[:, :-1].ravel()])
+    b = np.concatenate([index[1:, :].ravel(), index[:, 1:].ravel()])
+    edges = _two_way(junction_ids, a, b, np.asarray(types, dtype=np.float64), rng)
+    return Topology(junction_ids, np.column_stack([i, j]) * spacing, *edges)
+
+
+def radial_topology(rings, spokes, spacing=SPACING, types=((1, 13.89),), seed=42):
+    """A centre junction plus rings x spokes junctions, joined along rings and spokes in both directions"""
+    rng = np.random.default_rng(seed)
+    ring, spoke = np.divmod(np.arange(rings * spokes), spokes)
+    angle = 2 * np.pi * spoke / spokes
+    radius = (ring + 1) * spacing
+    junction_ids = ['C'] + [f'R{r}_{s}' for r, s in zip(ring.tolist(), spoke.tolist())]
+    xy = np.vstack([[0.0, 0.0], np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])])
+
+    index = 1 + np.arange(rings * spokes).reshape(rings, spokes)
+    a = np.concatenate([np.zeros(spokes, dtype=np.int64), index[:-1, :].ravel(), index.ravel()])
+    b = np.concatenate([index[0, :], index[1:, :].ravel(), np.roll(index, -1, axis=1).ravel()])
+    edges = _two_way(junction_ids, a, b, np.asarray(types, dtype=np.float64), rng)
+    return Topology(junction_ids, xy, *edges)
+
+
+def tile_topology(network, n_tiles, gap=TILE_GAP):
+    """
+    Copies of a network on a grid of tiles, neighbouring tiles joined by two-way links
+
+    Junction and edge ids get a _t<k> suffix per tile. Adjacent tiles are
+    joined from the easternmost to the westernmost junction (and from the
+    northernmost to the southernmost), with the lane type of the fastest
+    base edge.
+    """
+    cols = int(np.ceil(np.sqrt(n_tiles)))
+    base_xy = network.junction_xy - network.junction_xy.min(axis=0)
+    width, height = base_xy.max(axis=0) + gap
+    n = network.n_junctions
+    tile_row, tile_col = np.divmod(np.arange(n_tiles), cols)
+
+    offsets = np.column_stack([tile_col * width, tile_row * height])
+    xy = (base_xy[None, :, :] + offsets[:, None, :]).reshape(-1, 2)
+    junction_ids = [f'{junction}_t{k}' for k in range(n_tiles) for junction in network.junction_ids]
+    edge_ids = [f'{edge}_t{k}' for k in range(n_tiles) for edge in network.edge_ids]
+    shift = (np.arange(n_tiles) * n)[:, None]
+    edge_from = (network.edge_from[None, :] + shift).ravel()
+    edge_to = (network.edge_to[None, :] + shift).ravel()
+    types = lane_types(network)
+    first = network.edge_lane_offsets[:-1]
+    base_length = network.lane_length[first]
+    edge_lanes = np.tile(types[:, 0], n_tiles)
+    edge_speed = np.tile(types[:, 1], n_tiles)
+    edge_length = np.tile(base_length, n_tiles)
+
+    east, west = np.argmax(base_xy[:, 0]), np.argmin(base_xy[:, 0])
+    north, south = np.argmax(base_xy[:, 1]), np.argmin(base_xy[:, 1])
+    tiles = np.arange(n_tiles)
+    right = tiles[(tile_col < cols - 1) & (tiles + 1 < n_tiles)]
+    up = tiles[tiles + cols < n_tiles]
+    a = np.concatenate([right * n + east, up * n + north])
+    b = np.concatenate([(right + 1) * n + west, (up + cols) * n + south])
+    link_type = types[np.argmax(types[:, 1])][None, :]
+    link_ids, link_from, link_to, link_lanes, link_speed = _two_way(junction_ids, a, b, link_type,
+                                                                    np.random.default_rng(0))
+    link_length = np.linalg.norm(xy[link_to] - xy[link_from], axis=1)
+
+    return Topology(junction_ids, xy, edge_ids + link_ids,
+                    np.concatenate([edge_from, link_from]), np.concatenate([edge_to, link_to]),
+                    np.concatenate([edge_lanes, link_lanes]), np.concatenate([edge_speed, link_speed]),
+                    np.concatenate([edge_length, link_length]))
+
+
+def connections(topology):
+    """
+    Edge-to-edge connections: every edge to every edge leaving its end
+    junction, except the U-turn (kept at dead ends)
+
+    Returns:
+    --------
+    (connection_from, connection_to) : ndarrays of int64
+    """
+    order = np.argsort(topology.edge_from, kind='stable')
+    out_count = np.bincount(topology.edge_from, minlength=topology.n_junctions)
+    out_start = np.concatenate([[0], np.cumsum(out_count)[:-1]])
+
+    count = out_count[topology.edge_to]
+    connection_from = np.repeat(np.arange(topology.n_edges), count)
+    within = np.arange(len(connection_from)) - np.repeat(np.cumsum(count) - count, count)
+    connection_to = order[out_start[topology.edge_to[connection_from]] + within]
+
+    u_turn = topology.edge_to[connection_to] == topology.edge_from[connection_from]
+    keep = ~u_turn | (count[connection_from] == 1)
+    return connection_from[keep], connection_to[keep]
+
+
+def write_plain_files(prefix, topology):
+    """Write <prefix>.nod.xml and <prefix>.edg.xml (netconvert input)"""
+    node_file, edge_file = prefix + '.nod.xml', prefix + '.edg.xml'
+    with open(node_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<nodes>\n')
+        f.writelines(f'    <node id="{junction}" x="{x:.2f}" y="{y:.2f}" type="priority"/>\n'
+                     for junction, (x, y) in zip(topology.junction_ids, topology.junction_xy.tolist()))
+        f.write('</nodes>\n')
+    with open(edge_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<edges>\n')
+        f.writelines(
+            f'    <edge id="{edge}" from="{topology.junction_ids[a]}" to="{topology.junction_ids[b]}" '
+            f'numLanes="{lanes}" speed="{speed:.2f}" length="{length:.2f}"/>\n'
+            for edge, a, b, lanes, speed, length in zip(
+                topology.edge_ids, topology.edge_from.tolist(), topology.edge_to.tolist(),
+                topology.edge_lanes.tolist(), topology.edge_speed.tolist(), topology.edge_length.tolist()))
+        f.write('</edges>\n')
+    return node_file, edge_file
+
+
+def write_simple_net(path, topology):
+    """
+    Write a simplified .net.xml (straight lanes, lane-0 connections, no internal lanes)
+
+    Enough for network_loader.py and network_analyzer.py, not for SUMO.
+
+    Returns:
+    --------
+    int
+        Number of edges written
+    """
+    xy = topology.junction_xy.tolist()
+    ids = topology.junction_ids
+    with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<net version="1.16">\n')
+        for edge, a, b, lanes, speed, length in zip(
+                topology.edge_ids, topology.edge_from.tolist(), topology.edge_to.tolist(),
+                topology.edge_lanes.tolist(), topology.edge_speed.tolist(), topology.edge_length.tolist()):
+            (x1, y1), (x2, y2) = xy[a], xy[b]
+            f.write(f'    <edge id="{edge}" from="{ids[a]}" to="{ids[b]}" priority="1">\n')
+            f.writelines(f'        <lane id="{edge}_{index}" index="{index}" speed="{speed:.2f}" '
+                         f'length="{length:.2f}" shape="{x1:.2f},{y1:.2f} {x2:.2f},{y2:.2f}"/>\n'
+                         for index in range(lanes))
+            f.write('    </edge>\n')
+        f.writelines(f'    <junction id="{junction}" type="priority" x="{x:.2f}" y="{y:.2f}" '
+                     f'incLanes="" intLanes="" shape=""/>\n' for junction, (x, y) in zip(ids, xy))
+        edge_ids = topology.edge_ids
+        f.writelines(f'    <connection from="{edge_ids[a]}" to="{edge_ids[b]}" fromLane="0" toLane="0"/>\n'
+                     for a, b in zip(*(c.tolist() for c in connections(topology))))
+        f.write('</net>\n')
+    return topology.n_edges
+
+
+def build_net(prefix, topology, netconvert='netconvert'):
+    """
+    Write the plain files and <prefix>.net.xml (netconvert when available)
+
+    Returns:
+    --------
+    (net_file, compiled) : (str, bool)
+        compiled is False when the simplified .net.xml was written instead
+    """
+    node_file, edge_file = write_plain_files(prefix, topology)
+    net_file = prefix + '.net.xml'
+    if shutil.which(netconvert):
+        result = subprocess.run([netconvert, '--node-files', node_file, '--edge-files', edge_file,
+                                 '--output-file', net_file, '--no-warnings', 'true'],
+                                capture_output=True, text=True)
+        if result.returncode == 0:
+            return net_file, True
+        print(f"⚠️  netconvert failed, writing a simplified network: {result.stderr.strip()[-300:]}")
+    write_simple_net(net_file, topology)
+    return net_file, False
+
+
+def tile_additionals(add_file, n_tiles):
+    """Every lane-based element of add_file (charging stations, parking areas, bus stops) once per tile"""
+    root = ET.parse(add_file).getroot()
+    templates = [elem for elem in root if isinstance(elem.tag, str) and elem.get('lane')]
+    elements = []
+    for k in range(n_tiles):
+        for template in templates:
+            elem = ET.Element(template.tag, dict(template.attrib))
+            edge, index = template.get('lane').rsplit('_', 1)
+            elem.set('id', f"{template.get('id')}_t{k}")
+            elem.set('lane', f'{edge}_t{k}_{index}')
+            if elem.get('name'):
+                elem.set('name', f"{elem.get('name')}_t{k}")
+            elements.append(elem)
+    return elements
+
+
+def place_chargers(topology, stations, count, seed=42):
+    """
+    count charging stations on distinct random edges, cycling through the template stations
+
+    Each station keeps its template's power, efficiency and length and sits
+    in the middle of lane 0 of an edge long enough to hold it.
+    """
+    rng = np.random.default_rng(seed)
+    stop_length = max(station['end_pos'] - station['start_pos'] for station in stations)
+    candidates = np.flatnonzero(topology.edge_length >= stop_length + 2 * STOP_MARGIN)
+    chosen = rng.choice(candidates, size=min(count, len(candidates)), replace=False)
+
+    elements = []
+    for k, edge in enumerate(chosen.tolist()):
+        station = stations[k % len(stations)]
+        length = station['end_pos'] - station['start_pos']
+        start = (topology.edge_length[edge] - length) / 2
+        elements.append(ET.Element('chargingStation', {
+            'id': f"{station['id']}_{k}",
+            'lane': f'{topology.edge_ids[edge]}_0',
+            'startPos': f'{start:.2f}',
+            'endPos': f'{start + length:.2f}',
+            'power': f"{station['power']:g}",
+            'efficiency': f"{station['efficiency']:g}",
+            'friendlyPos': 'true',
+            'name': f"{station['name']}_{k}"
+        }))
+    return elements
+
+
+def write_additional(path, elements):
+    """Write an additional file holding the given elements"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<additional xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/additional_file.xsd">\n')
+        for elem in elements:
+            elem.tail = None
+            f.write('    ' + ET.tostring(elem, encoding='unicode') + '\n')
+        f.write('</additional>\n')
+    return len(elements)
+
+
+def write_demand(path, topology, vehicles, hours=1, od_pairs=None, seed=42, template=TEST1_ROUTES):
+    """
+    OD trips between random edges with the template's vTypes (see demand_generator.generate_demand)
+
+    Returns:
+    --------
+    dict
+        vehicles, trips, per_period
+    """
+    rng = np.random.default_rng(seed)
+    header, _ = read_template(template)
+    header = [element for element in header if element.startswith('<vType')]
+    od_pairs = od_pairs or max(50, topology.n_junctions // 20)
+    origin = rng.integers(topology.n_edges, size=od_pairs)
+    destination = rng.integers(topology.n_edges, size=od_pairs)
+    keep = origin != destination
+    edge_ids = np.array(topology.edge_ids, dtype=object)
+    streams = pd.DataFrame([
+        {'kind': 'od', 'route': '', 'from': edge_ids[a], 'to': edge_ids[b], 'vType': vtype, 'vehsPerHour': share}
+        for a, b in zip(origin[keep], destination[keep]) for vtype, share in VTYPE_MIX.items()
+    ], columns=['kind', 'route', 'from', 'to', 'vType', 'vehsPerHour'])
+    streams = scale_streams(streams, vehicles, hours)
+    return generate_demand(path, streams, header, hours=hours, seed=seed)
+
+
+def write_config(path, net_file, route_file, add_file, end, template=TEST1_CONFIG):
+    """Write a .sumocfg based on the template with the generated files and end time"""
+    tree = ET.parse(template)
+    root = tree.getroot()
+    values = {'net-file': net_file, 'route-files': route_file, 'additional-files': add_file, 'end': f'{end:g}'}
+    for option, value in values.items():
+        for elem in root.iter(option):
+            elem.set('value', os.path.basename(value))
+    tree.write(path, encoding='UTF-8', xml_declaration=True)
+    return path
+
+
+def generate_scenario(kind, junctions=10000, output_dir='generated', vehicles=None, hours=1, seed=42,
+                      base_dir='.'):
+    """
+    Generate a network of about `junctions` junctions plus chargers, demand and a sumocfg
+
+    Parameters:
+    -----------
+    kind : str
+        'tile', 'grid' or 'radial'
+    junctions : int
+        Target size (rounded up to whole tiles / grid rows / rings)
+    vehicles : int, optional
+        Expected departures over the horizon (default: 5 per junction)
+    hours : int
+    base_dir : str
+        Folder with Test1.net.xml, Test1.add.xml, Test1.rou.xml and Test1.sumocfg
+
+    Returns:
+    --------
+    dict
+        Paths of the generated files and network/demand counts
+    """
+    base = load_network(os.path.join(base_dir, TEST1_NET))
+    add_template = os.path.join(base_dir, TEST1_ADD)
+    stations = load_charging_stations(add_template)
+    types = lane_types(base)
+
+    if kind == 'tile':
+        n_tiles = int(np.ceil(junctions / base.n_junctions))
+        topology = tile_topology(base, n_tiles)
+        additionals = tile_additionals(add_template, n_tiles)
+    elif kind in ('grid', 'radial'):
+        if kind == 'grid':
+            topology = grid_topology(int(np.ceil(np.sqrt(junctions))), types=types, seed=seed)
+        else:
+            spokes = max(MIN_SPOKES, int(round(np.sqrt(junctions))))
+            topology = radial_topology(int(np.ceil((junctions - 1) / spokes)), spokes, types=types, seed=seed)
+        count = int(round(topology.n_junctions * len(stations) / base.n_junctions))
+        additionals = place_chargers(topology, stations, count, seed=seed)
+    else:
+        raise ValueError(f"Unknown topology '{kind}' (tile, grid or radial)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f'{kind}{topology.n_junctions}')
+    net_file, compiled = build_net(prefix, topology)
+    add_file = prefix + '.add.xml'
+    write_additional(add_file, additionals)
+    route_file = prefix + '.rou.xml'
+    demand = write_demand(route_file, topology, vehicles or 5 * topology.n_junctions, hours=hours, seed=seed,
+                          template=os.path.join(base_dir, TEST1_ROUTES))
+    config_file = write_config(prefix + '.sumocfg', net_file, route_file, add_file, hours * 3600,
+                               template=os.path.join(base_dir, TEST1_CONFIG))
+
+    return {
+        'net_file': net_file, 'route_file': route_file, 'add_file': add_file, 'config_file': config_file,
+        'compiled': compiled, 'junctions': topology.n_junctions, 'edges': topology.n_edges,
+        'charging_stations': sum(elem.tag == 'chargingStation' for elem in additionals),
+        'vehicles': demand['vehicles']
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--junctions': 10000, '--vehicles': None, '--hours': 1, '--seed': 42, '-o': 'generated'}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+
+    if not args:
+        print(__doc__)
+        sys.exit(0)
+
+    start_time = time.time()
+    try:
+        result = generate_scenario(args[0], junctions=int(options['--junctions']), output_dir=options['-o'],
+                                   vehicles=int(options['--vehicles']) if options['--vehicles'] else None,
+                                   hours=int(options['--hours']), seed=int(options['--seed']))
+    except (ValueError, FileNotFoundError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    elapsed = time.time() - start_time
+
+    print("\n" + "="*60)
+    print(f"SYNTHETIC NETWORK: {args[0]}")
+    print("="*60)
+    print(f"Junctions: {result['junctions']:,}  |  Edges: {result['edges']:,}  |  "
+          f"Charging stations: {result['charging_stations']:,}  |  Vehicles: {result['vehicles']:,}")
+    print(f"Generated in {elapsed:.1f}s")
+    if not result['compiled']:
+        print("⚠️  netconvert not found: the .net.xml is simplified (analysis tools only); run netconvert "
+              "on the .nod.xml/.edg.xml files to simulate it")
+    print(f"✓ Scenario written: {result['config_file']}")
@@ -1,102 +1,88 @@
 import xml.etree.ElementTree as ET
+import os
 import math
+import heapq
+import numpy as np
+from network_loader import load_network, measure_polylines, take_rows
+
+# Below this many junctions the vectorized Floyd-Warshall is cheaper than
+# running Dijkstra from every source
+FLOYD_WARSHALL_MAX_NODES = 400
 
 def analyze_network(net_file):
     """Analyze SUMO network file to extract node connections and distances"""
     try:
-        tree = ET.parse(net_file)
-        root = tree.getroot()
+        graph = load_network_graph(net_file)
         
         print("="*80)
         print("SUMO NETWORK ANALYSIS")
         print("="*80)
         
         # Extract nodes
-        nodes = {}
-        junctions = root.findall('junction')
-        for junction in junctions:
-            node_id = junction.get('id')
-            x = float(junction.get('x', 0))
-            y = float(junction.get('y', 0))
-            nodes[node_id] = {'x': x, 'y': y}
-        
-        print(f"\nFound {len(nodes)} nodes:")
-        for node_id, coords in nodes.items():
-            print(f"  {node_id}: ({coords['x']:.2f}, {coords['y']:.2f})")
+        print(f"\nFound {graph.n_nodes} nodes:")
+        for node_id, (x, y) in zip(graph.node_ids, graph.node_xy):
+            print(f"  {node_id}: ({x:.2f}, {y:.2f})")
         
-        # Extract edges and calculate distances
-        edges = root.findall('edge')
+        # Edge lengths: declared lane length, lane shape polyline length and
+        # the straight line between the end junctions
+        straight = np.hypot(*(graph.node_xy[graph.edge_to] - graph.node_xy[graph.edge_from]).T)
         connections = []
         
         print("\nEDGE CONNECTIONS AND DISTANCES:")
-        print("-" * 60)
-        print(f"{'Edge ID':<8} {'From':<6} {'To':<6} {'Length (m)':<12} {'Calculated':<12}")
-        print("-" * 60)
+        print("-" * 72)
+        print(f"{'Edge ID':<8} {'From':<6} {'To':<6} {'Length (m)':<12} {'Calculated':<12} {'Straight':<12}")
+        print("-" * 72)
         
-        for edge in edges:
-            edge_id = edge.get('id')
-            from_node = edge.get('from')
-            to_node = edge.get('to')
+        for i, edge_id in enumerate(graph.edge_ids):
+            from_node = graph.node_ids[graph.edge_from[i]]
+            to_node = graph.node_ids[graph.edge_to[i]]
+            declared_length = float(graph.edge_length[i])
+            calculated_length = float(graph.edge_shape_length[i])
             
-            # Skip internal edges
-            if edge_id and edge_id.startswith(':'):
-                continue
-                
-            if from_node and to_node and from_node in nodes and to_node in nodes:
-                # Get length from lane definition
-                lane = edge.find('lane')
-                declared_length = 0
-                if lane is not None:
-                    declared_length = float(lane.get('length', 0))
-                
-                # Calculate geometric distance
-                x1, y1 = nodes[from_node]['x'], nodes[from_node]['y']
-                x2, y2 = nodes[to_node]['x'], nodes[to_node]['y']
-                calculated_length = math.sqrt((x2-x1)**2 + (y2-y1)**2)
-                
-                connections.append({
-                    'edge': edge_id,
-                    'from': from_node,
-                    'to': to_node,
-                    'declared': declared_length,
-                    'calculated': calculated_length
-                })
-                
-                print(f"{edge_id:<8} {from_node:<6} {to_node:<6} {declared_length:<12.1f} {calculated_length:<12.1f}")
+            connections.append({
+                'edge': edge_id,
+                'from': from_node,
+                'to': to_node,
+                'declared': declared_length,
+                'calculated': calculated_length,
+                'straight': float(straight[i])
+            })
+            
+            print(f"{edge_id:<8} {from_node:<6} {to_node:<6} {declared_length:<12.1f} {calculated_length:<12.1f} {straight[i]:<12.1f}")
         
         # Summary statistics
         print("\n" + "="*80)
         print("DISTANCE VERIFICATION SUMMARY")
         print("="*80)
         
-        total_declared = sum(conn['declared'] for conn in connections)
-        total_calculated = sum(conn['calculated'] for conn in connections)
+        total_declared = graph.edge_length.sum()
+        total_calculated = graph.edge_shape_length.sum()
         
         print(f"Total network length (declared): {total_declared:.1f}m")
-        print(f"Total network length (calculated): {total_calculated:.1f}m")
+        print(f"Total network length (lane shapes): {total_calculated:.1f}m")
         print(f"Difference: {abs(total_declared - total_calculated):.1f}m")
         
         # Check for large discrepancies
         print("\nDISCREPANCY ANALYSIS:")
         print("-" * 40)
-        for conn in connections:
-            diff = abs(conn['declared'] - conn['calculated'])
-            if diff > 10:  # More than 10m difference
-                print(f"⚠️  {conn['edge']}: {diff:.1f}m difference")
+        diff = np.abs(graph.edge_length - graph.edge_shape_length)
+        for i in np.flatnonzero(diff > 10):  # More than 10m difference
+            print(f"⚠️  {graph.edge_ids[i]}: {diff[i]:.1f}m difference")
         
         # Route analysis
         print("\nROUTE DISTANCE ANALYSIS:")
         print("-" * 40)
         
         # Main route: Node1 → Node2 → Node3 → Node4 → Node13
-        main_route = ['E0', 'E1', 'E2', 'E3']
-        main_distance = sum(conn['declared'] for conn in connections if conn['edge'] in main_route)
-        print(f"Main route (E0→E1→E2→E3): {main_distance:.1f}m")
-        
         # Alternative route: Node1 → Node5 → Node6 → Node2 → Node3 → Node4 → Node13
-        alt_route = ['E4', 'E11', 'E10', 'E1', 'E2', 'E3']
-        alt_distance = sum(conn['declared'] for conn in connections if conn['edge'] in alt_route)
-        print(f"Alternative route (E4→E11→E10→E1→E2→E3): {alt_distance:.1f}m")
+        routes = {
+            'Main route': ['E0', 'E1', 'E2', 'E3'],
+            'Alternative route': ['E4', 'E11', 'E10', 'E1', 'E2', 'E3']
+        }
+        lengths, valid = graph.validate_routes(list(routes.values()))
+        for (name, route), length, ok in zip(routes.items(), lengths, valid):
+            status = "" if ok else "  ⚠️ edges not connected"
+            print(f"{name} ({'→'.join(route)}): {length:.1f}m{status}")
         
         return connections
         
@@ -162,19 +148,683 @@ def create_distance_update_guide(connections):
     print("3. Click on each edge and modify 'length' parameter")
     print("4. Save the network")
 
+class NetworkGraph:
+    """
+    Compact directed graph of a SUMO network
+
+    Junctions are nodes and non-internal edges are arcs. Adjacency is stored
+    in CSR form (indptr/indices) so neighbour lookups are array slices, and
+    all-pairs shortest distance and travel-time matrices are computed once
+    and cached on the graph.
+
+    Parameters:
+    -----------
+    node_ids : list of str
+        Junction IDs
+    node_xy : array-like, shape (n_nodes, 2)
+        Junction coordinates
+    edge_ids : list of str
+        Edge IDs
+    edge_from, edge_to : array-like of int
+        Node index of each edge's start and end junction
+    edge_length : array-like of float
+        Lane length of each edge (m)
+    edge_speed : array-like of float
+        Speed limit of each edge (m/s)
+    connections : iterable of (int, int), optional
+        Allowed (from_edge, to_edge) index pairs from the <connection>
+        elements; when given, generated routes only use permitted turns
+    shape_xy, shape_offsets : ndarray, optional
+        Lane polyline of each edge in CSR form (see network_loader); used for
+        shape-based lengths
+    """
+
+    def __init__(self, node_ids, node_xy, edge_ids, edge_from, edge_to, edge_length, edge_speed,
+                 connections=None, shape_xy=None, shape_offsets=None):
+        self.node_ids = list(node_ids)
+        self.node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.node_xy = np.asarray(node_xy, dtype=np.float64).reshape(-1, 2)
+
+        self.edge_ids = list(edge_ids)
+        self.edge_index = {edge_id: i for i, edge_id in enumerate(self.edge_ids)}
+        self.edge_from = np.asarray(edge_from, dtype=np.int32)
+        self.edge_to = np.asarray(edge_to, dtype=np.int32)
+        self.edge_length = np.asarray(edge_length, dtype=np.float64)
+        self.edge_speed = np.asarray(edge_speed, dtype=np.float64)
+        self.edge_time = self.edge_length / np.maximum(self.edge_speed, 0.1)
+
+        # CSR adjacency: arcs of node i are arc_edge[indptr[i]:indptr[i + 1]]
+        n_nodes = len(self.node_ids)
+        self.arc_edge = np.argsort(self.edge_from, kind='stable').astype(np.int32)
+        self.indices = self.edge_to[self.arc_edge]
+        self.indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.edge_from, minlength=n_nodes), out=self.indptr[1:])
+
+        self.connections = set(connections) if connections is not None else None
+
+        # Lane polylines in CSR form; edges without a shape fall back to the
+        # straight line between their junctions
+        if shape_xy is None:
+            shape_xy = np.zeros((0, 2))
+            shape_offsets = np.zeros(len(self.edge_ids) + 1, dtype=np.int64)
+        self.shape_xy = shape_xy
+        self.shape_offsets = shape_offsets
+        self.edge_shape_length = measure_polylines(shape_xy, shape_offsets)
+        no_shape = np.diff(self.shape_offsets) < 2
+        if no_shape.any():
+            chord = self.node_xy[self.edge_to[no_shape]] - self.node_xy[self.edge_from[no_shape]]
+            self.edge_shape_length[no_shape] = np.hypot(chord[:, 0], chord[:, 1])
+
+        self._reverse = None
+        self._all_pairs = {}
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_ids)
+
+    def weights(self, weight='length'):
+        """Return the per-edge weight array ('length' in m or 'time' in s)"""
+        if weight == 'length':
+            return self.edge_length
+        if weight == 'time':
+            return self.edge_time
+        raise ValueError(f"Unknown weight '{weight}' (use 'length' or 'time')")
+
+    def out_edges(self, node):
+        """Return the edge indices leaving a node (ID or index)"""
+        i = self.node_index[node] if isinstance(node, str) else node
+        return self.arc_edge[self.indptr[i]:self.indptr[i + 1]]
+
+    def _reverse_csr(self):
+        """CSR adjacency over incoming edges, built on first use"""
+        if self._reverse is None:
+            arc_edge = np.argsort(self.edge_to, kind='stable').astype(np.int32)
+            indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.edge_to, minlength=self.n_nodes), out=indptr[1:])
+            self._reverse = (indptr, self.edge_from[arc_edge], arc_edge)
+        return self._reverse
+
+    def dijkstra(self, source, weight='length', reverse=False):
+        """
+        Single-source shortest paths
+
+        With reverse=True distances are measured *to* source instead of from
+        it, which gives an exact remaining-distance bound for path searches.
+
+        Returns:
+        --------
+        (dist, pred_edge) : (ndarray, ndarray)
+            Distance to every node (inf if unreachable) and the index of the
+            last edge on the shortest path into each node (-1 if none); for
+            reverse searches, the first edge on the path out of each node
+        """
+        src = self.node_index[source] if isinstance(source, str) else source
+        w = self.weights(weight).tolist()
+        if reverse:
+            indptr, indices, arc_edge = (a.tolist() for a in self._reverse_csr())
+        else:
+            indptr = self.indptr.tolist()
+            arc_edge = self.arc_edge.tolist()
+            indices = self.indices.tolist()
+
+        dist = [math.inf] * self.n_nodes
+        pred = [-1] * self.n_nodes
+        dist[src] = 0.0
+        heap = [(0.0, src)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for arc in range(indptr[u], indptr[u + 1]):
+                v = indices[arc]
+                nd = d + w[arc_edge[arc]]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = arc_edge[arc]
+                    heapq.heappush(heap, (nd, v))
+
+        return np.array(dist), np.array(pred, dtype=np.int32)
+
+    def _floyd_warshall(self, weight):
+        n = self.n_nodes
+        w = self.weights(weight)
+        dist = np.full((n, n), np.inf)
+        pred = np.full((n, n), -1, dtype=np.int32)
+
+        # Keep only the cheapest of any parallel edges
+        order = np.argsort(w, kind='stable')[::-1]
+        dist[self.edge_from[order], self.edge_to[order]] = w[order]
+        pred[self.edge_from[order], self.edge_to[order]] = order
+        np.fill_diagonal(dist, 0.0)
+        np.fill_diagonal(pred, -1)
+
+        for k in range(n):
+            via = dist[:, k, None] + dist[None, k, :]
+            better = via < dist
+            if better.any():
+                dist = np.where(better, via, dist)
+                pred = np.where(better, pred[k][None, :], pred)
+
+        return dist, pred
+
+    def all_pairs(self, weight='length'):
+        """
+        All-pairs shortest paths, cached per weight
+
+        Uses Floyd-Warshall for small networks and Dijkstra from every source
+        for larger (sparse) ones.
+
+        Returns:
+        --------
+        (dist, pred_edge) : (ndarray, ndarray), shape (n_nodes, n_nodes)
+            dist[i, j] is the shortest distance/time from node i to node j and
+            pred_edge[i, j] the last edge on that path
+        """
+        if weight not in self._all_pairs:
+            if self.n_nodes <= FLOYD_WARSHALL_MAX_NODES:
+                result = self._floyd_warshall(weight)
+            else:
+                rows = [self.dijkstra(src, weight) for src in range(self.n_nodes)]
+                result = (np.vstack([r[0] for r in rows]), np.vstack([r[1] for r in rows]))
+            self._all_pairs[weight] = result
+        return self._all_pairs[weight]
+
+    def distance_matrix(self):
+        """Shortest driving distance (m) between every pair of junctions"""
+        return self.all_pairs('length')[0]
+
+    def travel_time_matrix(self):
+        """Free-flow travel time (s) between every pair of junctions"""
+        return self.all_pairs('time')[0]
+
+    def distance(self, from_node, to_node, weight='length'):
+        """Shortest distance (or time) between two junctions"""
+        dist = self.all_pairs(weight)[0]
+        return dist[self.node_index[from_node], self.node_index[to_node]]
+
+    def reachable(self, from_node, to_node):
+        """True if to_node can be reached from from_node"""
+        return bool(np.isfinite(self.distance(from_node, to_node)))
+
+    def shortest_path(self, from_node, to_node, weight='length'):
+        """Return the edge IDs of the shortest path, or None if unreachable"""
+        src = self.node_index[from_node]
+        dst = self.node_index[to_node]
+        dist, pred = self.all_pairs(weight)
+        if not np.isfinite(dist[src, dst]):
+            return None
+
+        edges = []
+        node = dst
+        while node != src:
+            edge = pred[src, node]
+            edges.append(self.edge_ids[edge])
+            node = self.edge_from[edge]
+        return edges[::-1]
+
+    def route_edge_indices(self, routes):
+        """
+        Flatten many routes into edge indices
+
+        Parameters:
+        -----------
+        routes : list of (list of str or str)
+            Edge ID lists, or space-separated strings as in <route edges="...">
+
+        Returns:
+        --------
+        (edges, offsets) : (ndarray, ndarray)
+            Edge index per route step (-1 for unknown IDs) and CSR offsets so
+            route i is edges[offsets[i]:offsets[i + 1]]
+        """
+        routes = [route.split() if isinstance(route, str) else route for route in routes]
+        offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+        np.cumsum([len(route) for route in routes], out=offsets[1:])
+        lookup = self.edge_index.get
+        edges = np.fromiter((lookup(edge_id, -1) for route in routes for edge_id in route),
+                            dtype=np.int64, count=offsets[-1])
+        return edges, offsets
+
+    def route_lengths(self, routes, shape=False):
+        """
+        Length of every route in one vectorized call
+
+        Parameters:
+        -----------
+        routes : list of (list of str or str)
+        shape : bool
+            Use lane shape lengths instead of declared lane lengths
+
+        Returns:
+        --------
+        ndarray
+            Route lengths (m); NaN for routes with unknown edges
+        """
+        edges, offsets = self.route_edge_indices(routes)
+        per_edge = self.edge_shape_length if shape else self.edge_length
+        known = edges >= 0
+        return segment_sums(np.where(known, per_edge[np.maximum(edges, 0)], 0.0), known, offsets)
+
+    def validate_routes(self, routes, shape=False):
+        """
+        Route lengths plus a connectivity check for every route
+
+        A route is valid when all its edges exist, each edge starts where
+        the previous one ended and, if the network declares connections,
+        every turn is permitted.
+
+        Returns:
+        --------
+        (lengths, valid) : (ndarray, ndarray of bool)
+        """
+        edges, offsets = self.route_edge_indices(routes)
+        per_edge = self.edge_shape_length if shape else self.edge_length
+        known = edges >= 0
+        safe = np.maximum(edges, 0)
+
+        lengths = segment_sums(np.where(known, per_edge[safe], 0.0), known, offsets)
+
+        # Step i -> i + 1 is a transition unless i + 1 starts a new route
+        linked = self.edge_to[safe[:-1]] == self.edge_from[safe[1:]]
+        if self.connections is not None and len(edges) > 1:
+            pair_codes = safe[:-1] * self.n_edges + safe[1:]
+            allowed = np.fromiter((a * self.n_edges + b for a, b in self.connections),
+                                  dtype=np.int64, count=len(self.connections))
+            linked &= np.isin(pair_codes, allowed)
+        ok_step = np.ones(len(edges), dtype=bool)
+        ok_step[:-1] = linked & known[:-1] & known[1:]
+        ok_step[offsets[1:][offsets[1:] > 0] - 1] = True
+        ok_step &= known
+
+        bad = np.concatenate(([0], np.cumsum(~ok_step)))
+        valid = (bad[offsets[1:]] == bad[offsets[:-1]]) & (offsets[1:] > offsets[:-1])
+        return lengths, valid
+
+
+def segment_sums(values, known, offsets):
+    """
+    Per-route sums of zero-filled step values, NaN for routes with an
+    unknown step (route i covers values[..., offsets[i]:offsets[i + 1]])
+    """
+    cumulative = np.concatenate((np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)), axis=-1)
+    totals = cumulative[..., offsets[1:]] - cumulative[..., offsets[:-1]]
+    unknown = np.concatenate(([0], np.cumsum(~known)))
+    totals[..., unknown[offsets[1:]] != unknown[offsets[:-1]]] = np.nan
+    return totals
+
+
+def build_network_graph(net_file, use_cache=True):
+    """
+    Build a NetworkGraph from a SUMO .net.xml (internal edges skipped)
+
+    The network is read through network_loader, so repeated runs load the
+    binary snapshot instead of parsing the XML again.
+    """
+    network = load_network(net_file, use_cache=use_cache)
+    first_lanes = network.first_lanes()
+    shape_xy, shape_offsets = take_rows(network.lane_shape_xy, network.lane_shape_offsets, first_lanes)
+
+    connections = set(zip(network.connection_from.tolist(), network.connection_to.tolist()))
+    return NetworkGraph(network.junction_ids, network.junction_xy, network.edge_ids,
+                        network.edge_from, network.edge_to,
+                        network.lane_length[first_lanes], network.edge_speed(),
+                        connections=connections or None,
+                        shape_xy=shape_xy, shape_offsets=shape_offsets)
+
+
+_graph_cache = {}
+
+
+def load_network_graph(net_file):
+    """Return a cached NetworkGraph for net_file, rebuilding if the file changed"""
+    key = os.path.abspath(net_file)
+    mtime = os.path.getmtime(net_file)
+    cached = _graph_cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, build_network_graph(net_file))
+        _graph_cache[key] = cached
+    return cached[1]
+
+
+def print_reachability_summary(graph):
+    """Print junction-to-junction shortest distances and unreachable pairs"""
+    print("\n" + "="*80)
+    print("SHORTEST DISTANCE MATRIX (m)")
+    print("="*80)
+
+    dist = graph.distance_matrix()
+    travel_time = graph.travel_time_matrix()
+    reachable = np.isfinite(dist)
+    np.fill_diagonal(reachable, False)
+    n = graph.n_nodes
+
+    print(f"Nodes: {n}  Edges: {graph.n_edges}")
+    print(f"Reachable ordered pairs: {int(reachable.sum())} of {n * (n - 1)}")
+
+    if n <= 20:
+        print(f"{'':<8}" + "".join(f"{node_id:>8}" for node_id in graph.node_ids))
+        for i, node_id in enumerate(graph.node_ids):
+            row = "".join(f"{d:>8.0f}" if np.isfinite(d) else f"{'-':>8}" for d in dist[i])
+            print(f"{node_id:<8}{row}")
+
+    # Farthest reachable pair by travel time
+    finite_time = np.where(reachable, travel_time, -1)
+    if finite_time.max() > 0:
+        i, j = np.unravel_index(np.argmax(finite_time), finite_time.shape)
+        print(f"\nLongest shortest trip: {graph.node_ids[i]} → {graph.node_ids[j]} "
+              f"{dist[i, j]:.1f}m, {travel_time[i, j]:.1f}s")
+
+    dead_ends = [graph.node_ids[i] for i in range(n) if not reachable[i].any()]
+    if dead_ends:
+        print(f"⚠️  Junctions with no outgoing path: {', '.join(dead_ends)}")
+
+
+def _turn_allowed(graph, prev_edge, edge):
+    return prev_edge < 0 or graph.connections is None or (prev_edge, edge) in graph.connections
+
+
+def enumerate_routes(graph, from_node, to_node, max_length=None, max_detour=1.5,
+                     weight='length', limit=10000):
+    """
+    Enumerate simple paths between two junctions within a length bound
+
+    The search is a depth-first walk pruned with the exact remaining distance
+    to the target (one reverse Dijkstra), so only branches that can still
+    finish inside the bound are expanded. This keeps it fast on large
+    networks as long as the bound is reasonably tight. Found paths are kept
+    in a bounded heap, so with more than `limit` candidates the result is
+    still the cheapest `limit` of them (and the bound tightens to the worst
+    kept path once the heap is full).
+
+    Parameters:
+    -----------
+    graph : NetworkGraph
+    from_node, to_node : str
+        Junction IDs
+    max_length : float, optional
+        Absolute bound on path length (m, or s for weight='time')
+    max_detour : float, optional
+        Bound as a multiple of the shortest path (1.5 = at most 50% longer)
+    weight : str
+        'length' or 'time'
+    limit : int
+        Keep at most this many paths (the cheapest)
+
+    Returns:
+    --------
+    list of (float, list of str)
+        (cost, edge IDs) of the cheapest paths within the bound, cheapest first
+    """
+    src = graph.node_index[from_node]
+    dst = graph.node_index[to_node]
+    w = graph.weights(weight)
+    to_target = graph.dijkstra(dst, weight, reverse=True)[0]
+
+    shortest = to_target[src]
+    if not np.isfinite(shortest):
+        return []
+    if graph.connections is not None:
+        # The detour bound is relative to the shortest *legal* path
+        legal = _restricted_shortest_path(graph, src, dst, w.tolist(), set(), set(),
+                                          to_target=to_target.tolist())
+        if legal is None:
+            return []
+        shortest = legal[0]
+
+    bound = math.inf
+    if max_length is not None:
+        bound = min(bound, max_length)
+    if max_detour is not None:
+        bound = min(bound, shortest * max_detour)
+    bound += 1e-9
+
+    indptr = graph.indptr
+    arc_edge = graph.arc_edge
+    edge_to = graph.edge_to
+
+    # Max-heap of the kept paths: (-cost, -order found, edge indices)
+    routes = []
+    found = 0
+    on_path = np.zeros(graph.n_nodes, dtype=bool)
+    on_path[src] = True
+    edges = []
+    # Each frame: (node, cost so far, candidate out-edges, next candidate position)
+    stack = [(src, 0.0, arc_edge[indptr[src]:indptr[src + 1]], 0)]
+
+    while stack and limit > 0:
+        node, cost, out_edges, pos = stack.pop()
+        if pos >= len(out_edges):
+            on_path[node] = False
+            if edges:
+                edges.pop()
+            continue
+        stack.append((node, cost, out_edges, pos + 1))
+
+        edge = int(out_edges[pos])
+        nxt = int(edge_to[edge])
+        new_cost = cost + w[edge]
+        if on_path[nxt] or new_cost + to_target[nxt] > bound:
+            continue
+        if not _turn_allowed(graph, edges[-1] if edges else -1, edge):
+            continue
+
+        if nxt == dst:
+            entry = (-new_cost, -found, edges + [edge])
+            found += 1
+            if len(routes) < limit:
+                heapq.heappush(routes, entry)
+            else:
+                heapq.heappushpop(routes, entry)
+            if len(routes) == limit:
+                bound = min(bound, -routes[0][0])
+            continue
+
+        on_path[nxt] = True
+        edges.append(edge)
+        stack.append((nxt, new_cost, arc_edge[indptr[nxt]:indptr[nxt + 1]], 0))
+
+    routes.sort(reverse=True)
+    return [(-neg_cost, [graph.edge_ids[e] for e in path]) for neg_cost, _, path in routes]
+
+
+def _restricted_shortest_path(graph, src, dst, w, banned_edges, banned_nodes, banned_first=(),
+                              first_prev=-1, to_target=None, adjacency=None):
+    """
+    A* over edge states honouring bans and turn restrictions
+
+    banned_edges/banned_nodes may not be used anywhere on the path, while
+    banned_first only forbids leaving src along those edges. to_target (the
+    unrestricted distance to dst from every node) is an admissible heuristic
+    that keeps repeated spur searches local to the corridor towards dst.
+    """
+    if adjacency is None:
+        adjacency = _adjacency_lists(graph)
+    out_edges, edge_to = adjacency
+    h = to_target if to_target is not None else [0.0] * graph.n_nodes
+
+    # States are the last edge used, so turn restrictions can be checked;
+    # the counter keeps heap entries with equal cost from comparing parents
+    best = {}
+    counter = 0
+    heap = [(h[src], counter, 0.0, first_prev, src, None)]
+    while heap:
+        _, _, cost, prev_edge, node, parent = heapq.heappop(heap)
+        if node == dst:
+            path = []
+            while parent is not None:
+                edge, parent = parent
+                path.append(edge)
+            return cost, path[::-1]
+        if best.get(prev_edge, math.inf) < cost:
+            continue
+        for edge in out_edges[node]:
+            nxt = edge_to[edge]
+            if edge in banned_edges or nxt in banned_nodes:
+                continue
+            if parent is None and edge in banned_first:
+                continue
+            if not _turn_allowed(graph, prev_edge, edge):
+                continue
+            if h[nxt] == math.inf:
+                continue
+            new_cost = cost + w[edge]
+            if new_cost < best.get(edge, math.inf):
+                best[edge] = new_cost
+                counter += 1
+                heapq.heappush(heap, (new_cost + h[nxt], counter, new_cost, edge, nxt, (edge, parent)))
+    return None
+
+
+def _adjacency_lists(graph):
+    """Plain-list view of the CSR arrays for tight Python search loops"""
+    indptr = graph.indptr.tolist()
+    arc_edge = graph.arc_edge.tolist()
+    out_edges = [arc_edge[indptr[i]:indptr[i + 1]] for i in range(graph.n_nodes)]
+    return out_edges, graph.edge_to.tolist()
+
+
+def k_shortest_paths(graph, from_node, to_node, k=5, weight='length'):
+    """
+    Yen's algorithm: the k shortest loop-free paths between two junctions
+
+    Without turn restrictions paths never revisit a junction. When the graph
+    carries <connection> restrictions, Yen runs over edges instead: a legal
+    route may need to pass a junction twice (looping round a block to make a
+    banned turn), so paths are loop-free in edges rather than junctions.
+
+    Returns:
+    --------
+    list of (float, list of str)
+        (cost, edge IDs), cheapest first
+    """
+    src = graph.node_index[from_node]
+    dst = graph.node_index[to_node]
+    w = graph.weights(weight)
+    w_list = w.tolist()
+    edge_simple = graph.connections is not None
+    adjacency = _adjacency_lists(graph)
+    to_target = graph.dijkstra(dst, weight, reverse=True)[0].tolist()
+
+    first = _restricted_shortest_path(graph, src, dst, w_list, set(), set(),
+                                      to_target=to_target, adjacency=adjacency)
+    if first is None:
+        return []
+
+    accepted = [first]
+    candidates = []
+    seen = {tuple(first[1])}
+
+    while len(accepted) < k:
+        _, last_path = accepted[-1]
+        for i in range(len(last_path)):
+            root = last_path[:i]
+            spur_node = src if i == 0 else int(graph.edge_to[root[-1]])
+
+            # The spur may not leave along the next edge of any accepted path
+            # sharing this root
+            banned_first = {path[i] for _, path in accepted if len(path) > i and path[:i] == root}
+            if edge_simple:
+                banned_edges = set(root)
+                banned_nodes = set()
+            else:
+                # Root nodes (including the spur node) may not be revisited
+                banned_edges = set()
+                banned_nodes = {src} | {int(graph.edge_to[e]) for e in root}
+
+            spur = _restricted_shortest_path(graph, spur_node, dst, w_list, banned_edges, banned_nodes,
+                                             banned_first=banned_first,
+                                             first_prev=root[-1] if root else -1,
+                                             to_target=to_target, adjacency=adjacency)
+            if spur is None:
+                continue
+
+            path = root + spur[1]
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (float(w[path].sum()), path))
+
+        if not candidates:
+            break
+        accepted.append(heapq.heappop(candidates))
+
+    return [(cost, [graph.edge_ids[e] for e in path]) for cost, path in accepted]
+
+
+def routes_to_xml(graph, routes, prefix='route'):
+    """
+    Render routes as <route> elements ready to paste into a .rou.xml
+
+    Parameters:
+    -----------
+    graph : NetworkGraph
+    routes : list of (float, list of str)
+        Output of enumerate_routes or k_shortest_paths
+    prefix : str
+        Route ID prefix; routes are numbered from 1
+
+    Returns:
+    --------
+    str
+    """
+    lines = []
+    for number, (cost, edges) in enumerate(routes, start=1):
+        nodes = [graph.node_ids[graph.edge_from[graph.edge_index[edges[0]]]]]
+        nodes += [graph.node_ids[graph.edge_to[graph.edge_index[e]]] for e in edges]
+        lines.append(f"    <!-- Route {number}: {'→'.join(nodes)} ({cost:.1f}) -->")
+        lines.append(f'    <route id="{prefix}{number}" edges="{" ".join(edges)}"/>')
+    return "\n".join(lines)
+
+
+def print_route_options(graph, from_node, to_node, k=5, max_detour=1.5):
+    """Print k shortest paths and every route within the detour bound"""
+    print("\n" + "="*80)
+    print(f"ROUTE OPTIONS: {from_node} → {to_node}")
+    print("="*80)
+
+    shortest = k_shortest_paths(graph, from_node, to_node, k=k)
+    print(f"\n{len(shortest)} shortest paths (Yen):")
+    for cost, edges in shortest:
+        print(f"  {cost:8.1f}m  {' '.join(edges)}")
+
+    bounded = enumerate_routes(graph, from_node, to_node, max_detour=max_detour)
+    print(f"\n{len(bounded)} simple paths within {max_detour:.2f}x of shortest:")
+    print(routes_to_xml(graph, bounded))
+
+
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and not sys.argv[1].startswith('--'):
         net_file = sys.argv[1]
     else:
         net_file = "Test1.net.xml"
+
+    # python network_analyzer.py [net_file] --routes FROM TO [K]
+    if '--routes' in sys.argv:
+        args = sys.argv[sys.argv.index('--routes') + 1:]
+        if len(args) < 2:
+            print("Usage: python network_analyzer.py [net_file] --routes FROM TO [K]")
+            sys.exit(1)
+        graph = load_network_graph(net_file)
+        unknown = [node for node in args[:2] if node not in graph.node_index]
+        if unknown:
+            print(f"✗ Unknown junction: {', '.join(unknown)} (not in {net_file})")
+            if graph.n_nodes <= 50:
+                print(f"  Junctions: {', '.join(sorted(graph.node_index))}")
+            sys.exit(1)
+        print_route_options(graph, args[0], args[1], k=int(args[2]) if len(args) > 2 else 5)
+        sys.exit(0)
     
     print(f"Analyzing network file: {net_file}")
     connections = analyze_network(net_file)
     
     if connections:
         compare_with_diagram(connections)
+        print_reachability_summary(load_network_graph(net_file))
         create_distance_update_guide(connections)
     else:
         print("Failed to analyze network file.")
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""
+Network Consistency Checker Across MOD Variants
+Loads the network, route, additional and config files of every MOD folder
+(and stray copies such as "Test1.rou - Copy.xml") in parallel and diffs
+nodes, edges, lane lengths, routes, vehicle types, demand, charging stations
+and simulation settings against a reference variant, so it is clear at a
+glance why two MOD runs give different numbers.
+
+Identical files (same content hash) are parsed only once.
+
+Usage:
+    python network_consistency.py [root_dir] [--ref MOD4]
+"""
+
+import os
+import sys
+import glob
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from network_loader import parse_network, file_hash
+
+DEFAULT_ROOT = '..'
+LENGTH_TOLERANCE = 0.01  # metres
+COORD_TOLERANCE = 0.01
+CATEGORIES = ['config', 'nodes', 'edges', 'routes', 'vtypes', 'demand', 'chargers']
+
+
+def _summarize_net(path):
+    """Nodes and edges of a .net.xml as plain dicts"""
+    network = parse_network(path)
+    nodes = {junction_id: (float(x), float(y))
+             for junction_id, (x, y) in zip(network.junction_ids, network.junction_xy.tolist())}
+    first_lanes = network.first_lanes()
+    edges = {}
+    for i, edge_id in enumerate(network.edge_ids):
+        edges[edge_id] = {
+            'from': network.junction_ids[network.edge_from[i]],
+            'to': network.junction_ids[network.edge_to[i]],
+            'length': round(float(network.lane_length[first_lanes[i]]), 2),
+            'lanes': int(network.edge_lane_offsets[i + 1] - network.edge_lane_offsets[i]),
+            'speed': round(float(network.lane_speed[first_lanes[i]]), 2)
+        }
+    return {'nodes': nodes, 'edges': edges}
+
+
+def _summarize_routes(path):
+    """Routes, vTypes and per-type demand of a .rou.xml"""
+    root = ET.parse(path).getroot()
+    routes = {route.get('id'): route.get('edges', '').split()
+              for route in root.iter('route') if route.get('id')}
+    vtypes = {vtype.get('id'): {key: value for key, value in vtype.attrib.items() if key != 'id'}
+              for vtype in root.iter('vType')}
+
+    demand = {}
+    for vehicle in root.iter('vehicle'):
+        key = f"vehicles:{vehicle.get('type', 'DEFAULT_VEHTYPE')}"
+        demand[key] = demand.get(key, 0) + 1
+    for flow in root.iter('flow'):
+        key = f"flow:{flow.get('id')}"
+        demand[key] = ' '.join(f"{attr}={flow.get(attr)}" for attr in
+                               ('type', 'route', 'begin', 'end', 'number', 'period', 'vehsPerHour')
+                               if flow.get(attr) is not None)
+    return {'routes': routes, 'vtypes': vtypes, 'demand': demand}
+
+
+def _summarize_add(path):
+    """Charging stations of an additional file"""
+    root = ET.parse(path).getroot()
+    chargers = {}
+    for station in root.iter('chargingStation'):
+        chargers[station.get('id')] = {key: value for key, value in station.attrib.items()
+                                       if key not in ('id', 'name')}
+    return {'chargers': chargers}
+
+
+def _summarize_config(path):
+    """Time settings and referenced files of a .sumocfg"""
+    root = ET.parse(path).getroot()
+    config = {}
+    for elem in root.iter():
+        if elem.get('value') is not None and elem.tag in ('net-file', 'route-files', 'additional-files',
+                                                          'begin', 'end', 'step-length'):
+            config[elem.tag] = elem.get('value')
+    return {'config': config}
+
+
+_SUMMARIZERS = {
+    'net': _summarize_net,
+    'rou': _summarize_routes,
+    'add': _summarize_add,
+    'cfg': _summarize_config
+}
+
+
+def _load_file(kind, path):
+    """Worker entry point: parse one file into its summary"""
+    try:
+        return _SUMMARIZERS[kind](path)
+    except Exception as e:
+        return {'error': f"{os.path.basename(path)}: {e}"}
+
+
+def discover_variants(root_dir=DEFAULT_ROOT):
+    """
+    Find every simulation variant below root_dir
+
+    A variant is a folder holding Test1.net.xml. Each extra Test1.rou*.xml
+    in a folder (e.g. "Test1.rou - Copy.xml") becomes its own variant that
+    shares the folder's network and additional file.
+
+    Returns:
+    --------
+    list of dict
+        Keys: label, net, rou, add, cfg (missing files are None)
+    """
+    folders = [root_dir] + sorted(path for path in glob.glob(os.path.join(root_dir, '*'))
+                                  if os.path.isdir(path))
+    variants = []
+    for folder in folders:
+        net_file = os.path.join(folder, 'Test1.net.xml')
+        if not os.path.exists(net_file):
+            continue
+
+        name = os.path.basename(os.path.normpath(os.path.abspath(folder)))
+        add_file = os.path.join(folder, 'Test1.add.xml')
+        cfg_file = os.path.join(folder, 'Test1.sumocfg')
+        route_files = sorted(glob.glob(os.path.join(folder, 'Test1.rou*.xml')),
+                             key=lambda path: (os.path.basename(path) != 'Test1.rou.xml', path))
+        for route_file in route_files or [None]:
+            label = name
+            if route_file and os.path.basename(route_file) != 'Test1.rou.xml':
+                label = f"{name} [{os.path.basename(route_file)}]"
+            variants.append({
+                'label': label,
+                'net': net_file,
+                'rou': route_file,
+                'add': add_file if os.path.exists(add_file) else None,
+                'cfg': cfg_file if os.path.exists(cfg_file) else None
+            })
+    return variants
+
+
+def load_variants(variants, workers=None):
+    """
+    Parse every file of every variant in parallel
+
+    Files with identical content are parsed once and shared.
+
+    Returns:
+    --------
+    dict
+        Variant label -> merged summary (config, nodes, edges, routes,
+        vtypes, demand, chargers, errors, hashes)
+    """
+    jobs = {}
+    hashes = {}
+    for variant in variants:
+        for kind in _SUMMARIZERS:
+            path = variant[kind]
+            if path and path not in hashes:
+                hashes[path] = file_hash(path)
+                jobs.setdefault((kind, hashes[path]), path)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {key: executor.submit(_load_file, key[0], path) for key, path in jobs.items()}
+        parsed = {key: future.result() for key, future in futures.items()}
+
+    loaded = {}
+    for variant in variants:
+        summary = {category: {} for category in CATEGORIES}
+        summary['errors'] = []
+        summary['hashes'] = {}
+        for kind in _SUMMARIZERS:
+            path = variant[kind]
+            if not path:
+                continue
+            summary['hashes'][kind] = hashes[path]
+            result = parsed[(kind, hashes[path])]
+            if 'error' in result:
+                summary['errors'].append(result['error'])
+            else:
+                summary.update(result)
+        loaded[variant['label']] = summary
+    return loaded
+
+
+def _values_differ(category, a, b):
+    if category == 'nodes':
+        return abs(a[0] - b[0]) > COORD_TOLERANCE or abs(a[1] - b[1]) > COORD_TOLERANCE
+    if category == 'edges':
+        return (a['from'], a['to'], a['lanes']) != (b['from'], b['to'], b['lanes']) \
+            or abs(a['length'] - b['length']) > LENGTH_TOLERANCE or a['speed'] != b['speed']
+    return a != b
+
+
+def _describe_change(category, a, b):
+    if category == 'nodes':
+        return f"({a[0]:.1f}, {a[1]:.1f}) → ({b[0]:.1f}, {b[1]:.1f})"
+    if category == 'routes':
+        return f"{' '.join(a)} → {' '.join(b)}"
+    if isinstance(a, dict):
+        keys = sorted(set(a) | set(b))
+        return ', '.join(f"{key}: {a.get(key)} → {b.get(key)}" for key in keys if a.get(key) != b.get(key))
+    return f"{a} → {b}"
+
+
+def diff_variants(reference, other):
+    """
+    Structural differences of one variant relative to the reference
+
+    Returns:
+    --------
+    dict
+        Category -> {'added': [...], 'removed': [...], 'changed': [(key, description), ...]}
+        (categories without differences are left out)
+    """
+    differences = {}
+    for category in CATEGORIES:
+        ref_items = reference.get(category, {})
+        other_items = other.get(category, {})
+        added = sorted(set(other_items) - set(ref_items))
+        removed = sorted(set(ref_items) - set(other_items))
+        changed = [(key, _describe_change(category, ref_items[key], other_items[key]))
+                   for key in sorted(set(ref_items) & set(other_items))
+                   if _values_differ(category, ref_items[key], other_items[key])]
+        if added or removed or changed:
+            differences[category] = {'added': added, 'removed': removed, 'changed': changed}
+    return differences
+
+
+def print_consistency_report(loaded, reference_label, detail=8):
+    """Print a file-identity matrix followed by per-variant differences"""
+    print("\n" + "="*80)
+    print(f"NETWORK CONSISTENCY ACROSS VARIANTS (reference: {reference_label})")
+    print("="*80)
+
+    reference = loaded[reference_label]
+    print(f"\n{'Variant':<40} {'net':>5} {'rou':>5} {'add':>5} {'cfg':>5}")
+    print("-" * 64)
+    for label, summary in loaded.items():
+        marks = []
+        for kind in _SUMMARIZERS:
+            digest = summary['hashes'].get(kind)
+            if digest is None:
+                marks.append('-')
+            else:
+                marks.append('=' if digest == reference['hashes'].get(kind) else '≠')
+        print(f"{label[:40]:<40} {marks[0]:>5} {marks[1]:>5} {marks[2]:>5} {marks[3]:>5}")
+
+    for label, summary in loaded.items():
+        if label == reference_label:
+            continue
+        print(f"\n📂 {label}")
+        for error in summary['errors']:
+            print(f"   ✗ {error}")
+
+        differences = diff_variants(reference, summary)
+        if not differences:
+            print("   ✓ Structurally identical to reference")
+            continue
+
+        for category, diff in differences.items():
+            print(f"   ⚠️  {category}: +{len(diff['added'])} -{len(diff['removed'])} ~{len(diff['changed'])}")
+            if diff['added']:
+                print(f"      added:   {', '.join(diff['added'][:detail])}"
+                      f"{' ...' if len(diff['added']) > detail else ''}")
+            if diff['removed']:
+                print(f"      removed: {', '.join(diff['removed'][:detail])}"
+                      f"{' ...' if len(diff['removed']) > detail else ''}")
+            for key, description in diff['changed'][:detail]:
+                print(f"      {key}: {description}")
+            if len(diff['changed']) > detail:
+                print(f"      ... {len(diff['changed']) - detail} more")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    reference_label = None
+    if '--ref' in args:
+        position = args.index('--ref')
+        reference_label = args[position + 1] if position + 1 < len(args) else None
+        del args[position:position + 2]
+    root_dir = args[0] if args else DEFAULT_ROOT
+
+    variants = discover_variants(root_dir)
+    if not variants:
+        print(f"No Test1.net.xml found under: {root_dir}")
+        sys.exit(1)
+
+    loaded = load_variants(variants)
+    print(f"✓ Loaded {len(variants)} variants")
+
+    if reference_label is None:
+        current = os.path.basename(os.getcwd())
+        reference_label = current if current in loaded else variants[-1]['label']
+    if reference_label not in loaded:
+        print(f"Unknown reference variant: {reference_label}")
+        print(f"Available: {', '.join(loaded)}")
+        sys.exit(1)
+
+    print_consistency_report(loaded, reference_label)
@@ -0,0 +1,482 @@
+"""
+SUMO Network Loader with Binary Snapshots
+Parses a .net.xml once with streaming iterparse into compact NumPy arrays
+(junction coordinates, edge endpoints, lane lengths/speeds/shapes and
+connections) and saves them as a versioned .npz snapshot keyed by the file's
+content hash. Later loads of the same network read the snapshot instead of
+the XML, which matters for city-scale OSM imports.
+
+Usage:
+    python network_loader.py Test1.net.xml        # build/refresh the snapshot
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CACHE_DIR = '.network_cache'
+_HASH_INDEX = 'hashes.json'
+
+
+def shape_arrays(shapes):
+    """
+    Parse SUMO shape strings ("x1,y1 x2,y2 ...") into one point array
+
+    Returns:
+    --------
+    (points, offsets) : (ndarray, ndarray)
+        All points stacked as (n_points, 2) and CSR offsets so shape i is
+        points[offsets[i]:offsets[i + 1]]
+    """
+    counts = np.fromiter((shape.count(' ') + 1 if shape else 0 for shape in shapes),
+                         dtype=np.int64, count=len(shapes))
+    offsets = np.zeros(len(shapes) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    flat = ' '.join(shape for shape in shapes if shape).replace(',', ' ').split()
+    points = np.array(flat, dtype=np.float64).reshape(-1, 2)
+    return points, offsets
+
+
+def measure_polylines(points, offsets):
+    """Length of every polyline in a CSR point array"""
+    counts = np.diff(offsets)
+    if len(points) < 2:
+        return np.zeros(len(counts))
+
+    # Segment i joins point i and i + 1; measuring each polyline between its
+    # first and last point never includes the segments joining two polylines
+    segments = np.hypot(*np.diff(points, axis=0).T)
+    cumulative = np.concatenate(([0.0], np.cumsum(segments)))
+    first = np.minimum(offsets[:-1], len(points) - 1)
+    last = np.maximum(offsets[1:] - 1, 0)
+    return np.where(counts >= 2, cumulative[last] - cumulative[first], 0.0)
+
+
+def polyline_lengths(shapes):
+    """
+    Lengths of many SUMO shape strings in one pass
+
+    Returns:
+    --------
+    (lengths, points, offsets) : (ndarray, ndarray, ndarray)
+    """
+    points, offsets = shape_arrays(shapes)
+    return measure_polylines(points, offsets), points, offsets
+
+
+def take_rows(points, offsets, rows):
+    """Gather rows of a CSR point array into a new (points, offsets) pair"""
+    rows = np.asarray(rows, dtype=np.int64)
+    counts = offsets[rows + 1] - offsets[rows]
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    # Index of every gathered point: row start plus position within the row
+    starts = np.repeat(offsets[rows] - new_offsets[:-1], counts)
+    return points[starts + np.arange(new_offsets[-1])], new_offsets
+
+
+class NetworkArrays:
+    """
+    Compact array form of a SUMO network (normal edges only)
+
+    Attributes:
+    -----------
+    junction_ids : list of str
+    junction_xy : ndarray, shape (n_junctions, 2)
+    edge_ids : list of str
+    edge_from, edge_to : ndarray of int32
+        Junction index of each edge's endpoints
+    edge_lane_offsets : ndarray of int64
+        Lanes of edge i are lane rows edge_lane_offsets[i]:edge_lane_offsets[i + 1]
+    lane_ids : list of str
+    lane_edge : ndarray of int32
+    lane_length, lane_speed : ndarray of float64
+    lane_shape_xy : ndarray, shape (n_points, 2)
+    lane_shape_offsets : ndarray of int64
+        Shape of lane i is lane_shape_xy[lane_shape_offsets[i]:lane_shape_offsets[i + 1]]
+    connection_from, connection_to : ndarray of int32
+        Edge indices of every edge-to-edge connection
+    """
+
+    FIELDS = [
+        'junction_ids', 'junction_xy',
+        'edge_ids', 'edge_from', 'edge_to', 'edge_lane_offsets',
+        'lane_ids', 'lane_edge', 'lane_length', 'lane_speed',
+        'lane_shape_xy', 'lane_shape_offsets',
+        'connection_from', 'connection_to'
+    ]
+    _ID_FIELDS = ('junction_ids', 'edge_ids', 'lane_ids')
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, fields[name])
+        self.source = fields.get('source')
+        self.source_hash = fields.get('source_hash')
+
+    @property
+    def n_junctions(self):
+        return len(self.junction_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_ids)
+
+    @property
+    def n_lanes(self):
+        return len(self.lane_ids)
+
+    def first_lanes(self):
+        """Lane row of lane index 0 of every edge"""
+        return self.edge_lane_offsets[:-1]
+
+    def edge_speed(self):
+        """Fastest lane speed of every edge"""
+        if self.n_lanes == 0:
+            return np.zeros(self.n_edges)
+        return np.maximum.reduceat(self.lane_speed, self.edge_lane_offsets[:-1])
+
+    def save(self, path):
+        """Write the arrays as an uncompressed .npz snapshot"""
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        for name in self._ID_FIELDS:
+            data[name] = np.array(data[name], dtype=str)
+        data['version'] = np.array(SNAPSHOT_VERSION)
+        data['source_hash'] = np.array(self.source_hash or '')
+        # A private temp file per writer, so concurrent loaders never mix their output
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by save(); returns None if it is outdated"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != SNAPSHOT_VERSION:
+                return None
+            fields = {name: data[name] for name in cls.FIELDS}
+            source_hash = str(data['source_hash'])
+        for name in cls._ID_FIELDS:
+            fields[name] = fields[name].tolist()
+        return cls(source_hash=source_hash, **fields)
+
+
+def parse_network(net_file):
+    """Stream-parse a .net.xml (or .net.xml.gz) into NetworkArrays without building the full tree"""
+    # OSM imports are often kept gzipped (osm.net.xml.gz)
+    source = gzip.open(net_file, 'rb') if net_file.endswith('.gz') else open(net_file, 'rb')
+    with source:
+        return _parse_stream(source, net_file)
+
+
+def _parse_stream(source, net_file):
+    junction_ids, junction_xy = [], []
+    edge_ids, edge_from_ids, edge_to_ids, edge_lane_counts = [], [], [], []
+    lane_ids, lane_length, lane_speed, lane_shapes = [], [], [], []
+    connections = []
+
+    context = ET.iterparse(source, events=('start', 'end'))
+    _, root = next(context)
+    depth = 1
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        # Only direct children of <net> are handled; lanes are read from
+        # their parent edge and everything is cleared once processed
+        if depth != 1:
+            continue
+
+        tag = elem.tag
+        if tag == 'junction':
+            if elem.get('type') != 'internal':
+                junction_ids.append(elem.get('id'))
+                junction_xy.append((float(elem.get('x', 0)), float(elem.get('y', 0))))
+        elif tag == 'edge':
+            if elem.get('function', 'normal') == 'normal':
+                lanes = elem.findall('lane')
+                if lanes:
+                    edge_ids.append(elem.get('id'))
+                    edge_from_ids.append(elem.get('from'))
+                    edge_to_ids.append(elem.get('to'))
+                    edge_lane_counts.append(len(lanes))
+                    for lane in lanes:
+                        lane_ids.append(lane.get('id'))
+                        lane_length.append(float(lane.get('length', 0)))
+                        lane_speed.append(float(lane.get('speed', 13.89)))
+                        lane_shapes.append(lane.get('shape', ''))
+        elif tag == 'connection':
+            connections.append((elem.get('from'), elem.get('to')))
+        root.clear()
+
+    # Drop edges whose endpoints are not known junctions
+    junction_index = {junction_id: i for i, junction_id in enumerate(junction_ids)}
+    keep = [f in junction_index and t in junction_index for f, t in zip(edge_from_ids, edge_to_ids)]
+    lane_keep = np.repeat(np.array(keep, dtype=bool), edge_lane_counts) if keep else np.zeros(0, dtype=bool)
+
+    edge_ids = [e for e, k in zip(edge_ids, keep) if k]
+    edge_from = np.array([junction_index[f] for f, k in zip(edge_from_ids, keep) if k], dtype=np.int32)
+    edge_to = np.array([junction_index[t] for t, k in zip(edge_to_ids, keep) if k], dtype=np.int32)
+    lane_counts = np.array([c for c, k in zip(edge_lane_counts, keep) if k], dtype=np.int64)
+    edge_lane_offsets = np.zeros(len(edge_ids) + 1, dtype=np.int64)
+    np.cumsum(lane_counts, out=edge_lane_offsets[1:])
+
+    lane_ids = [lane_id for lane_id, k in zip(lane_ids, lane_keep) if k]
+    lane_shapes = [shape for shape, k in zip(lane_shapes, lane_keep) if k]
+    lane_shape_xy, lane_shape_offsets = shape_arrays(lane_shapes)
+
+    edge_index = {edge_id: i for i, edge_id in enumerate(edge_ids)}
+    pairs = [(edge_index[f], edge_index[t]) for f, t in connections
+             if f in edge_index and t in edge_index]
+    pairs = sorted(set(pairs))
+
+    return NetworkArrays(
+        junction_ids=junction_ids,
+        junction_xy=np.array(junction_xy, dtype=np.float64).reshape(-1, 2),
+        edge_ids=edge_ids,
+        edge_from=edge_from,
+        edge_to=edge_to,
+        edge_lane_offsets=edge_lane_offsets,
+        lane_ids=lane_ids,
+        lane_edge=np.repeat(np.arange(len(edge_ids), dtype=np.int32), lane_counts),
+        lane_length=np.array(lane_length, dtype=np.float64)[lane_keep],
+        lane_speed=np.array(lane_speed, dtype=np.float64)[lane_keep],
+        lane_shape_xy=lane_shape_xy,
+        lane_shape_offsets=lane_shape_offsets,
+        connection_from=np.array([p[0] for p in pairs], dtype=np.int32),
+        connection_to=np.array([p[1] for p in pairs], dtype=np.int32),
+        source=net_file
+    )
+
+
+def lane_positions_xy(network, lane_rows, positions):
+    """
+    Coordinates of positions along lanes, as SUMO places them
+
+    Parameters:
+    -----------
+    network : NetworkArrays
+    lane_rows : array-like of int
+        Lane row of each query
+    positions : array-like of float
+        Offset along the lane (m); SUMO scales offsets by shape length /
+        declared lane length, so the same is done here
+
+    Returns:
+    --------
+    ndarray, shape (n, 2)
+        NaN for lanes without a shape
+    """
+    lane_rows = np.asarray(lane_rows, dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.float64)
+    points = network.lane_shape_xy
+    offsets = network.lane_shape_offsets
+    no_shape = offsets[lane_rows + 1] == offsets[lane_rows]
+    if len(points) == 0:
+        return np.full((len(lane_rows), 2), np.nan)
+
+    segments = np.hypot(*np.diff(points, axis=0).T) if len(points) > 1 else np.zeros(0)
+    cumulative = np.concatenate(([0.0], np.cumsum(segments)))
+    # Clamped like measure_polylines, so an empty shape never reads its neighbour's points
+    first = np.minimum(offsets[lane_rows], len(points) - 1)
+    last = np.maximum(offsets[lane_rows + 1] - 1, first)
+    shape_length = cumulative[last] - cumulative[first]
+    lane_length = network.lane_length[lane_rows]
+    scale = np.divide(shape_length, lane_length, out=np.ones_like(shape_length), where=lane_length > 0)
+    target = cumulative[first] + np.clip(positions * scale, 0, shape_length)
+
+    # Segment containing each target, kept inside the lane's own polyline
+    seg = np.searchsorted(cumulative, target, side='right') - 1
+    seg = np.clip(seg, first, np.maximum(last - 1, first))
+    if len(segments):
+        seg_length = np.where(last > first, segments[np.minimum(seg, len(segments) - 1)], 0.0)
+    else:
+        seg_length = np.zeros_like(target)
+    t = np.divide(target - cumulative[seg], seg_length, out=np.zeros_like(target), where=seg_length > 0)
+    start = points[seg]
+    end = points[np.minimum(seg + 1, last)]
+    xy = start + (end - start) * t[:, None]
+    xy[no_shape] = np.nan
+    return xy
+
+
+def load_charging_stations(add_file, network=None):
+    """
+    Read <chargingStation> elements from an additional file
+
+    Parameters:
+    -----------
+    add_file : str
+        Path to e.g. Test1.add.xml
+    network : NetworkArrays, optional
+        When given, each station also gets its lane/edge row and the x/y of
+        the middle of its stopping place
+
+    Returns:
+    --------
+    list of dict
+        Keys: id, name, lane, start_pos, end_pos, power, efficiency and,
+        with a network, lane_row, edge_row, x, y
+    """
+    stations = []
+    for _, elem in ET.iterparse(add_file, events=('end',)):
+        if elem.tag != 'chargingStation':
+            continue
+        stations.append({
+            'id': elem.get('id'),
+            'name': elem.get('name', elem.get('id')),
+            'lane': elem.get('lane'),
+            'start_pos': float(elem.get('startPos', 0)),
+            'end_pos': float(elem.get('endPos', 0)),
+            'power': float(elem.get('power', 22000)),
+            'efficiency': float(elem.get('efficiency', 0.95))
+        })
+
+    if network is not None and stations:
+        lane_index = {lane_id: i for i, lane_id in enumerate(network.lane_ids)}
+        stations = [station for station in stations if station['lane'] in lane_index]
+        rows = np.array([lane_index[station['lane']] for station in stations], dtype=np.int64)
+        # Negative positions count back from the lane end, as in SUMO
+        lengths = network.lane_length[rows]
+        starts = np.array([station['start_pos'] for station in stations])
+        ends = np.array([station['end_pos'] for station in stations])
+        starts = np.where(starts < 0, lengths + starts, starts)
+        ends = np.where(ends < 0, lengths + ends, ends)
+        xy = lane_positions_xy(network, rows, np.clip((starts + ends) / 2, 0, lengths))
+        for station, row, (x, y) in zip(stations, rows.tolist(), xy.tolist()):
+            station['lane_row'] = row
+            station['edge_row'] = int(network.lane_edge[row])
+            station['x'] = x
+            station['y'] = y
+
+    return stations
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cached_file_hash(net_file, cache_dir):
+    """
+    Content hash of net_file, remembered per (path, size, mtime)
+
+    Hashing a few hundred MB takes about a second, so an unchanged file is
+    looked up in a small JSON index instead of being re-hashed on every load.
+    """
+    index_path = os.path.join(cache_dir, _HASH_INDEX)
+    stat = os.stat(net_file)
+    key = os.path.abspath(net_file)
+    entry = _read_hash_index(index_path).get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['hash']
+
+    digest = file_hash(net_file)
+    # Re-read just before writing to keep entries other processes added meanwhile;
+    # the index is replaced atomically, so readers never see a partial file
+    index = _read_hash_index(index_path)
+    index[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest}
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return digest
+
+
+def _read_hash_index(index_path):
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def snapshot_path(net_file, digest, cache_dir=None):
+    """Path of the snapshot for a network with the given content hash"""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(net_file)), DEFAULT_CACHE_DIR)
+    name = os.path.basename(net_file).replace('.xml', '')
+    return os.path.join(cache_dir, f"{name}-{digest[:16]}.v{SNAPSHOT_VERSION}.npz")
+
+
+def load_network(net_file, cache_dir=None, use_cache=True):
+    """
+    Load a network as NetworkArrays, using a binary snapshot when available
+
+    Parameters:
+    -----------
+    net_file : str
+        Path to the SUMO .net.xml
+    cache_dir : str, optional
+        Snapshot folder (default: .network_cache next to the network file)
+    use_cache : bool
+        Set False to always parse the XML and skip writing a snapshot
+
+    Returns:
+    --------
+    NetworkArrays
+    """
+    if not use_cache:
+        return parse_network(net_file)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(net_file)), DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    digest = _cached_file_hash(net_file, cache_dir)
+    path = snapshot_path(net_file, digest, cache_dir)
+    if os.path.exists(path):
+        try:
+            network = NetworkArrays.load(path)
+            if network is not None and network.source_hash == digest:
+                network.source = net_file
+                return network
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Ignoring unreadable network snapshot {path}: {e}")
+
+    network = parse_network(net_file)
+    network.source_hash = digest
+    network.save(path)
+    return network
+
+
+if __name__ == "__main__":
+    net_file = sys.argv[1] if len(sys.argv) > 1 else "Test1.net.xml"
+    if not os.path.exists(net_file):
+        print(f"Network file not found: {net_file}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    parsed = parse_network(net_file)
+    parse_time = time.perf_counter() - start
+
+    load_network(net_file)
+    start = time.perf_counter()
+    network = load_network(net_file)
+    load_time = time.perf_counter() - start
+
+    print(f"✓ {net_file}: {network.n_junctions} junctions, {network.n_edges} edges, "
+          f"{network.n_lanes} lanes, {len(network.connection_from)} connections")
+    print(f"  XML parse: {parse_time * 1000:.1f} ms  Snapshot load: {load_time * 1000:.1f} ms")
+    print(f"  Snapshot: {snapshot_path(net_file, network.source_hash)}")
@@ -0,0 +1,360 @@
+"""
+Charging Station Placement Optimizer
+Scores charger layouts on the network without running SUMO and searches
+for a better one with greedy construction plus swap local search.
+
+Demand comes from the route file: each route's trips (vehicles and flows)
+are weighted by the share of a battery one trip uses (route length / vType
+range), giving the expected charging visits per route. A layout costs
+
+    sum over routes of  visits x min(detour to nearest charger, uncovered cap)
+    + QUEUE_WEIGHT x expected queueing seconds at every charger
+
+where detours come from the network's all-pairs shortest distances and the
+queueing term uses each charger's assigned visits, session time and slots.
+Per-candidate score changes are computed for all candidates at once from
+the routes' best/second-best detours, so thousands of layouts are screened
+per second. The result is written as an additional file for confirmation
+runs.
+
+Usage:
+    python placement_optimizer.py [k] [net_file] [route_file] [add_file]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import xml.etree.ElementTree as ET
+from network_analyzer import load_network_graph
+from network_loader import load_charging_stations
+
+DEFAULT_RANGE_KM = {'easyBike': 70, 'eRickshaw': 90, 'eVan': 150}
+FALLBACK_RANGE_KM = 100
+MAX_DETOUR = 500.0  # metres; routes further than this from any charger are uncovered
+UNCOVERED_DETOUR = 2 * MAX_DETOUR
+STATION_LENGTH = 20.0
+STATION_POWER = 50000
+STATION_EFFICIENCY = 0.92
+STATION_SLOTS = 2
+SESSION_TIME = 300.0  # seconds per charging visit
+MAX_WAIT = 3600.0
+QUEUE_WEIGHT = 1.0  # metres of detour per second of queueing
+SCREEN_TOP = 5  # candidates per move that get the exact (queue-aware) score
+
+
+def route_demand(route_file, graph, range_km=None):
+    """
+    Expected charging visits per route from vehicles and flows
+
+    Returns:
+    --------
+    (route_ids, routes, visits, horizon) : (list, list, ndarray, float)
+        routes as edge ID lists, visits per route over the demand horizon (s)
+    """
+    range_km = dict(DEFAULT_RANGE_KM, **(range_km or {}))
+    root = ET.parse(route_file).getroot()
+    routes = {route.get('id'): route.get('edges', '').split()
+              for route in root.iter('route') if route.get('id')}
+    route_ids = list(routes)
+    route_row = {route_id: i for i, route_id in enumerate(route_ids)}
+    lengths = np.nan_to_num(graph.route_lengths([routes[route_id] for route_id in route_ids]))
+
+    visits = np.zeros(len(route_ids))
+    horizon = 0.0
+
+    def add_trips(route_id, vtype, trips):
+        if route_id in route_row:
+            i = route_row[route_id]
+            share = lengths[i] / 1000 / range_km.get(vtype, FALLBACK_RANGE_KM)
+            visits[i] += trips * min(share, 1.0)
+
+    for vehicle in root.iter('vehicle'):
+        add_trips(vehicle.get('route'), vehicle.get('type'), 1.0)
+        horizon = max(horizon, float(vehicle.get('depart', 0)))
+    for flow in root.iter('flow'):
+        begin = float(flow.get('begin', 0))
+        end = float(flow.get('end', 3600))
+        if flow.get('number') is not None:
+            trips = float(flow.get('number'))
+        elif flow.get('vehsPerHour') is not None:
+            trips = float(flow.get('vehsPerHour')) * (end - begin) / 3600
+        elif flow.get('period') is not None:
+            trips = (end - begin) / float(flow.get('period'))
+        else:
+            trips = 0.0
+        add_trips(flow.get('route'), flow.get('type'), trips)
+        horizon = max(horizon, end)
+
+    return route_ids, [routes[route_id] for route_id in route_ids], visits, max(horizon, 1.0)
+
+
+def detour_matrix(graph, routes, candidates):
+    """
+    Extra distance for every route to visit every candidate edge
+
+    Leaving the route at junction k, driving to the candidate edge, along it
+    and back to k costs D[k, from] + length + D[to, k]; the detour is the
+    cheapest k on the route, and 0 when the route uses the edge itself.
+
+    Returns:
+    --------
+    ndarray, shape (n_routes, n_candidates)
+    """
+    D = graph.distance_matrix()
+    cand_from = graph.edge_from[candidates]
+    cand_to = graph.edge_to[candidates]
+    via = D[:, cand_from] + graph.edge_length[candidates][None, :] + D[cand_to, :].T  # (n_nodes, n_cands)
+
+    edges, offsets = graph.route_edge_indices(routes)
+    node_lists = []
+    for i in range(len(routes)):
+        route_edges = edges[offsets[i]:offsets[i + 1]]
+        route_edges = route_edges[route_edges >= 0]
+        if len(route_edges):
+            node_lists.append(np.unique(np.concatenate([graph.edge_from[route_edges], graph.edge_to[route_edges[-1:]]])))
+        else:
+            node_lists.append(np.zeros(0, dtype=np.int64))
+
+    counts = np.array([len(nodes) for nodes in node_lists])
+    detour = np.full((len(routes), len(candidates)), np.inf)
+    has_nodes = counts > 0
+    if has_nodes.any():
+        flat = np.concatenate([nodes for nodes in node_lists if len(nodes)])
+        starts = np.concatenate(([0], np.cumsum(counts[has_nodes])[:-1]))
+        detour[has_nodes] = np.minimum.reduceat(via[flat], starts, axis=0)
+
+    # Candidates on the route itself need no detour
+    candidate_column = {edge: j for j, edge in enumerate(candidates.tolist())}
+    for i in range(len(routes)):
+        for edge in edges[offsets[i]:offsets[i + 1]].tolist():
+            j = candidate_column.get(edge)
+            if j is not None:
+                detour[i, j] = 0.0
+    return detour
+
+
+class PlacementProblem:
+    """
+    Precomputed scoring data for one network and demand
+
+    Parameters:
+    -----------
+    graph : NetworkGraph
+    route_file : str
+        Route file providing routes, vehicles and flows
+    range_km : dict, optional
+        Override vType ranges (km)
+    """
+
+    def __init__(self, graph, route_file, range_km=None):
+        self.graph = graph
+        self.route_ids, self.routes, self.visits, self.horizon = route_demand(route_file, graph, range_km)
+        self.candidates = np.flatnonzero(graph.edge_length >= STATION_LENGTH)
+        self.detour = np.minimum(detour_matrix(graph, self.routes, self.candidates), UNCOVERED_DETOUR)
+        self.evaluations = 0
+
+    def _assignment(self, layout):
+        """
+        Share of every route's visits per station and each route's best detour
+
+        Visits are split evenly between stations tied for the shortest detour
+        (e.g. several chargers on the route itself). With no stations every
+        route is uncovered.
+        """
+        layout = np.asarray(layout, dtype=np.int64)
+        if len(layout) == 0:
+            return np.zeros((len(self.routes), 0)), np.full(len(self.routes), UNCOVERED_DETOUR)
+        sub = self.detour[:, layout]
+        best = sub.min(axis=1)
+        tied = sub <= best[:, None] + 1e-6
+        return tied / tied.sum(axis=1, keepdims=True), best
+
+    def queue_seconds(self, share):
+        """Expected total queueing time given each route's share of visits per station"""
+        load = self.visits @ share
+        rho = load / self.horizon * SESSION_TIME / STATION_SLOTS
+        wait = np.where(rho < 1, SESSION_TIME * rho / (STATION_SLOTS * np.maximum(1 - rho, 1e-9)), MAX_WAIT)
+        return float((load * np.minimum(wait, MAX_WAIT)).sum())
+
+    def score(self, layout):
+        """Exact layout cost (lower is better); layout is a list of candidate columns"""
+        self.evaluations += 1
+        layout = np.asarray(layout)
+        if len(layout) == 0:
+            return float((self.visits * UNCOVERED_DETOUR).sum())
+        share, best = self._assignment(layout)
+        return float((self.visits * best).sum()) + QUEUE_WEIGHT * self.queue_seconds(share)
+
+    def report(self, layout):
+        """Coverage, mean detour and queueing of a layout"""
+        share, best = self._assignment(layout)
+        total = self.visits.sum()
+        covered = self.visits[best <= MAX_DETOUR].sum()
+        return {
+            'stations': len(layout),
+            'score': self.score(layout),
+            'coverage_percent': covered / total * 100 if total > 0 else 0.0,
+            'mean_detour_m': float((self.visits * best).sum() / total) if total > 0 else 0.0,
+            'queue_seconds': self.queue_seconds(share)
+        }
+
+    def columns_for_edges(self, edge_indices):
+        """Candidate columns of the given edge indices (edges that are not candidates are skipped)"""
+        column = {edge: j for j, edge in enumerate(self.candidates.tolist())}
+        return [column[edge] for edge in edge_indices if edge in column]
+
+
+def _screen(cost):
+    """Columns with the SCREEN_TOP lowest costs, keeping every tie at the cut-off"""
+    finite = np.isfinite(cost)
+    if finite.sum() <= SCREEN_TOP:
+        return np.flatnonzero(finite)
+    cutoff = np.partition(cost[finite], SCREEN_TOP - 1)[SCREEN_TOP - 1]
+    return np.flatnonzero(cost <= cutoff + 1e-9)
+
+
+def _best_two(detour, layout):
+    """Best and second-best detour per route plus the column achieving the best"""
+    sub = detour[:, layout]
+    order = np.argsort(sub, axis=1)
+    rows = np.arange(len(sub))
+    best = sub[rows, order[:, 0]]
+    second = sub[rows, order[:, 1]] if len(layout) > 1 else np.full(len(sub), UNCOVERED_DETOUR)
+    return best, second, np.asarray(layout)[order[:, 0]]
+
+
+def greedy_layout(problem, k):
+    """Add the candidate with the largest detour reduction, k times"""
+    layout = []
+    best = np.full(len(problem.routes), UNCOVERED_DETOUR)
+    for _ in range(k):
+        # Detour reduction of every candidate at once
+        gain = (problem.visits[:, None] * np.maximum(best[:, None] - problem.detour, 0)).sum(axis=0)
+        gain[layout] = -np.inf
+        choice = min(_screen(-gain), key=lambda c: problem.score(layout + [int(c)]))
+        layout.append(int(choice))
+        best = np.minimum(best, problem.detour[:, choice])
+    return layout
+
+
+def swap_search(problem, layout, max_rounds=50):
+    """
+    Swap local search: replace one station by one candidate while the cost drops
+
+    For each station the cost of every replacement is computed in one array
+    operation from the routes' best and second-best detours; only the
+    SCREEN_TOP most promising swaps (plus ties) get the exact queue-aware
+    score, and the best improving one is applied.
+
+    Returns:
+    --------
+    (layout, screened) : (list, int)
+        Improved layout and the number of layouts screened
+    """
+    layout = list(layout)
+    current = problem.score(layout)
+    screened = 0
+
+    for _ in range(max_rounds):
+        improved = False
+        best, second, nearest = _best_two(problem.detour, layout)
+        for position, station in enumerate(layout):
+            without = np.where(nearest == station, second, best)
+            cost = (problem.visits[:, None] * np.minimum(without[:, None], problem.detour)).sum(axis=0)
+            cost[layout] = np.inf
+            screened += len(cost)
+
+            best_trial, best_score = None, current - 1e-9
+            for candidate in _screen(cost):
+                trial = layout.copy()
+                trial[position] = int(candidate)
+                trial_score = problem.score(trial)
+                if trial_score < best_score:
+                    best_trial, best_score = trial, trial_score
+            if best_trial is not None:
+                layout, current, improved = best_trial, best_score, True
+                break
+        if not improved:
+            break
+
+    return layout, screened
+
+
+def write_additional_file(graph, edge_indices, output_file, prefix='opt_charger'):
+    """Write one charging station per edge in the style of Test1.add.xml"""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<additional xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ',
+        '            xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/additional_file.xsd">',
+        '',
+        '    <!-- OPTIMIZED CHARGING STATION LAYOUT (placement_optimizer.py) -->',
+        ''
+    ]
+    for edge in edge_indices:
+        edge_id = graph.edge_ids[edge]
+        length = graph.edge_length[edge]
+        start = max((length - STATION_LENGTH) / 2, 0)
+        junction = graph.node_ids[graph.edge_to[edge]]
+        lines.append(f'    <!-- Station on {edge_id} (towards {junction}) -->')
+        lines.append(f'    <chargingStation id="{prefix}_{edge_id}" lane="{edge_id}_0" '
+                     f'startPos="{start:.0f}" endPos="{start + STATION_LENGTH:.0f}" ')
+        lines.append(f'                     power="{STATION_POWER}" efficiency="{STATION_EFFICIENCY:.2f}" ')
+        lines.append(f'                     friendlyPos="true" name="{prefix}_{edge_id}"/>')
+        lines.append('')
+    lines.append('</additional>')
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def print_layout(problem, title, layout):
+    report = problem.report(layout)
+    edges = [problem.graph.edge_ids[problem.candidates[c]] for c in layout] or ['-']
+    print(f"\n{title}")
+    print("-" * 60)
+    print(f"  Stations: {report['stations']}  Score: {report['score']:.0f}")
+    print(f"  Coverage: {report['coverage_percent']:.1f}%  Mean detour: {report['mean_detour_m']:.0f}m  "
+          f"Queueing: {report['queue_seconds']:.0f}s")
+    print(f"  Edges: {', '.join(sorted(edges))}")
+
+
+if __name__ == "__main__":
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    if k is not None and k < 1:
+        print(f"✗ Number of stations must be at least 1 (got {k})")
+        sys.exit(1)
+    net_file = sys.argv[2] if len(sys.argv) > 2 else "Test1.net.xml"
+    route_file = sys.argv[3] if len(sys.argv) > 3 else "Test1.rou.xml"
+    add_file = sys.argv[4] if len(sys.argv) > 4 else "Test1.add.xml"
+
+    graph = load_network_graph(net_file)
+    problem = PlacementProblem(graph, route_file)
+    print(f"✓ {len(problem.candidates)} candidate edges, {len(problem.routes)} routes, "
+          f"{problem.visits.sum():.1f} expected charging visits")
+
+    existing = []
+    if os.path.exists(add_file):
+        stations = load_charging_stations(add_file)
+        lane_edge = {lane: lane.rsplit('_', 1)[0] for lane in (s['lane'] for s in stations)}
+        edge_rows = sorted({graph.edge_index[edge] for edge in lane_edge.values() if edge in graph.edge_index})
+        existing = problem.columns_for_edges(edge_rows)
+        print_layout(problem, f"CURRENT LAYOUT ({add_file})", existing)
+    if k is None:
+        k = len(existing) or 5
+    if len(problem.candidates) == 0:
+        print("✗ No candidate edges long enough for a station")
+        sys.exit(1)
+    k = min(k, len(problem.candidates))
+
+    start = time.perf_counter()
+    layout = greedy_layout(problem, k)
+    layout, screened = swap_search(problem, layout)
+    elapsed = time.perf_counter() - start
+
+    print_layout(problem, f"OPTIMIZED LAYOUT (k={k})", layout)
+    print(f"\n✓ Screened {screened} swap layouts and scored {problem.evaluations} exactly "
+          f"in {elapsed:.2f}s ({screened / max(elapsed, 1e-9):.0f} layouts/s)")
+
+    output_file = os.path.splitext(os.path.splitext(route_file)[0])[0] + '.optimized.add.xml'
+    write_additional_file(graph, problem.candidates[layout].tolist(), output_file)
+    print(f"✓ Additional file written: {output_file}")
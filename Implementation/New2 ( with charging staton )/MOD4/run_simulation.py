@@ -9,6 +9,10 @@ import os
 import sys
 import pandas as pd
 from datetime import datetime
+from charging_sessions import ChargingSessionizer, summarize_stations
+from charging_queue import ChargingQueueTracker, stations_from_config
+from checkpoint import (CHECKPOINT_DIR, WARM_START_OBJECTS, Checkpointer, latest_checkpoint, restore_exporter,
+                        snapshot_for_state)
 
 # Check if required packages are installed
 try:
@@ -34,7 +38,8 @@ class Test1SUMOExporter:
     Designed for Test1.sumocfg with Bangladesh EV network
     """
     
-    def __init__(self, sumocfg='Test1.sumocfg', output_folder='simulation_outputs'):
+    def __init__(self, sumocfg='Test1.sumocfg', output_folder='simulation_outputs', keep_charging_series=False,
+                 controllers=None):
         """
         Initialize the exporter
         
@@ -44,6 +49,14 @@ class Test1SUMOExporter:
             Path to SUMO configuration file
         output_folder : str
             Folder where outputs will be saved
+        keep_charging_series : bool
+            Also export every per-step charging sample (charging_events),
+            not just the charging sessions
+        controllers : list, optional
+            Plugins with on_collect(simulation_time, vehicle_states) that act
+            on the collected battery states (e.g. soc_controller.SoCRerouter);
+            a plugin with claims_charging(station_id, vehicle_type) takes
+            those stops out of the charging sessions (e.g. battery swaps)
         """
         self.sumocfg = sumocfg
         self.output_folder = output_folder
@@ -57,7 +70,9 @@ class Test1SUMOExporter:
         self.battery_data = []
         self.realtime_data = []
         self.trip_data = {}
-        self.charging_events = []
+        self.charging_sessions = ChargingSessionizer(keep_series=keep_charging_series)
+        self.charging_queues = None
+        self.controllers = list(controllers or [])
         
         # Statistics
         self.stats = {
@@ -73,9 +88,16 @@ class Test1SUMOExporter:
             print(f"✗ ERROR: Configuration file not found: {sumocfg}")
             sys.exit(1)
         
+        # Per-station queue tracking needs the stations from the additional files
+        try:
+            self.charging_queues = ChargingQueueTracker(stations_from_config(sumocfg))
+        except Exception as e:
+            print(f"⚠ Charging queue tracking disabled: {e}")
+        
         print(f"✓ Initialized exporter for: {sumocfg}")
     
-    def run_simulation(self, gui=False, step_length=1.0):
+    def run_simulation(self, gui=False, step_length=1.0, checkpoint_every=None, checkpoint_dir=CHECKPOINT_DIR,
+                       resume=False, warm_start=None, keep_checkpoints=False):
         """
         Run SUMO simulation and collect data
         
@@ -85,6 +107,20 @@ class Test1SUMOExporter:
             Use SUMO-GUI (True) or command-line SUMO (False)
         step_length : float
             Data collection interval (seconds)
+        checkpoint_every : float, optional
+            Write a checkpoint (SUMO state + exporter snapshot) every this
+            many simulated seconds
+        checkpoint_dir : str
+            Folder for checkpoints (one subfolder per run)
+        resume : bool
+            Continue from the latest checkpoint of a run of this sumocfg
+        warm_start : str, optional
+            SUMO state file to start from (e.g. a shared warmed-up
+            checkpoint); the records, trip data and stats of its exporter
+            snapshot are restored too if present
+        keep_checkpoints : bool
+            Keep this run's checkpoints after it completes (e.g. for a
+            warm-up run other runs start from)
         """
         print("\n" + "="*70)
         print("STARTING SUMO SIMULATION")
@@ -120,6 +156,35 @@ class Test1SUMOExporter:
             simulation_time = 0
             data_collection_interval = step_length
             next_collection_time = 0
+            checkpointer = Checkpointer(self, checkpoint_dir, checkpoint_every) if checkpoint_every else None
+            
+            # Start from a checkpoint or a shared warm-up state
+            start_state, snapshot_file = None, None
+            if resume:
+                checkpoint = latest_checkpoint(checkpoint_dir, self.sumocfg)
+                if checkpoint:
+                    _, start_state, snapshot_file = checkpoint
+                else:
+                    print(f"⚠ No checkpoint of {self.sumocfg} in {checkpoint_dir}, starting from t=0")
+            elif warm_start:
+                start_state, snapshot_file = warm_start, snapshot_for_state(warm_start)
+            if start_state:
+                traci.simulation.loadState(start_state)
+                simulation_time = traci.simulation.getTime()
+                next_collection_time = simulation_time
+                if snapshot_file:
+                    # A resumed run gets all of its state back; a warm-started
+                    # variant keeps its own trackers and controllers
+                    if resume:
+                        _, next_collection_time = restore_exporter(self, snapshot_file, sumocfg=self.sumocfg)
+                    else:
+                        _, next_collection_time = restore_exporter(self, snapshot_file, WARM_START_OBJECTS)
+                    if checkpointer:
+                        checkpointer.continue_from(simulation_time, snapshot_file, same_run=resume)
+                print(f"✓ Loaded state {start_state} (t={simulation_time:g}s)\n")
+            
+            # A vehicle missing from more than one collection has stopped charging
+            self.charging_sessions.max_gap = 2 * data_collection_interval
             
             # Simulation loop
             while traci.simulation.getMinExpectedNumber() > 0:
@@ -127,11 +192,19 @@ class Test1SUMOExporter:
                 traci.simulationStep()
                 simulation_time = traci.simulation.getTime()
                 
+                for veh_id in traci.simulation.getArrivedIDList():
+                    self.charging_sessions.vehicle_left(veh_id)
+                    if self.charging_queues:
+                        self.charging_queues.vehicle_left(veh_id, simulation_time)
+                
                 # Collect data at specified intervals
                 if simulation_time >= next_collection_time:
                     self._collect_data(simulation_time)
                     next_collection_time += data_collection_interval
                 
+                if checkpointer:
+                    checkpointer.maybe_save(simulation_time, next_collection_time)
+                
                 # Progress indicator every 10 seconds
                 if int(simulation_time) % 10 == 0 and simulation_time > 0:
                     active_vehicles = len(traci.vehicle.getIDList())
@@ -142,9 +215,18 @@ class Test1SUMOExporter:
             print(f"Total simulation time: {simulation_time} seconds")
             print(f"Data records collected: {len(self.battery_data)}")
             
+            self.charging_sessions.finish()
+            if self.charging_queues:
+                self.charging_queues.finish(simulation_time)
+            print(f"Charging sessions: {len(self.charging_sessions.closed_sessions)} "
+                  f"({self.charging_sessions.sample_count} charging samples)")
+            
             # Close TraCI
             traci.close()
             
+            if checkpointer and not keep_checkpoints:
+                checkpointer.remove()
+            
             return True
             
         except Exception as e:
@@ -156,10 +238,21 @@ class Test1SUMOExporter:
                 pass
             return False
     
+    def _next_stopping_place(self, veh_id):
+        """ID of the vehicle's next stopping place ('' if none, None if TraCI cannot tell)"""
+        try:
+            stops = traci.vehicle.getStops(veh_id, 1)
+        except traci.exceptions.TraCIException:
+            return None
+        return stops[0].stoppingPlaceID if stops else ''
+    
     def _collect_data(self, simulation_time):
         """Collect data from all vehicles at current timestep"""
         
         vehicle_ids = traci.vehicle.getIDList()
+        if self.charging_queues:
+            self.charging_queues.advance(simulation_time)
+        vehicle_states = []
         
         for veh_id in vehicle_ids:
             try:
@@ -169,6 +262,8 @@ class Test1SUMOExporter:
                 lane_id = traci.vehicle.getLaneID(veh_id)
                 distance = traci.vehicle.getDistance(veh_id)
                 waiting_time = traci.vehicle.getWaitingTime(veh_id)
+                acceleration = traci.vehicle.getAcceleration(veh_id)
+                slope = traci.vehicle.getSlope(veh_id)
                 
                 # Vehicle type
                 vtype = traci.vehicle.getTypeID(veh_id)
@@ -191,19 +286,28 @@ class Test1SUMOExporter:
                     charging_station_id = traci.vehicle.getParameter(veh_id, "device.battery.chargingStationId")
                     if charging_station_id and charging_station_id != "NULL":
                         charging_station = charging_station_id
-                        
-                        # Record charging event
-                        self.charging_events.append({
-                            'timestep': simulation_time,
-                            'vehicle_id': veh_id,
-                            'vehicle_type': vtype,
-                            'charging_station': charging_station,
-                            'battery_soc_percent': (battery_capacity / max_battery * 100) if max_battery > 0 else 0
-                        })
+                    
+                    # Extend or close this vehicle's charging session
+                    session_station = charging_station
+                    if session_station != "NULL" and any(
+                            controller.claims_charging(session_station, vtype) for controller in self.controllers
+                            if hasattr(controller, 'claims_charging')):
+                        session_station = None  # handled by a controller, not charging
+                    self.charging_sessions.update(simulation_time, veh_id, vtype, session_station,
+                                                  battery_capacity, max_battery)
                 
                 except:
                     pass  # Battery device not available for this vehicle
                 
+                # Queue state (lane position is only needed on station lanes)
+                if self.charging_queues:
+                    lane_pos = traci.vehicle.getLanePosition(veh_id) if self.charging_queues.is_station_lane(lane_id) else 0
+                    next_stop = None
+                    if self.charging_queues.needs_next_stop(lane_id, lane_pos, speed):
+                        next_stop = self._next_stopping_place(veh_id)
+                    self.charging_queues.observe(simulation_time, veh_id, lane_id, lane_pos, speed, charging_station,
+                                                 next_stop)
+                
                 # Battery data record
                 if max_battery > 0:  # Only if battery device is active
                     battery_record = {
@@ -219,6 +323,8 @@ class Test1SUMOExporter:
                         'chargingStationId': charging_station,
                         'speed_ms': speed,
                         'speed_kmh': speed * 3.6,
+                        'acceleration_ms2': acceleration,
+                        'slope_deg': slope,
                         'x_position_m': position[0],
                         'y_position_m': position[1],
                         'lane': lane_id,
@@ -226,6 +332,15 @@ class Test1SUMOExporter:
                         'waiting_time_sec': waiting_time
                     }
                     self.battery_data.append(battery_record)
+                    vehicle_states.append({
+                        'vehicle_id': veh_id,
+                        'vehicle_type': vtype,
+                        'lane': lane_id,
+                        'soc_percent': battery_record['battery_soc_percent'],
+                        'battery_Wh': battery_capacity,
+                        'max_battery_Wh': max_battery,
+                        'charging_station': charging_station
+                    })
                 
                 # Real-time data (all vehicles)
                 realtime_record = {
@@ -267,6 +382,10 @@ class Test1SUMOExporter:
             except Exception as e:
                 print(f"Warning: Error collecting data for {veh_id}: {e}")
                 continue
+        
+        # Let controllers act on this step's battery states
+        for controller in self.controllers:
+            controller.on_collect(simulation_time, vehicle_states)
     
     def export_to_csv(self):
         """Export all data to CSV files"""
@@ -306,15 +425,38 @@ class Test1SUMOExporter:
         else:
             print("⚠ No trip data collected")
         
-        # 4. Charging Events CSV
-        if self.charging_events:
-            df_charging = pd.DataFrame(self.charging_events)
+        # 4. Charging Sessions CSV
+        df_sessions = self.charging_sessions.sessions()
+        if not df_sessions.empty:
+            sessions_file = os.path.join(self.output_folder, f'charging_sessions_{timestamp}.csv')
+            df_sessions.to_csv(sessions_file, index=False)
+            print(f"✓ Charging sessions exported: {sessions_file}")
+            print(f"  Sessions: {len(df_sessions)}")
+        else:
+            print("⚠ No charging sessions recorded")
+        
+        # 5. Per-step Charging Events CSV (only when requested)
+        if self.charging_sessions.series:
+            df_charging = self.charging_sessions.series_dataframe()
             charging_file = os.path.join(self.output_folder, f'charging_events_{timestamp}.csv')
             df_charging.to_csv(charging_file, index=False)
             print(f"✓ Charging events exported: {charging_file}")
             print(f"  Events: {len(df_charging)}")
-        else:
-            print("⚠ No charging events recorded")
+        
+        # 6. Charging Queue Wait Times and Station KPIs
+        if self.charging_queues:
+            df_waits = self.charging_queues.wait_times()
+            waits_file = os.path.join(self.output_folder, f'charging_waits_{timestamp}.csv')
+            df_waits.to_csv(waits_file, index=False)
+            queue_file = os.path.join(self.output_folder, f'charging_queues_{timestamp}.csv')
+            self.charging_queues.station_summary().to_csv(queue_file, index=False)
+            print(f"✓ Charging queue KPIs exported: {queue_file}")
+            print(f"  Queue visits: {len(df_waits)}")
+        
+        # 7. Controller outputs (e.g. SoC reroutes)
+        for controller in self.controllers:
+            if hasattr(controller, 'export'):
+                controller.export(self.output_folder, timestamp)
         
         print("="*70)
     
@@ -392,21 +534,29 @@ class Test1SUMOExporter:
                     type_stats.to_excel(writer, sheet_name='Vehicle_Type_Stats', index=False)
                     print(f"✓ Vehicle Type Statistics sheet: {len(type_stats)} types")
                 
-                # Sheet 5: Charging Events
-                if self.charging_events:
-                    df_charging = pd.DataFrame(self.charging_events)
-                    df_charging.to_excel(writer, sheet_name='Charging_Events', index=False)
-                    print(f"✓ Charging Events sheet: {len(df_charging)} events")
+                # Sheet 5: Charging Sessions
+                df_sessions = self.charging_sessions.sessions()
+                if not df_sessions.empty:
+                    df_sessions.to_excel(writer, sheet_name='Charging_Sessions', index=False)
+                    print(f"✓ Charging Sessions sheet: {len(df_sessions)} sessions")
                     
                     # Charging summary by station
-                    charging_summary = df_charging.groupby('charging_station').agg({
-                        'vehicle_id': 'count',
-                        'battery_soc_percent': 'mean'
-                    }).reset_index()
-                    charging_summary.columns = ['Charging_Station', 'Total_Visits', 'Avg_SoC_at_Charge']
+                    charging_summary = summarize_stations(df_sessions)
                     charging_summary.to_excel(writer, sheet_name='Charging_Summary', index=False)
                     print(f"✓ Charging Summary sheet: {len(charging_summary)} stations")
                 
+                if self.charging_sessions.series:
+                    df_charging = self.charging_sessions.series_dataframe()
+                    df_charging.to_excel(writer, sheet_name='Charging_Events', index=False)
+                    print(f"✓ Charging Events sheet: {len(df_charging)} events")
+                
+                if self.charging_queues:
+                    queue_summary = self.charging_queues.station_summary()
+                    queue_summary.to_excel(writer, sheet_name='Charging_Queues', index=False)
+                    self.charging_queues.wait_distribution().to_excel(
+                        writer, sheet_name='Charging_Wait_Distribution', index=False)
+                    print(f"✓ Charging Queues sheet: {len(queue_summary)} stations")
+                
                 # Sheet 6: Overall Statistics
                 stats_data = []
                 
@@ -463,6 +613,10 @@ def main():
     OUTPUT_FOLDER = 'simulation_outputs'
     USE_GUI = False  # Set to True to see visualization
     DATA_INTERVAL = 1.0  # Collect data every 1 second
+    SOC_REROUTING = False  # Send vehicles below 20% SoC to the nearest charger
+    BATTERY_SWAPPING = False  # Model ebike_swap_* stations as pack swaps, not chargers
+    CHECKPOINT_EVERY = None  # e.g. 60 to checkpoint every 60 simulated seconds
+    RESUME = '--resume' in sys.argv  # Continue from the latest checkpoint
     
     # Check if SUMO config exists
     if not os.path.exists(SUMOCFG):
@@ -470,14 +624,24 @@ def main():
         print("Make sure you're running this script in the correct directory.")
         return
     
+    controllers = []
+    if SOC_REROUTING:
+        from soc_controller import SoCRerouter
+        controllers.append(SoCRerouter('Test1.net.xml', 'Test1.add.xml'))
+    if BATTERY_SWAPPING:
+        from battery_swap import BatterySwapModel
+        controllers.append(BatterySwapModel('Test1.add.xml'))
+    
     # Create exporter
     exporter = Test1SUMOExporter(
         sumocfg=SUMOCFG,
-        output_folder=OUTPUT_FOLDER
+        output_folder=OUTPUT_FOLDER,
+        controllers=controllers
     )
     
     # Run simulation
-    success = exporter.run_simulation(gui=USE_GUI, step_length=DATA_INTERVAL)
+    success = exporter.run_simulation(gui=USE_GUI, step_length=DATA_INTERVAL,
+                                      checkpoint_every=CHECKPOINT_EVERY, resume=RESUME)
     
     if not success:
         print("\n✗ Simulation failed!")
@@ -0,0 +1,243 @@
+"""
+SoC-Aware Charging Rerouter (TraCI controller plugin)
+Sends vehicles whose state of charge drops below a threshold to a charging
+station. The few nearest stations and the network distances to them are
+precomputed for every edge (one reverse Dijkstra per station), so each
+decision during the run is a table lookup; TraCI is only called for vehicles
+that actually get rerouted. If no route to the nearest station (or from it
+to the destination) exists, the next nearest within range is tried. A
+vehicle whose remaining energy does not cover the distance to the nearest
+station is not rerouted but logged once as stranded.
+
+The controller consumes the SoC the exporter already collects, through the
+controller hook of Test1SUMOExporter:
+
+    exporter = Test1SUMOExporter(controllers=[SoCRerouter('Test1.net.xml', 'Test1.add.xml')])
+
+Usage:
+    python soc_controller.py [net_file] [add_file]      # print the lookup table
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from network_loader import load_network, load_charging_stations
+from network_analyzer import load_network_graph
+
+try:
+    import traci
+except ImportError:
+    traci = None
+
+SOC_THRESHOLD = 20.0  # percent
+SOC_RESUME = 80.0  # percent; vehicles above this can be rerouted again later
+CHARGE_DURATION = 300.0  # seconds at the station
+CONSUMPTION_WH_PER_M = 0.1  # for the reachability check (override per vType)
+CANDIDATE_STATIONS = 3  # nearest stations kept per edge
+
+
+def nearest_charger_table(graph, stations, k=CANDIDATE_STATIONS):
+    """
+    The k nearest stations from the end of every edge, nearest first
+
+    Parameters:
+    -----------
+    graph : NetworkGraph
+    stations : list of dict
+        Output of load_charging_stations(add_file, network) (needs edge_row)
+    k : int
+        Stations kept per edge
+
+    Returns:
+    --------
+    (station_row, distance) : (ndarray of int, ndarray of float)
+        Shape (n_edges, k): index into stations (-1 where fewer are
+        reachable) and distance (m) from the end of the edge to the middle
+        of that station's stop
+    """
+    if not stations:
+        return np.full((graph.n_edges, k), -1), np.full((graph.n_edges, k), np.inf)
+
+    to_station = np.empty((len(stations), graph.n_edges))
+    for i, station in enumerate(stations):
+        edge = station['edge_row']
+        stop_pos = (station['start_pos'] + station['end_pos']) / 2
+        # Distance from every junction to the start of the station's edge
+        dist, _ = graph.dijkstra(int(graph.edge_from[edge]), reverse=True)
+        to_station[i] = dist[graph.edge_to] + stop_pos
+        # Already on the station's edge: at most the stop position away
+        to_station[i, edge] = min(to_station[i, edge], stop_pos)
+
+    kept = min(k, len(stations))
+    station_row = np.argsort(to_station, axis=0, kind='stable')[:kept].T
+    distance = np.take_along_axis(to_station.T, station_row, axis=1)
+    if kept < k:
+        station_row = np.pad(station_row, ((0, 0), (0, k - kept)), constant_values=-1)
+        distance = np.pad(distance, ((0, 0), (0, k - kept)), constant_values=np.inf)
+    station_row[~np.isfinite(distance)] = -1
+    return station_row, distance
+
+
+class SoCRerouter:
+    """
+    Exporter controller that reroutes low-SoC vehicles to a charger
+
+    Parameters:
+    -----------
+    net_file, add_file : str
+        Network and charging stations
+    threshold : float
+        SoC (percent) below which a vehicle is sent to charge
+    duration : float
+        Charging stop duration (s)
+    consumption_wh_per_m : dict or float
+        Energy use per metre (per vType) for the reachability check
+    """
+
+    def __init__(self, net_file='Test1.net.xml', add_file='Test1.add.xml', threshold=SOC_THRESHOLD,
+                 duration=CHARGE_DURATION, consumption_wh_per_m=CONSUMPTION_WH_PER_M):
+        self.graph = load_network_graph(net_file)
+        self.stations = load_charging_stations(add_file, load_network(net_file))
+        self.station_row, self.station_distance = nearest_charger_table(self.graph, self.stations)
+        self.threshold = threshold
+        self.duration = duration
+        self.consumption = consumption_wh_per_m
+        self.rerouted = set()
+        self.stranded = set()
+        self.failed_edge = {}
+        self.decisions = []
+
+    def lookup(self, edge_id):
+        """Nearest station dict and distance (m) from an edge, or (None, inf)"""
+        candidates = self.candidates(edge_id)
+        return candidates[0] if candidates else (None, np.inf)
+
+    def candidates(self, edge_id):
+        """Reachable (station dict, distance) pairs from an edge, nearest first"""
+        edge = self.graph.edge_index.get(edge_id)
+        if edge is None:
+            return []
+        return [(self.stations[row], float(dist))
+                for row, dist in zip(self.station_row[edge], self.station_distance[edge]) if row >= 0]
+
+    def _consumption(self, vtype):
+        if isinstance(self.consumption, dict):
+            return self.consumption.get(vtype, CONSUMPTION_WH_PER_M)
+        return self.consumption
+
+    def on_collect(self, simulation_time, vehicle_states):
+        """
+        Controller hook called by the exporter after each data collection
+
+        Parameters:
+        -----------
+        vehicle_states : list of dict
+            Keys: vehicle_id, vehicle_type, lane, soc_percent, battery_Wh,
+            max_battery_Wh, charging_station
+        """
+        for state in vehicle_states:
+            veh_id = state['vehicle_id']
+            soc = state['soc_percent']
+            if veh_id in self.rerouted or veh_id in self.stranded:
+                if soc >= SOC_RESUME:
+                    self.rerouted.discard(veh_id)
+                    self.stranded.discard(veh_id)
+                continue
+            if soc >= self.threshold or state['charging_station'] not in (None, '', 'NULL'):
+                continue
+            lane = state['lane']
+            if not lane or lane.startswith(':'):
+                continue  # decide once the vehicle is on a normal edge
+
+            edge_id = lane.rsplit('_', 1)[0]
+            if self.failed_edge.get(veh_id) == edge_id:
+                continue  # retry from the next edge
+            candidates = self.candidates(edge_id)
+            if not candidates:
+                continue
+
+            # Candidates are sorted by distance: if the nearest one is out
+            # of range, so is every other one
+            in_range = [(station, distance) for station, distance in candidates
+                        if distance * self._consumption(state['vehicle_type']) <= state['battery_Wh']]
+            if not in_range:
+                station, distance = candidates[0]
+                self.stranded.add(veh_id)
+                action = 'stranded'
+            else:
+                # Fall back to the next nearest station when no route via one exists
+                for station, distance in in_range:
+                    if self._send_to_station(veh_id, edge_id, station):
+                        break
+                else:
+                    self.failed_edge[veh_id] = edge_id
+                    continue
+                self.rerouted.add(veh_id)
+                self.failed_edge.pop(veh_id, None)
+                action = 'rerouted'
+            self.decisions.append({
+                'timestep_sec': simulation_time,
+                'vehicle_id': veh_id,
+                'vehicle_type': state['vehicle_type'],
+                'soc_percent': soc,
+                'charging_station': station['id'],
+                'distance_m': distance,
+                'action': action
+            })
+
+    def _send_to_station(self, veh_id, edge_id, station):
+        """Route the vehicle via the station's edge to its original destination and add the stop"""
+        station_edge = self.graph.edge_ids[station['edge_row']]
+        try:
+            route = traci.vehicle.getRoute(veh_id)
+            destination = route[-1]
+            if station_edge == edge_id:
+                new_route = [edge_id]
+            else:
+                new_route = list(traci.simulation.findRoute(edge_id, station_edge).edges)
+            if station_edge != destination:
+                onward = list(traci.simulation.findRoute(station_edge, destination).edges)
+                if not onward or onward[0] != station_edge:
+                    return False  # would drop the destination
+                new_route += onward[1:]
+            if not new_route or new_route[0] != edge_id or new_route[-1] != destination:
+                return False
+
+            traci.vehicle.setRoute(veh_id, new_route)
+            traci.vehicle.setChargingStationStop(veh_id, station['id'], duration=self.duration)
+            return True
+        except traci.exceptions.TraCIException as e:
+            print(f"Warning: Could not reroute {veh_id} to {station['id']}: {e}")
+            return False
+
+    def export(self, output_folder, timestamp):
+        """Write the rerouting decisions next to the other exporter outputs"""
+        if not self.decisions:
+            return
+        output_file = os.path.join(output_folder, f'soc_reroutes_{timestamp}.csv')
+        pd.DataFrame(self.decisions).to_csv(output_file, index=False)
+        print(f"✓ SoC reroutes exported: {output_file}")
+        actions = pd.Series([decision['action'] for decision in self.decisions])
+        print(f"  Reroutes: {int((actions == 'rerouted').sum())}  |  Stranded: {int((actions == 'stranded').sum())}")
+
+
+if __name__ == "__main__":
+    net_file = sys.argv[1] if len(sys.argv) > 1 else "Test1.net.xml"
+    add_file = sys.argv[2] if len(sys.argv) > 2 else "Test1.add.xml"
+
+    graph = load_network_graph(net_file)
+    stations = load_charging_stations(add_file, load_network(net_file))
+    station_row, distance = nearest_charger_table(graph, stations)
+
+    print("\n" + "="*60)
+    print("NEAREST CHARGING STATIONS PER EDGE")
+    print("="*60)
+    print(f"{'Edge':<10} {'Station':<28} {'Distance (m)':>14}")
+    print("-" * 60)
+    for edge_id, rows, dists in zip(graph.edge_ids, station_row, distance):
+        for rank, (row, dist) in enumerate(zip(rows, dists)):
+            if row < 0 and rank > 0:
+                break
+            name = stations[row]['id'] if row >= 0 else '-'
+            print(f"{edge_id if rank == 0 else '':<10} {name:<28} {dist:>14.0f}")
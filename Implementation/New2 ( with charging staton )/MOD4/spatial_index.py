@@ -0,0 +1,333 @@
+"""
+Spatial Index for Trajectory Data
+Maps x/y positions (e.g. x_position_m / y_position_m from the exporter's
+realtime data) to the nearest lane/edge and the nearest charging station in
+batched NumPy queries, so spatial joins over millions of samples do not need
+TraCI calls or per-point scans of every lane.
+
+Usage:
+    python spatial_index.py simulation_outputs/realtime_data_<stamp>.csv
+    python spatial_index.py <csv> Test1.net.xml Test1.add.xml
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from network_loader import load_network, load_charging_stations
+
+# Points and candidates compared per chunk in brute-force distance blocks
+_BLOCK_SIZE = 4_000_000
+
+
+def _point_segment_distance(px, py, ax, ay, bx, by):
+    """Distance from points to segments (broadcasting) and the projection parameter t"""
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    t = np.divide((px - ax) * dx + (py - ay) * dy, length_sq,
+                  out=np.zeros(np.broadcast(px, ax).shape), where=length_sq > 0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy)), t
+
+
+class LaneGrid:
+    """
+    Uniform grid over lane segments for nearest-lane queries
+
+    Every lane polyline segment is registered in each grid cell its bounding
+    box touches. A query looks at the 3x3 block of cells around each point
+    and widens the block only for points whose nearest candidate could still
+    lie outside it, so the answer is always the exact nearest segment.
+
+    Parameters:
+    -----------
+    network : NetworkArrays
+        From network_loader.load_network
+    cell_size : float, optional
+        Grid cell size (m); defaults to a size giving a few segments per cell
+    """
+
+    def __init__(self, network, cell_size=None):
+        self.network = network
+        points = network.lane_shape_xy
+        offsets = network.lane_shape_offsets
+
+        # Segments are consecutive point pairs that belong to the same lane
+        lane_of_point = np.repeat(np.arange(network.n_lanes), np.diff(offsets))
+        valid = np.ones(max(len(points) - 1, 0), dtype=bool)
+        if len(valid):
+            valid &= lane_of_point[:-1] == lane_of_point[1:]
+        seg_start = np.flatnonzero(valid)
+
+        self.seg_a = points[seg_start]
+        self.seg_b = points[seg_start + 1]
+        self.seg_lane = lane_of_point[seg_start].astype(np.int32)
+        seg_length = np.hypot(*(self.seg_b - self.seg_a).T)
+
+        # Offset of each segment start along its lane's polyline
+        cumulative = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T)))) \
+            if len(points) > 1 else np.zeros(1)
+        self.seg_offset = cumulative[seg_start] - cumulative[offsets[self.seg_lane]]
+        shape_length = cumulative[offsets[1:] - 1] - cumulative[offsets[:-1]] if network.n_lanes else np.zeros(0)
+        self.lane_scale = np.divide(network.lane_length, shape_length,
+                                    out=np.ones(network.n_lanes), where=shape_length > 0)
+
+        lo = np.minimum(self.seg_a, self.seg_b)
+        hi = np.maximum(self.seg_a, self.seg_b)
+        if len(lo):
+            self.origin = lo.min(axis=0)
+            extent = hi.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.ones(2)
+
+        if cell_size is None:
+            # About four segments per cell, but never finer than the typical segment
+            area = max(extent[0] * extent[1], 1.0)
+            cell_size = max(np.sqrt(area * 4 / max(len(seg_length), 1)),
+                            float(np.median(seg_length)) if len(seg_length) else 1.0, 1.0)
+        self.cell_size = float(cell_size)
+        self.shape = (np.floor(extent / self.cell_size).astype(np.int64) + 1)
+
+        # Register each segment in every cell its bounding box covers
+        c0 = self._cell_coords(lo)
+        c1 = self._cell_coords(hi)
+        span = c1 - c0 + 1
+        counts = span[:, 0] * span[:, 1]
+        seg_ids = np.repeat(np.arange(len(lo)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cx = c0[seg_ids, 0] + local % span[seg_ids, 0]
+        cy = c0[seg_ids, 1] + local // span[seg_ids, 0]
+        keys = cy * self.shape[0] + cx
+
+        order = np.argsort(keys, kind='stable')
+        self.cell_segments = seg_ids[order].astype(np.int32)
+        self.cell_ptr = np.searchsorted(keys[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def _cell_coords(self, xy):
+        cells = np.floor((np.asarray(xy) - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.shape - 1)
+
+    def _block_segments(self, cx, cy, ring):
+        """Segments registered in the (2*ring+1)^2 block of cells around (cx, cy)"""
+        x0, x1 = max(cx - ring, 0), min(cx + ring, self.shape[0] - 1)
+        y0, y1 = max(cy - ring, 0), min(cy + ring, self.shape[1] - 1)
+        parts = []
+        for y in range(y0, y1 + 1):
+            row = y * self.shape[0]
+            start, end = self.cell_ptr[row + x0], self.cell_ptr[row + x1 + 1]
+            if end > start:
+                parts.append(self.cell_segments[start:end])
+        if not parts:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(parts))
+
+    def nearest_lanes(self, xy):
+        """
+        Nearest lane for every point
+
+        Parameters:
+        -----------
+        xy : array-like, shape (n, 2)
+
+        Returns:
+        --------
+        (lane_rows, distance, lane_pos) : (ndarray, ndarray, ndarray)
+            Lane row in the network arrays, distance to it (m) and the
+            position along the lane (m, SUMO lane coordinates)
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        n = len(xy)
+        best_seg = np.full(n, -1, dtype=np.int64)
+        best_dist = np.full(n, np.inf)
+        best_t = np.zeros(n)
+        if n == 0 or len(self.seg_a) == 0:
+            return best_seg, best_dist, best_t
+
+        # Distance from each point to the edge of its own cell, used to decide
+        # whether a block of cells is wide enough to contain the true nearest
+        raw = (xy - self.origin) / self.cell_size
+        cells = self._cell_coords(xy)
+        frac = raw - cells
+        margin = np.min(np.concatenate([frac, 1 - frac], axis=1), axis=1).clip(0, None) * self.cell_size
+
+        keys = cells[:, 1] * self.shape[0] + cells[:, 0]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        groups = np.split(order, bounds)
+        max_ring = int(max(self.shape)) + 1
+
+        for members in groups:
+            cx, cy = cells[members[0]]
+            pending = members
+            ring = 1
+            while len(pending):
+                candidates = self._block_segments(cx, cy, ring)
+                if len(candidates):
+                    px = xy[pending, 0][:, None]
+                    py = xy[pending, 1][:, None]
+                    a = self.seg_a[candidates]
+                    b = self.seg_b[candidates]
+                    dist, t = _point_segment_distance(px, py, a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+                    pick = np.argmin(dist, axis=1)
+                    rows = np.arange(len(pending))
+                    found = dist[rows, pick]
+                    improve = found < best_dist[pending]
+                    best_dist[pending[improve]] = found[improve]
+                    best_seg[pending[improve]] = candidates[pick[improve]]
+                    best_t[pending[improve]] = t[rows, pick][improve]
+
+                # Anything beyond the block is at least ring cells (plus the
+                # margin inside the point's own cell) away
+                reach = (ring - 1) * self.cell_size + self.cell_size + margin[pending]
+                done = best_dist[pending] <= reach
+                if ring >= max_ring:
+                    break
+                pending = pending[~done]
+                ring = ring * 2 if not len(candidates) else ring + 1
+
+        lane_rows = np.where(best_seg >= 0, self.seg_lane[np.maximum(best_seg, 0)], -1)
+        seg_length = np.hypot(*(self.seg_b - self.seg_a)[np.maximum(best_seg, 0)].T)
+        shape_pos = self.seg_offset[np.maximum(best_seg, 0)] + best_t * seg_length
+        lane_pos = shape_pos * self.lane_scale[np.maximum(lane_rows, 0)]
+        return lane_rows, best_dist, lane_pos
+
+
+class SpatialIndex:
+    """
+    Nearest-edge and nearest-charger lookups over one network
+
+    Parameters:
+    -----------
+    net_file : str
+        SUMO network (.net.xml)
+    add_file : str, optional
+        Additional file with <chargingStation> elements
+    cell_size : float, optional
+        Lane grid cell size (m)
+    """
+
+    def __init__(self, net_file='Test1.net.xml', add_file='Test1.add.xml', cell_size=None):
+        self.network = load_network(net_file)
+        self.lanes = LaneGrid(self.network, cell_size=cell_size)
+
+        self.stations = []
+        if add_file and os.path.exists(add_file):
+            self.stations = load_charging_stations(add_file, self.network)
+        self.station_ids = [station['id'] for station in self.stations]
+        self.station_xy = np.array([(station['x'], station['y']) for station in self.stations],
+                                   dtype=np.float64).reshape(-1, 2)
+
+    def nearest_edges(self, xy):
+        """
+        Nearest edge for every point
+
+        Returns:
+        --------
+        (edge_ids, distance, lane_ids, lane_pos)
+            Edge and lane ID arrays (object dtype, None if the network is
+            empty), distance (m) and position along the lane (m)
+        """
+        lane_rows, distance, lane_pos = self.lanes.nearest_lanes(xy)
+        lane_ids = np.array(self.network.lane_ids + [None], dtype=object)
+        edge_ids = np.array(self.network.edge_ids + [None], dtype=object)
+        edge_rows = np.where(lane_rows >= 0, self.network.lane_edge[np.maximum(lane_rows, 0)], -1)
+        return edge_ids[edge_rows], distance, lane_ids[lane_rows], lane_pos
+
+    def nearest_chargers(self, xy, k=1):
+        """
+        Nearest charging station(s) by straight-line distance
+
+        Stations are few, so points are processed in blocks against all of
+        them at once.
+
+        Returns:
+        --------
+        (station_ids, distance)
+            Arrays of shape (n,) for k=1 or (n, k) otherwise
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        n_stations = len(self.station_xy)
+        if n_stations == 0:
+            empty = np.full((len(xy), k), None, dtype=object)
+            dist = np.full((len(xy), k), np.inf)
+            return (empty[:, 0], dist[:, 0]) if k == 1 else (empty, dist)
+
+        k = min(k, n_stations)
+        ids = np.array(self.station_ids, dtype=object)
+        out_idx = np.empty((len(xy), k), dtype=np.int64)
+        out_dist = np.empty((len(xy), k))
+        chunk = max(1, _BLOCK_SIZE // n_stations)
+        for start in range(0, len(xy), chunk):
+            block = xy[start:start + chunk]
+            dist = np.hypot(block[:, None, 0] - self.station_xy[None, :, 0],
+                            block[:, None, 1] - self.station_xy[None, :, 1])
+            if k == 1:
+                idx = np.argmin(dist, axis=1)[:, None]
+            else:
+                idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                idx = np.take_along_axis(idx, np.argsort(np.take_along_axis(dist, idx, axis=1), axis=1), axis=1)
+            out_idx[start:start + chunk] = idx
+            out_dist[start:start + chunk] = np.take_along_axis(dist, idx, axis=1)
+
+        if k == 1:
+            return ids[out_idx[:, 0]], out_dist[:, 0]
+        return ids[out_idx], out_dist
+
+    def zones(self, xy, zone_size=500.0):
+        """Square zone index (zx, zy) of every point, for zone-level aggregation"""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        return np.floor((xy - self.lanes.origin) / zone_size).astype(np.int64)
+
+    def join(self, df, x_col='x_position_m', y_col='y_position_m', zone_size=None):
+        """
+        Add nearest edge/charger columns to a trajectory DataFrame
+
+        Adds: nearest_edge, nearest_lane, lane_pos_m, edge_distance_m,
+        nearest_charger, charger_distance_m and, with zone_size, zone_x/zone_y.
+        """
+        xy = df[[x_col, y_col]].to_numpy(dtype=np.float64)
+        edge_ids, edge_dist, lane_ids, lane_pos = self.nearest_edges(xy)
+        charger_ids, charger_dist = self.nearest_chargers(xy)
+
+        result = df.copy()
+        result['nearest_edge'] = edge_ids
+        result['nearest_lane'] = lane_ids
+        result['lane_pos_m'] = lane_pos
+        result['edge_distance_m'] = edge_dist
+        result['nearest_charger'] = charger_ids
+        result['charger_distance_m'] = charger_dist
+        if zone_size:
+            zones = self.zones(xy, zone_size)
+            result['zone_x'] = zones[:, 0]
+            result['zone_y'] = zones[:, 1]
+        return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] == "--help":
+        print(__doc__)
+        sys.exit(0)
+
+    import pandas as pd
+
+    data_file = sys.argv[1]
+    net_file = sys.argv[2] if len(sys.argv) > 2 else "Test1.net.xml"
+    add_file = sys.argv[3] if len(sys.argv) > 3 else "Test1.add.xml"
+
+    start = time.perf_counter()
+    index = SpatialIndex(net_file, add_file)
+    print(f"✓ Spatial index: {index.network.n_lanes} lanes, {len(index.lanes.seg_a)} segments, "
+          f"{len(index.stations)} charging stations ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    df = pd.read_csv(data_file)
+    start = time.perf_counter()
+    joined = index.join(df)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Joined {len(df)} samples in {elapsed:.2f}s")
+
+    output_file = os.path.splitext(data_file)[0] + '_spatial.csv'
+    joined.to_csv(output_file, index=False)
+    print(f"✓ Spatial join exported: {output_file}")
@@ -0,0 +1,357 @@
+"""
+Result-Cached Parameter Sweep Orchestrator
+Replaces copying MOD directories and editing vType / charger attributes by
+hand. A parameter grid over vType and chargingStation attributes and
+sumocfg options is expanded, each variant's .sumocfg, .rou.xml and .add.xml
+are rendered in memory, and the variant is keyed by a SHA-1 of the fully
+resolved inputs (rendered files plus the network contents). Variants whose
+key already has results in the cache are not run again, so repeated and
+overlapping sweeps only pay for new points.
+
+Grid keys:
+    vType:<id>:<attribute>                e.g. vType:easyBike:sigma
+    chargingStation:<id>:<attribute>      e.g. chargingStation:fast_charger_n2:power
+    config:<option>                       e.g. config:end, config:step-length
+<id> may be * for every element of that type.
+
+Each cached run keeps its rendered inputs, the tripinfo / summary /
+chargingstations outputs and a result.json with summary metrics in
+.sweep_cache/<key>/.
+
+Usage:
+    python sweep.py vType:easyBike:sigma=0.5,0.8 chargingStation:*:power=22000,50000
+    python sweep.py --grid grid.json [--workers 4] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import copy
+import shutil
+import hashlib
+import itertools
+import subprocess
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from fare_model import read_tripinfo
+from load_aggregator import read_charging_output, aggregate_load
+
+CACHE_DIR = '.sweep_cache'
+SUMO_BINARY = 'sumo'
+KEEP_OUTPUTS = {
+    'tripinfo-output': 'tripinfo.xml',
+    'summary-output': 'summary.xml',
+    'chargingstations-output': 'chargingstations.xml'
+}
+ET.register_namespace('xsi', 'http://www.w3.org/2001/XMLSchema-instance')
+
+
+def parse_grid(args):
+    """Grid from key=v1,v2 arguments; values stay strings as written into the XML"""
+    grid = {}
+    for arg in args:
+        key, _, values = arg.partition('=')
+        if not values or key.split(':')[0] not in ('vType', 'chargingStation', 'config'):
+            raise ValueError(f"Bad grid entry '{arg}' (use e.g. vType:easyBike:sigma=0.5,0.8)")
+        grid[key] = values.split(',')
+    return grid
+
+
+def expand_grid(grid):
+    """Every combination of the grid values as a list of {key: value} points"""
+    keys = list(grid)
+    return [dict(zip(keys, (str(v) for v in values))) for values in itertools.product(*grid.values())]
+
+
+def _option_value(config_root, option):
+    elem = next(config_root.iter(option), None)
+    return elem.get('value') if elem is not None else None
+
+
+def _single_file(config_root, option, sumocfg):
+    """The one file listed in a sumocfg file option (None if unset)"""
+    value = _option_value(config_root, option)
+    files = [name.strip() for name in value.split(',') if name.strip()] if value else []
+    if len(files) > 1:
+        raise ValueError(f"{sumocfg} lists {len(files)} {option} ({', '.join(files)}); "
+                         f"the sweep renders a single file, merge them first")
+    return files[0] if files else None
+
+
+class SweepBase:
+    """
+    Base scenario: the parsed sumocfg, route and additional files
+
+    Parameters:
+    -----------
+    sumocfg : str
+        Base configuration (its net, route and additional files are used;
+        route-files and additional-files must list a single file each)
+    """
+
+    def __init__(self, sumocfg='Test1.sumocfg'):
+        self.directory = os.path.dirname(os.path.abspath(sumocfg))
+        self.config = ET.parse(sumocfg).getroot()
+        self.net_file = os.path.join(self.directory, _option_value(self.config, 'net-file'))
+        self.route_file = os.path.join(self.directory, _single_file(self.config, 'route-files', sumocfg))
+        additional = _single_file(self.config, 'additional-files', sumocfg)
+        self.add_file = os.path.join(self.directory, additional) if additional else None
+        self.routes = ET.parse(self.route_file).getroot()
+        self.additional = ET.parse(self.add_file).getroot() if self.add_file else None
+
+        digest = hashlib.sha1()
+        with open(self.net_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.net_digest = digest.hexdigest()
+
+    def render(self, point):
+        """
+        Rendered input files of one grid point
+
+        Returns:
+        --------
+        dict
+            {'variant.sumocfg': bytes, 'variant.rou.xml': bytes, 'variant.add.xml': bytes}
+            The sumocfg refers to the network as NET_FILE (filled in when run)
+        """
+        config = copy.deepcopy(self.config)
+        routes = copy.deepcopy(self.routes)
+        additional = copy.deepcopy(self.additional)
+
+        for key, value in point.items():
+            parts = key.split(':')
+            if parts[0] == 'config':
+                elem = next(config.iter(parts[1]), None)
+                if elem is None:
+                    section = next(config.iter('processing'), config)
+                    elem = ET.SubElement(section, parts[1])
+                elem.set('value', value)
+                continue
+            tag, elem_id, attribute = parts
+            root = routes if tag == 'vType' else additional
+            matched = [elem for elem in (root.iter(tag) if root is not None else [])
+                       if elem_id == '*' or elem.get('id') == elem_id]
+            if not matched:
+                raise ValueError(f"No <{tag}> with id '{elem_id}' for grid key '{key}'")
+            for elem in matched:
+                elem.set(attribute, value)
+
+        # Inputs point to the rendered files; only the kept outputs are written
+        next(config.iter('net-file')).set('value', 'NET_FILE')
+        next(config.iter('route-files')).set('value', 'variant.rou.xml')
+        if additional is not None:
+            next(config.iter('additional-files')).set('value', 'variant.add.xml')
+        output = next(config.iter('output'), None)
+        if output is not None:
+            for elem in list(output):
+                if elem.tag in KEEP_OUTPUTS:
+                    elem.set('value', KEEP_OUTPUTS[elem.tag])
+                else:
+                    output.remove(elem)
+
+        files = {'variant.sumocfg': ET.tostring(config), 'variant.rou.xml': ET.tostring(routes)}
+        if additional is not None:
+            files['variant.add.xml'] = ET.tostring(additional)
+        return files
+
+    def key(self, files):
+        """SHA-1 of the network and every rendered input file"""
+        digest = hashlib.sha1(self.net_digest.encode())
+        for name in sorted(files):
+            digest.update(name.encode())
+            digest.update(files[name])
+        return digest.hexdigest()
+
+
+def summarize_run(run_dir):
+    """Summary metrics of one finished run from its output files"""
+    result = {}
+    tripinfo = os.path.join(run_dir, 'tripinfo.xml')
+    if os.path.exists(tripinfo):
+        trips = read_tripinfo(tripinfo)
+        distance_km = trips['distance_m'].sum() / 1000
+        result.update({
+            'trips': len(trips),
+            'mean_duration_sec': float(trips['duration_sec'].mean()) if len(trips) else np.nan,
+            'mean_distance_m': float(trips['distance_m'].mean()) if len(trips) else np.nan,
+            'mean_waiting_sec': float(trips['waiting_time_sec'].mean()) if len(trips) else np.nan,
+            'energy_consumed_kWh': float(trips['energy_consumed_Wh'].sum() / 1000),
+            'energy_per_km_Wh': float(trips['energy_consumed_Wh'].sum() / distance_km) if distance_km > 0 else np.nan
+        })
+    charging = os.path.join(run_dir, 'chargingstations.xml')
+    if os.path.exists(charging):
+        samples = read_charging_output(charging)
+        load = aggregate_load([samples], 60)
+        total = load[load['station'] == 'total']['load_kW']
+        result.update({
+            'energy_charged_kWh': float(samples['energy_Wh'].sum() / 1000),
+            'peak_charging_kW': float(total.max()) if len(total) else 0.0,
+            'charger_utilization': charger_utilization(run_dir, samples)
+        })
+    return result
+
+
+def charger_utilization(run_dir, samples):
+    """Share of station-time with at least one vehicle charging (all stations of the run)"""
+    config = ET.parse(os.path.join(run_dir, 'variant.sumocfg')).getroot()
+    step_length = float(_option_value(config, 'step-length') or 1.0)
+    begin = float(_option_value(config, 'begin') or 0.0)
+    end = _option_value(config, 'end')
+    end = float(end) if end else (samples['time'].max() if len(samples['time']) else begin)
+    add_file = os.path.join(run_dir, 'variant.add.xml')
+    n_stations = (sum(1 for _ in ET.parse(add_file).getroot().iter('chargingStation'))
+                  if os.path.exists(add_file) else len(samples['station_ids']))
+    if n_stations == 0 or end <= begin:
+        return np.nan
+    inside = (samples['time'] >= begin) & (samples['time'] < end)
+    occupied = len(np.unique(np.column_stack([samples['station'][inside], samples['time'][inside]]), axis=0))
+    return float(occupied * step_length / (n_stations * (end - begin)))
+
+
+def run_variant(key, files, net_file, cache_dir=CACHE_DIR, sumo_binary=SUMO_BINARY, keep_outputs=True):
+    """
+    Run one variant in a scratch directory and move it into the cache
+
+    With keep_outputs=False only the inputs and result.json are kept.
+
+    Returns:
+    --------
+    dict
+        Metrics from summarize_run, or {'error': message}
+    """
+    run_dir = os.path.join(cache_dir, key)
+    tmp_dir = run_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, content in files.items():
+        if name.endswith('.sumocfg'):
+            content = content.replace(b'NET_FILE', os.path.abspath(net_file).encode())
+        with open(os.path.join(tmp_dir, name), 'wb') as f:
+            f.write(content)
+
+    process = subprocess.run([sumo_binary, '-c', 'variant.sumocfg', '--no-step-log', '--no-warnings'],
+                             cwd=tmp_dir, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'SUMO failed'}
+
+    result = summarize_run(tmp_dir)
+    with open(os.path.join(tmp_dir, 'result.json'), 'w') as f:
+        json.dump(result, f, indent=2)
+    if not keep_outputs:
+        for name in KEEP_OUTPUTS.values():
+            if os.path.exists(os.path.join(tmp_dir, name)):
+                os.remove(os.path.join(tmp_dir, name))
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.replace(tmp_dir, run_dir)
+    return result
+
+
+def _run_variant_job(args):
+    return run_variant(*args)
+
+
+def cached_result(key, cache_dir=CACHE_DIR):
+    """Stored metrics of a variant, or None if it has not been run"""
+    path = os.path.join(cache_dir, key, 'result.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_sweep(grid, sumocfg='Test1.sumocfg', cache_dir=CACHE_DIR, workers=None,
+              sumo_binary=SUMO_BINARY, dry_run=False):
+    """
+    Run every grid point that is not cached yet
+
+    Parameters:
+    -----------
+    grid : dict
+        {grid key: list of values}
+    dry_run : bool
+        Only report which points are cached and which would run
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per grid point: grid values, key, status (cached / ran /
+        pending / failed) and the run's metrics
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    base = SweepBase(sumocfg)
+    points = expand_grid(grid)
+    rendered = [base.render(point) for point in points]
+    keys = [base.key(files) for files in rendered]
+
+    results = {}
+    status = {}
+    jobs = []
+    for key, files in zip(keys, rendered):
+        if key in status:
+            continue  # the same resolved inputs appear twice in the grid
+        cached = cached_result(key, cache_dir)
+        if cached is not None:
+            results[key], status[key] = cached, 'cached'
+        else:
+            status[key] = 'pending'
+            jobs.append((key, files, base.net_file, cache_dir, sumo_binary))
+
+    if jobs and not dry_run:
+        if shutil.which(sumo_binary) is None:
+            raise FileNotFoundError(f"'{sumo_binary}' not found; install SUMO or set SUMO_HOME/bin on PATH")
+        if workers == 1 or len(jobs) == 1:
+            outcomes = [_run_variant_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(_run_variant_job, jobs))
+        for job, outcome in zip(jobs, outcomes):
+            results[job[0]] = outcome
+            status[job[0]] = 'failed' if 'error' in outcome else 'ran'
+
+    rows = [{**point, 'key': key[:12], 'status': status[key], **results.get(key, {})}
+            for point, key in zip(points, keys)]
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'--grid': None, '--workers': None, '--config': 'Test1.sumocfg', '--cache': CACHE_DIR}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+    dry_run = '--dry-run' in args
+    args = [arg for arg in args if arg != '--dry-run']
+
+    if options['--grid']:
+        with open(options['--grid']) as f:
+            grid = {key: [str(v) for v in values] for key, values in json.load(f).items()}
+    elif args:
+        grid = parse_grid(args)
+    else:
+        print(__doc__)
+        sys.exit(0)
+
+    workers = int(options['--workers']) if options['--workers'] else None
+    try:
+        results = run_sweep(grid, options['--config'], options['--cache'], workers=workers, dry_run=dry_run)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    counts = results['status'].value_counts()
+    print("\n" + "="*80)
+    print(f"PARAMETER SWEEP: {len(results)} points "
+          f"({counts.get('cached', 0)} cached, {counts.get('ran', 0)} run, "
+          f"{counts.get('pending', 0)} pending, {counts.get('failed', 0)} failed)")
+    print("="*80)
+    print(results.round(2).to_string(index=False))
+
+    if not dry_run:
+        output_file = 'sweep_results.csv'
+        results.to_csv(output_file, index=False)
+        print(f"\n✓ Sweep results exported: {output_file}")
@@ -0,0 +1,476 @@
+"""
+Record and Replay of TraCI Sessions
+Lets the exporter (and everything plugged into it) run without SUMO.
+
+TraCIRecorder wraps the real traci module and records every call's result
+per simulation step (plus the mean latency of each kind of call) into a
+gzip-compressed trace. ReplayTraCI is a stand-in `traci` module that answers
+the same calls from the trace, step by step, optionally spending the
+recorded latency on each call, so runs are deterministic and timings are
+realistic. With scale=k every recorded vehicle appears k times (ids
+"<id>~copy<j>"), so any fleet size can be profiled from one small trace.
+
+Setters (setRoute, setParameter, ...) are accepted and ignored in replay;
+a getter that was never recorded raises TraCIException like an unknown
+vehicle would.
+
+Install the stand-in before anything imports traci:
+
+    from traci_replay import install_replay
+    install_replay('session.trace.gz', scale=10)
+    from run_simulation import Test1SUMOExporter
+
+`check` records a small synthetic session (SyntheticTraCI) through the
+exporter, replays it at scale 1 and 2 and compares the exported CSV row
+counts, so a TraCI call the replay cannot answer shows up without SUMO.
+
+Usage:
+    python traci_replay.py record [Test1.sumocfg] [-o session.trace.gz]
+    python traci_replay.py replay session.trace.gz [--scale 10] [--no-latency] [--export]
+    python traci_replay.py check [Test1.sumocfg] [--scale 2]
+"""
+
+import os
+import sys
+import gzip
+import time
+import types
+import pickle
+
+TRACE_FILE = 'session.trace.gz'
+COPY_SEPARATOR = '~copy'
+ID_LIST_METHODS = {'getIDList', 'getArrivedIDList', 'getDepartedIDList', 'getLoadedIDList'}
+_ERROR = '__traci_error__'
+PER_STATION_OUTPUTS = {'charging_queues'}  # one row per station, whatever the fleet size
+
+
+class TraCIException(Exception):
+    """Raised by the replay module where SUMO would raise traci.exceptions.TraCIException"""
+
+
+def _busy_wait(seconds):
+    """Spin for a few microseconds (time.sleep is too coarse for per-call latency)"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _hashable(value):
+    """Lists and dicts (e.g. setRoute's edge list) as tuples, so calls can key the trace"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    return value
+
+
+def _call_key(domain, method, args, kwargs):
+    return (domain, method, _hashable(args), _hashable(kwargs))
+
+
+class _RecordingDomain:
+    def __init__(self, recorder, name, domain):
+        self._recorder = recorder
+        self._name = name
+        self._domain = domain
+
+    def __getattr__(self, method):
+        function = getattr(self._domain, method)
+        if not callable(function):
+            return function
+        return lambda *args, **kwargs: self._recorder.call(self._name, method, function, args, kwargs)
+
+
+class TraCIRecorder(types.ModuleType):
+    """
+    traci stand-in that forwards to the real module and records the results
+
+    Parameters:
+    -----------
+    traci_module : module, optional
+        The real traci (imported if not given)
+    """
+
+    DOMAINS = ('simulation', 'vehicle', 'vehicletype', 'lane', 'edge', 'chargingstation', 'person', 'route')
+
+    def __init__(self, traci_module=None):
+        super().__init__('traci')
+        if traci_module is None:
+            import traci as traci_module
+        self._traci = traci_module
+        self.exceptions = traci_module.exceptions
+        self.steps = [{}]
+        self.latency = {}  # (domain, method) -> [total seconds, calls]
+        for name in self.DOMAINS:
+            if hasattr(traci_module, name):
+                setattr(self, name, _RecordingDomain(self, name, getattr(traci_module, name)))
+
+    def call(self, domain, method, function, args, kwargs):
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except self._traci.exceptions.TraCIException as e:
+            self._record(domain, method, args, kwargs, (_ERROR, str(e)), start)
+            raise
+        self._record(domain, method, args, kwargs, result, start)
+        return result
+
+    def _record(self, domain, method, args, kwargs, result, start):
+        elapsed = time.perf_counter() - start
+        key = _call_key(domain, method, args, kwargs)
+        self.steps[-1][key] = result
+        total = self.latency.setdefault((domain, method), [0.0, 0])
+        total[0] += elapsed
+        total[1] += 1
+
+    def start(self, *args, **kwargs):
+        return self._traci.start(*args, **kwargs)
+
+    def simulationStep(self, *args):
+        start = time.perf_counter()
+        result = self._traci.simulationStep(*args)
+        total = self.latency.setdefault(('', 'simulationStep'), [0.0, 0])
+        total[0] += time.perf_counter() - start
+        total[1] += 1
+        self.steps.append({})
+        return result
+
+    def close(self, *args, **kwargs):
+        return self._traci.close(*args, **kwargs)
+
+    def save(self, path=TRACE_FILE):
+        """Write the trace (steps and mean call latency)"""
+        trace = {
+            'version': 1,
+            'steps': self.steps,
+            'latency': {key: total / calls for key, (total, calls) in self.latency.items() if calls}
+        }
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            pickle.dump(trace, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return path
+
+
+class _ReplayDomain:
+    def __init__(self, replay, name):
+        self._replay = replay
+        self._name = name
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self._replay.answer(self._name, method, args, kwargs)
+
+
+class ReplayTraCI(types.ModuleType):
+    """
+    traci stand-in that answers calls from a recorded trace
+
+    Parameters:
+    -----------
+    trace_file : str
+    scale : int
+        Copies of every recorded vehicle
+    latency : float
+        Multiplier on the recorded per-call latency (0 = as fast as possible)
+    """
+
+    def __init__(self, trace_file=TRACE_FILE, scale=1, latency=1.0):
+        super().__init__('traci')
+        with gzip.open(trace_file, 'rb') as f:
+            trace = pickle.load(f)
+        self.steps = trace['steps']
+        self.call_latency = {key: value * latency for key, value in trace['latency'].items()} if latency else {}
+        self.scale = max(int(scale), 1)
+        self.step = 0
+        self.calls = 0
+        self.exceptions = types.SimpleNamespace(TraCIException=TraCIException,
+                                                FatalTraCIError=TraCIException)
+        for name in TraCIRecorder.DOMAINS:
+            setattr(self, name, _ReplayDomain(self, name))
+
+    def recorded_fleet(self):
+        """Largest number of vehicles in the network at one recorded step"""
+        return max((len(step[key]) for step in self.steps for key in step
+                    if key[:2] == ('vehicle', 'getIDList')), default=0)
+
+    def _expand(self, ids):
+        if self.scale == 1:
+            return ids
+        return type(ids)(f'{veh_id}{COPY_SEPARATOR}{j}' if j else veh_id
+                         for veh_id in ids for j in range(self.scale))
+
+    def answer(self, domain, method, args, kwargs):
+        self.calls += 1
+        delay = self.call_latency.get((domain, method))
+        if delay:
+            _busy_wait(delay)
+
+        if args and isinstance(args[0], str) and COPY_SEPARATOR in args[0]:
+            args = (args[0].split(COPY_SEPARATOR, 1)[0],) + args[1:]
+        key = _call_key(domain, method, args, kwargs)
+        step = self.steps[self.step] if self.step < len(self.steps) else {}
+
+        if key not in step:
+            if domain == 'simulation' and method == 'getMinExpectedNumber' and self.step >= len(self.steps) - 1:
+                return 0  # end of the recording
+            if method.startswith('get'):
+                raise TraCIException(f"{domain}.{method}{args} was not recorded at step {self.step}")
+            return None  # setters and other commands are ignored
+
+        result = step[key]
+        if isinstance(result, tuple) and len(result) == 2 and result[0] == _ERROR:
+            raise TraCIException(result[1])
+        if method in ID_LIST_METHODS:
+            return self._expand(result)
+        if domain == 'simulation' and method == 'getMinExpectedNumber':
+            return result * self.scale
+        return result
+
+    def start(self, *args, **kwargs):
+        self.step = 0
+        return (0, 'replay')
+
+    def simulationStep(self, *args):
+        delay = self.call_latency.get(('', 'simulationStep'))
+        if delay:
+            _busy_wait(delay)
+        self.step += 1
+
+    def close(self, *args, **kwargs):
+        pass
+
+
+def install_recorder():
+    """Replace traci in sys.modules with a recorder around the real module"""
+    recorder = TraCIRecorder()
+    sys.modules['traci'] = recorder
+    return recorder
+
+
+def install_replay(trace_file=TRACE_FILE, scale=1, latency=1.0):
+    """Replace traci in sys.modules with a replay of trace_file"""
+    replay = ReplayTraCI(trace_file, scale=scale, latency=latency)
+    sys.modules['traci'] = replay
+    return replay
+
+
+class _SyntheticVehicles:
+    """Vehicle domain of SyntheticTraCI: vehicle i drives along one lane, vehicle 0 stops to charge"""
+
+    def __init__(self, session):
+        self._session = session
+
+    def getIDList(self):
+        return tuple(f'veh{i}' for i in self._session.active())
+
+    def _index(self, veh_id):
+        i = int(veh_id[3:])
+        if i not in self._session.active():
+            raise TraCIException(f"Vehicle '{veh_id}' is not known")
+        return i
+
+    def _charging(self, veh_id):
+        return self._index(veh_id) == 0 and self._session.charge_start <= self._session.step < self._session.charge_end
+
+    def getSpeed(self, veh_id):
+        return 0.0 if self._charging(veh_id) else 5.0 + self._index(veh_id)
+
+    def getDistance(self, veh_id):
+        return 5.0 * (self._session.step - self._index(veh_id))
+
+    def getPosition(self, veh_id):
+        return (self.getDistance(veh_id), 10.0 * self._index(veh_id))
+
+    def getLaneID(self, veh_id):
+        return self._session.station_lane if self._charging(veh_id) else 'E0_0'
+
+    def getLanePosition(self, veh_id):
+        return self._session.station_pos if self._charging(veh_id) else self.getDistance(veh_id)
+
+    def getWaitingTime(self, veh_id):
+        return 1.0 if self._charging(veh_id) else 0.0
+
+    def getAcceleration(self, veh_id):
+        return 0.0
+
+    def getSlope(self, veh_id):
+        return 0.0
+
+    def getTypeID(self, veh_id):
+        return 'easyBike' if self._index(veh_id) % 2 == 0 else 'eRickshaw'
+
+    def getStops(self, veh_id, limit=0):
+        stop = types.SimpleNamespace(stoppingPlaceID=self._session.station_id)
+        return (stop,) if self._index(veh_id) == 0 and self._session.step < self._session.charge_end else ()
+
+    def getParameter(self, veh_id, key):
+        step = self._session.step - self._index(veh_id)
+        values = {
+            'device.battery.actualBatteryCapacity': 1000.0 - 2.0 * step,
+            'device.battery.maximumBatteryCapacity': 2000.0,
+            'device.battery.totalEnergyConsumed': 2.5 * step,
+            'device.battery.totalEnergyRegenerated': 0.5 * step,
+            'device.battery.chargingStationId': self._session.station_id if self._charging(veh_id) else 'NULL'
+        }
+        return str(values[key])
+
+
+class _SyntheticSimulation:
+    def __init__(self, session):
+        self._session = session
+
+    def getTime(self):
+        return float(self._session.step)
+
+    def getMinExpectedNumber(self):
+        return len(self._session.active()) + sum(1 for i in range(self._session.vehicles) if i >= self._session.step)
+
+    def getArrivedIDList(self):
+        return tuple(f'veh{i}' for i in range(self._session.vehicles) if i + self._session.life == self._session.step)
+
+
+class SyntheticTraCI(types.ModuleType):
+    """
+    Small deterministic traci stand-in for recording a trace without SUMO
+
+    `vehicles` vehicles depart one per step and each drives for `life`
+    steps; veh0 charges at station_id on its lane for a few steps.
+    """
+
+    def __init__(self, vehicles=4, life=20, station_id='fast_charger_n2', station_lane='E0_0', station_pos=410.0):
+        super().__init__('traci')
+        self.vehicles = vehicles
+        self.life = life
+        self.step = 0
+        self.charge_start, self.charge_end = 5, 10
+        self.station_id = station_id
+        self.station_lane = station_lane
+        self.station_pos = station_pos
+        self.exceptions = types.SimpleNamespace(TraCIException=TraCIException, FatalTraCIError=TraCIException)
+        self.vehicle = _SyntheticVehicles(self)
+        self.simulation = _SyntheticSimulation(self)
+
+    def active(self):
+        return range(max(self.step - self.life + 1, 0), min(self.step, self.vehicles))
+
+    def start(self, *args, **kwargs):
+        self.step = 0
+        return (0, 'synthetic')
+
+    def simulationStep(self, *args):
+        self.step += 1
+
+    def close(self, *args, **kwargs):
+        pass
+
+
+def _export_rows(traci_module, sumocfg, output_folder):
+    """Run the exporter on a traci stand-in and count the rows of each exported CSV"""
+    import run_simulation
+    run_simulation.traci = traci_module
+    exporter = run_simulation.Test1SUMOExporter(sumocfg=sumocfg, output_folder=output_folder)
+    if not exporter.run_simulation():
+        raise RuntimeError("exporter run failed")
+    exporter.export_to_csv()
+    counts = {}
+    for name in os.listdir(output_folder):
+        kind = name.rsplit('_', 2)[0]
+        with open(os.path.join(output_folder, name)) as f:
+            counts[kind] = sum(1 for _ in f) - 1
+    return counts
+
+
+def check_exporter_roundtrip(scale=2, sumocfg='Test1.sumocfg', verbose=False):
+    """
+    Record a synthetic session through the exporter, replay it at scale 1 and
+    at `scale`, and count the rows of every exported CSV
+
+    Returns:
+    --------
+    dict
+        Output name (battery_data, trip_summary, ...) -> rows recorded,
+        replayed and replayed at `scale`; the last should be `scale` times
+        the first two (equal for PER_STATION_OUTPUTS)
+    """
+    import io
+    import tempfile
+    import contextlib
+    sys.modules.setdefault('traci', SyntheticTraCI())  # run_simulation needs a traci to import
+
+    with tempfile.TemporaryDirectory() as workdir:
+        log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with log:
+            recorder = TraCIRecorder(SyntheticTraCI())
+            recorded = _export_rows(recorder, sumocfg, os.path.join(workdir, 'recorded'))
+            trace_file = recorder.save(os.path.join(workdir, TRACE_FILE))
+            replayed = _export_rows(ReplayTraCI(trace_file, latency=0), sumocfg, os.path.join(workdir, 'replay'))
+            scaled = _export_rows(ReplayTraCI(trace_file, scale=scale, latency=0), sumocfg,
+                                  os.path.join(workdir, 'scaled'))
+
+    kinds = sorted(set(recorded) | set(replayed) | set(scaled))
+    return {kind: (recorded.get(kind, 0), replayed.get(kind, 0), scaled.get(kind, 0)) for kind in kinds}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {'-o': TRACE_FILE, '--scale': 1, '--interval': 1.0}
+    for flag in list(options):
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+    flags = {arg for arg in args if arg.startswith('--')}
+    args = [arg for arg in args if not arg.startswith('--')]
+    command = args.pop(0) if args else None
+
+    if command == 'record':
+        recorder = install_recorder()
+        from run_simulation import Test1SUMOExporter
+        exporter = Test1SUMOExporter(sumocfg=args[0] if args else 'Test1.sumocfg')
+        if not exporter.run_simulation(step_length=float(options['--interval'])):
+            sys.exit(1)
+        path = recorder.save(options['-o'])
+        print(f"\n✓ Trace saved: {path} ({len(recorder.steps)} steps, {os.path.getsize(path) / 1e6:.2f} MB)")
+
+    elif command == 'replay':
+        if not args or not os.path.exists(args[0]):
+            print("Usage: python traci_replay.py replay session.trace.gz [--scale 10] [--no-latency] [--export]")
+            sys.exit(1)
+        replay = install_replay(args[0], scale=int(options['--scale']),
+                                latency=0.0 if '--no-latency' in flags else 1.0)
+        from run_simulation import Test1SUMOExporter
+        exporter = Test1SUMOExporter()
+        start = time.perf_counter()
+        exporter.run_simulation(step_length=float(options['--interval']))
+        elapsed = time.perf_counter() - start
+        if '--export' in flags:
+            exporter.export_to_csv()
+
+        print("\n" + "="*60)
+        print("TRACI REPLAY")
+        print("="*60)
+        print(f"Steps: {replay.step}  |  Scale: x{replay.scale}  |  TraCI calls: {replay.calls:,}")
+        print(f"Vehicle samples: {len(exporter.realtime_data):,}")
+        print(f"Run time: {elapsed:.2f}s ({replay.step / max(elapsed, 1e-9):.0f} steps/s)")
+
+    elif command == 'check':
+        scale = int(options['--scale']) if int(options['--scale']) > 1 else 2
+        rows = check_exporter_roundtrip(scale=scale, sumocfg=args[0] if args else 'Test1.sumocfg')
+
+        print("\n" + "="*60)
+        print(f"RECORD / REPLAY ROUND TRIP (scale x{scale})")
+        print("="*60)
+        print(f"{'Output':<20} {'Recorded':>10} {'Replayed':>10} {'Scaled':>10}")
+        print("-" * 60)
+        failed = not rows
+        for kind, (recorded, replayed, scaled) in rows.items():
+            expected = recorded if kind in PER_STATION_OUTPUTS else scale * recorded
+            ok = recorded > 0 and replayed == recorded and scaled == expected
+            failed |= not ok
+            print(f"{kind:<20} {recorded:>10} {replayed:>10} {scaled:>10}  {'✓' if ok else '✗'}")
+        print(f"\n{'✗ Replay does not reproduce the exporter run' if failed else '✓ Replay reproduces the exporter run'}")
+        sys.exit(1 if failed else 0)
+
+    else:
+        print(__doc__)
+        sys.exit(0 if command is None else 1)